@@ -1,12 +1,63 @@
 from Utils.Interpreter_pascal import Interpreter
-from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
-from Utils.Parser_pascal import Parser
-from Utils.lexer_pascal import Lexer,SemanticError,ParserError,LexerError
-print('All imported\n')
+from Utils.optimizer_pascal import ConstantFolder,DeadCodeEliminator,CommonSubexpressionEliminator
+from Utils.cache_pascal import FrontendCache
+from Utils.profiler_pascal import Profiler
+from Utils.trace_pascal import StreamSink,default_tracer
+from Utils.batch_pascal import run_many,iter_path,iter_jsonl
+from Utils.pool_pascal import run_parallel
+from Utils.vector_pascal import run_bindings
+from Utils.lexer_pascal import SemanticError,ParserError,LexerError
 
+import argparse
+import json
 import sys
 
+frontend_cache=FrontendCache()
+
+def batch(path,jobs=1,cpu_time=None,memory=None,max_steps=None,time_limit=None):
+   # one JSON result per program on stdout, in input order for a single
+   # process and in completion order with a process pool
+   sources=iter_jsonl(sys.stdin) if path=='-' else iter_path(path)
+   if jobs==1 and cpu_time is None and memory is None:
+      results=run_many(sources,cache=frontend_cache,max_steps=max_steps,time_limit=time_limit)
+   else:
+      results=run_parallel(sources,workers=jobs or None,cpu_time=cpu_time,memory=memory,max_steps=max_steps,time_limit=time_limit)
+   for result in results:
+      print(json.dumps(result),flush=True)
+
+def bindings(tree,path):
+   # one {name: value} object per line in, the final globals of each line out
+   def rows(stream):
+      return [json.loads(line) for line in stream if line.strip()]
+   if path=='-':
+      table=run_bindings(tree,rows(sys.stdin))
+   else:
+      with open(path,encoding='utf-8') as f:
+         table=run_bindings(tree,rows(f))
+   for row in table:
+      print(json.dumps(row))
+
 def main():
+   parser=argparse.ArgumentParser(description='Simple Pascal Interpreter')
+   parser.add_argument('--profile',action='store_true',help='print a profile of the interpreter run')
+   parser.add_argument('--profile-json',metavar='PATH',help='write the profile of the interpreter run as JSON to a file (- for stdout)')
+   parser.add_argument('--trace',action='store_true',help='print scope and call stack traces')
+   parser.add_argument('--batch',metavar='PATH',help='run every .pas file in a directory or every program in a JSONL file (- for stdin)')
+   parser.add_argument('--jobs',type=int,default=1,help='worker processes for --batch, 0 for one per CPU')
+   parser.add_argument('--cpu-time',type=float,help='CPU seconds allowed per program in --batch')
+   parser.add_argument('--memory',type=int,help='memory in MB allowed per worker process in --batch')
+   parser.add_argument('--max-steps',type=int,help='AST nodes a program may execute in --batch, counted exactly')
+   parser.add_argument('--time-limit',type=float,help='wall-clock seconds a program may run in --batch, the clock is read every 1024 steps so a program can run over by that many steps')
+   parser.add_argument('--bindings',metavar='PATH',help='run the program once for all initial global values in a JSONL file (- for stdin), needs NumPy')
+   args=parser.parse_args()
+   
+   if args.trace:
+      default_tracer.add_sink(StreamSink())
+   if args.batch:
+      memory=args.memory*2**20 if args.memory is not None else None
+      batch(args.batch,args.jobs,args.cpu_time,memory,args.max_steps,args.time_limit)
+      return
+   
    text="""\
      PROGRAM Part10;
 VAR
@@ -32,21 +83,34 @@ BEGIN {Part10}
 END.  {Part10}
      """
         
-   lexer = Lexer(text)
-   try:
-      parser = Parser(lexer)
-      tree = parser.parse()
-   except (ParserError,LexerError) as e:
-      print(e.message)
-      sys.exit(1)
-   semantic_analyzer = SemanticAnalyzer()
    try:
-      semantic_analyzer.visit(tree)
-   except SemanticError as e:
+      tree = frontend_cache.get(text)
+   except (ParserError,LexerError,SemanticError) as e:
       print(e.message)
       sys.exit(1)
-   interpreter=Interpreter(tree)
+   removed=ConstantFolder().optimize(tree)
+   default_tracer.info('pascal','Constant folding removed {} nodes',removed)
+   eliminator=DeadCodeEliminator()
+   for kind,name,lineno,column in eliminator.optimize(tree):
+      default_tracer.info('pascal','Removed {} {} at line {}',kind,name,lineno)
+   # after dead code elimination, the temporaries of the program body are
+   # globals and would always count as live
+   for name,type_name,uses,lineno in CommonSubexpressionEliminator().optimize(tree):
+      default_tracer.info('pascal','{} holds an expression evaluated {} times at line {}',name,uses,lineno)
+   if args.bindings:
+      bindings(tree,args.bindings)
+      return
+   profiler=Profiler() if args.profile or args.profile_json else None
+   interpreter=Interpreter(tree,profiler)
    interpreter.interpret()
+   if args.profile:
+      print(profiler.report())
+   if args.profile_json=='-':
+      profiler.dump_json(sys.stdout)
+      print()
+   elif args.profile_json:
+      with open(args.profile_json,'w',encoding='utf-8') as f:
+         profiler.dump_json(f)
    
 if __name__=='__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,273 @@
+from collections import OrderedDict
+
+from Utils.lexer_pascal import TokenType
+from Utils.Semantic_Analyzer_pascal import promoted,type_name
+from Utils.cache_pascal import source_key,analyze
+from Utils.visitor_pascal import NodeVisitor
+from Utils.callstack_pascal import ActivationRecord,ARType
+
+# Pascal names are prefixed so they can never clash with Python keywords,
+# builtins or the helper names used by the generated code.
+def _var(name):
+    return f'v_{name}'
+
+def _proc(name):
+    return f'p_{name}'
+
+# Python binds these operators like Pascal does, unary signs tighter than
+# all of them
+_PRECEDENCE={
+    TokenType.PLUS:1,
+    TokenType.MINUS:1,
+    TokenType.MUL:2,
+    TokenType.INT_DIV:2,
+    TokenType.FLOAT_DIV:2,
+}
+_OPERATORS={
+    TokenType.PLUS:'+',
+    TokenType.MINUS:'-',
+    TokenType.MUL:'*',
+    TokenType.INT_DIV:'//',
+    TokenType.FLOAT_DIV:'/',
+}
+_UNARY_PRECEDENCE=3
+_ATOM_PRECEDENCE=4
+# below the 200 nested parentheses the parser allows
+_MAX_DEPTH=100
+
+def _operand(value,precedence):
+    code,operand_precedence,_=value
+    if operand_precedence<precedence:
+        return '('+code+')'
+    return code
+
+class _Frame(object):
+    def __init__(self,params,level):
+        self.params=params
+        self.level=level
+        self.names=list(params)
+        self.nonlocals=[]
+        self.decls=[]
+        self.body=[]
+        self.temporaries=0
+
+    def add(self,name):
+        if name not in self.names:
+            self.names.append(name)
+
+    def temporary(self):
+        # not a Pascal name, those all start with v_ or p_
+        self.temporaries+=1
+        return f'_t{self.temporaries}'
+
+class PyCompiler(NodeVisitor):
+    def __init__(self):
+        self.frame=None
+
+    def compile(self,tree):
+        return '\n'.join(self.visit(tree))+'\n'
+
+    def visit_Program(self,node):
+        self.frame=_Frame([],1)
+        self.visit(node.block)
+        frame=self.frame
+        result=', '.join(f'{name!r}: {_var(name)}' for name in frame.names if name not in node.internal_names)
+        lines=[f'# program {node.name}','def _program():']
+        lines.extend(self.function_body(frame))
+        lines.append(f'    return {{name: value for name, value in {{{result}}}.items() if value is not None}}')
+        return lines
+
+    def function_body(self,frame):
+        # Variables of enclosing procedures are read through Python's own
+        # closures and written through nonlocal. Every declared local starts
+        # out unset, like a missing ActivationRecord member.
+        lines=[]
+        if frame.nonlocals:
+            lines.append('    nonlocal '+', '.join(_var(name) for name in frame.nonlocals))
+        lines.extend(f'    {_var(name)}=None' for name in frame.names if name not in frame.params)
+        for decl in frame.decls:
+            lines.extend('    '+line for line in decl)
+        lines.extend('    '+line for line in frame.body)
+        if len(lines)==0:
+            lines.append('    pass')
+        return lines
+
+    def visit_Block(self,node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.visit(node.compound_statement)
+
+    def visit_VarDecl(self,node):
+        self.frame.add(node.var_node.value)
+
+    def visit_Type(self,node):
+        pass
+
+    def visit_ProcedureDecl(self,node):
+        outer=self.frame
+        params=[param.var_node.value for param in node.params]
+        self.frame=_Frame(params,outer.level+1)
+        self.visit(node.block_node)
+        frame=self.frame
+        self.frame=outer
+        args=','.join(_var(name) for name in params)
+        decl=[f'def {_proc(node.proc_name)}({args}):']
+        decl.extend(self.function_body(frame))
+        outer.decls.append(decl)
+
+    def visit_Compound(self,node):
+        for child in node.children:
+            self.visit(child)
+
+    def visit_NoOp(self,node):
+        pass
+
+    def visit_Assign(self,node):
+        var_name=node.left.value
+        frame=self.frame
+        if node.left.scope_level!=frame.level and var_name not in frame.nonlocals:
+            frame.nonlocals.append(var_name)
+        frame.body.append(f'{_var(var_name)}={self.stored(node.right,node.left.expr_type)}')
+
+    def stored(self,node,target_type):
+        # an INTEGER value stored in a REAL variable or parameter becomes a
+        # float, only those stores get a conversion
+        code=self.expression(node,target_type)[0]
+        if not promoted(target_type,node) or type(node).__name__=='Num':
+            return code
+        if type(node).__name__=='Var':
+            # an unassigned variable is copied as it is
+            return f'(None if {code} is None else float({code}))'
+        return f'float({code})'
+
+    def expression(self,node,operation_type=None):
+        # Emits node with an explicit stack, each value is (code, precedence,
+        # depth). Operands are parenthesized only where Python's precedence
+        # needs it, the operators are left associative so a right operand of
+        # the same precedence keeps its parentheses. INTEGER constants of a
+        # REAL operation are written as floats, other INTEGER operands are
+        # promoted by Python's mixed arithmetic.
+        values=[]
+        stack=[(node,False,operation_type)]
+        while stack:
+            node,expanded,operation_type=stack.pop()
+            kind=type(node).__name__
+            if kind=='BinOp':
+                if expanded:
+                    right=values.pop()
+                    left=values.pop()
+                    precedence=_PRECEDENCE[node.op.type]
+                    code=_operand(left,precedence)+_OPERATORS[node.op.type]+_operand(right,precedence+1)
+                    values.append(self.spilled(code,precedence,max(left[2],right[2])+1))
+                else:
+                    stack.append((node,True,operation_type))
+                    stack.append((node.right,False,node.expr_type))
+                    stack.append((node.left,False,node.expr_type))
+            elif kind=='UnaryOp':
+                if expanded:
+                    expr=values.pop()
+                    op='+' if node.op.type==TokenType.PLUS else '-'
+                    values.append(self.spilled(op+_operand(expr,_UNARY_PRECEDENCE),_UNARY_PRECEDENCE,expr[2]+1))
+                else:
+                    stack.append((node,True,operation_type))
+                    stack.append((node.expr,False,None))
+            elif kind=='Num':
+                value=float(node.value) if promoted(operation_type,node) else node.value
+                # folded constants can be negative, -5 is a unary minus
+                values.append((repr(value),_UNARY_PRECEDENCE if value<0 else _ATOM_PRECEDENCE,1))
+            elif kind=='Var':
+                values.append((_var(node.value),_ATOM_PRECEDENCE,1))
+            else:
+                raise Exception(f'No Python expression for {kind}')
+        return values.pop()
+
+    def spilled(self,code,precedence,depth):
+        # Python's parser and compiler recurse on nested expressions, a part
+        # nested _MAX_DEPTH deep is computed into a temporary first
+        if depth<_MAX_DEPTH:
+            return code,precedence,depth
+        name=self.frame.temporary()
+        self.frame.body.append(f'{name}={code}')
+        return name,_ATOM_PRECEDENCE,1
+
+    def visit_ProcedureCall(self,node):
+        params=node.proc_symbol.params
+        args=','.join(self.stored(argument_node,type_name(param_symbol)) for param_symbol,argument_node in zip(params,node.actual_params))
+        self.frame.body.append(f'{_proc(node.proc_name)}({args})')
+
+# The cache holds the last _CACHE_SIZE programs compiled from source, keyed
+# by a hash of the Pascal text, with their name, Python source and code.
+_CACHE_SIZE=128
+_code_cache=OrderedDict()
+
+def compile_source(text):
+    key=source_key(text)
+    entry=_code_cache.get(key)
+    if entry is not None:
+        _code_cache.move_to_end(key)
+        return entry
+    tree=analyze(text)
+    source=PyCompiler().compile(tree)
+    entry=_code_cache[key]=(tree.name,source,compile(source,f'<pascal {key[:12]}>','exec'))
+    while len(_code_cache)>_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return entry
+
+def clear_cache():
+    _code_cache.clear()
+
+class PyInterpreter(object):
+    def __init__(self,tree,limits=None):
+        if limits is not None:
+            raise ValueError('PyInterpreter cannot enforce ExecutionLimits')
+        self.tree=tree
+        self.name=None
+        self.source=None
+        self.code=None
+        self.program_record=None
+        if tree is not None:
+            self.name=tree.name
+            self.source=PyCompiler().compile(tree)
+            self.code=compile(self.source,f'<pascal {tree.name}>','exec')
+
+    @classmethod
+    def from_source(cls,text):
+        # a program seen before skips the front end, the translation and
+        # compile()
+        interpreter=cls(None)
+        interpreter.name,interpreter.source,interpreter.code=compile_source(text)
+        return interpreter
+
+    def interpret(self):
+        if self.code is None:
+            return ''
+        namespace={}
+        exec(self.code,namespace)
+        record=ActivationRecord(name=self.name,type=ARType.PROGRAM,nesting_level=1)
+        record.members.update(namespace['_program']())
+        self.program_record=record
+
+if __name__ == '__main__':
+    text = """
+program Main;
+   var x, y : integer;
+   var r : real;
+
+   procedure Alpha(a : integer; b : integer);
+      var x : integer;
+   begin { Alpha }
+      x := (a + b) * 2;
+   end;  { Alpha }
+
+begin { Main }
+   x := 7;
+   Alpha(3 + 5, 7);
+   r := x / 2;
+   y := x DIV 2 + -x
+end.  { Main }
+"""
+
+    interpreter = PyInterpreter.from_source(text)
+    print(interpreter.source)
+    interpreter.interpret()
+    print(interpreter.program_record)
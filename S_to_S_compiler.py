@@ -1,14 +1,8 @@
 from collections import OrderedDict
+from decimal import Decimal
 from Utils.lexer_pascal import Lexer,TokenType
 from Utils.Parser_pascal import Parser
-
-class NodeVisitor(object):
-    def visit(self,node):
-        method_name='visit_'+type(node).__name__
-        visitor=getattr(self,method_name,self.generic_visit)
-        return visitor(node)
-    def generic_visit(self,node):
-        raise Exception(f'No visit_{type(node).__name__} method')
+from Utils.visitor_pascal import NodeVisitor
 
 class Symbol(object):
     def __init__(self,name,type=None):
@@ -83,6 +77,36 @@ class ScopedSymbolTable(object):
         if self.enclosing_scope is not None:
             return self.enclosing_scope.lookup(name)
     
+# How tightly each operator binds, a sign binds tighter than any binary
+# operator and a variable or number is never parenthesized
+_PRECEDENCE={
+    TokenType.PLUS:1,
+    TokenType.MINUS:1,
+    TokenType.MUL:2,
+    TokenType.INT_DIV:2,
+    TokenType.FLOAT_DIV:2,
+}
+_UNARY_PRECEDENCE=3
+_ATOM_PRECEDENCE=4
+
+def _real_literal(value):
+    # The lexers only read digits.digits, repr gives 1e+20 or 1e-07 for
+    # large and small values. Decimal writes the same digits out in full.
+    text=repr(value)
+    if 'e' in text:
+        text=format(Decimal(text),'f')
+    if '.' not in text:
+        text+='.0'
+    return text
+
+def _precedence(node):
+    kind=node.__class__.__name__
+    if kind=='BinOp':
+        return _PRECEDENCE[node.op.type]
+    if kind=='UnaryOp':
+        return _UNARY_PRECEDENCE
+    return _ATOM_PRECEDENCE
+
 class S2SCompiler(NodeVisitor):
     def __init__(self):
         self.current_scope=None
@@ -120,9 +144,18 @@ class S2SCompiler(NodeVisitor):
         indent='\t'*(self.current_scope.scope_level)
         self.code.append(indent+l+' := '+r+';')
     
+    def operand(self,node,precedence):
+        code=self.visit(node)
+        if _precedence(node)<precedence:
+            return '('+code+')'
+        return code
+
     def visit_BinOp(self,node):
-        l=self.visit(node.left)
-        r=self.visit(node.right)
+        # the operators are left associative, a right operand of the same
+        # precedence keeps its parentheses
+        precedence=_PRECEDENCE[node.op.type]
+        l=self.operand(node.left,precedence)
+        r=self.operand(node.right,precedence+1)
         if node.op.type==TokenType.PLUS:
             l+=' + '+r
         elif node.op.type==TokenType.MINUS:
@@ -135,6 +168,22 @@ class S2SCompiler(NodeVisitor):
             l+=' / '+r
         return l
     
+    def visit_UnaryOp(self,node):
+        e=self.operand(node.expr,_UNARY_PRECEDENCE)
+        if node.op.type==TokenType.PLUS:
+            return '+'+e
+        return '-'+e
+    
+    def visit_Num(self,node):
+        if isinstance(node.value,float):
+            return _real_literal(node.value)
+        return str(node.value)
+    
+    def visit_ProcedureCall(self,node):
+        args=', '.join(self.visit(argument_node) for argument_node in node.actual_params)
+        indent='\t'*(self.current_scope.scope_level)
+        self.code.append(indent+f'{node.proc_name}({args});')
+    
     def visit_NoOp(self,node):
         self.code.append(' ')
         pass
@@ -1,30 +1,58 @@
-from Utils.lexer_pascal import ErrorCode,TokenType
-from Utils.callstack_pascal import CallStack,ActivationRecord,ARType
+import operator
 
-class NodeVisitor(object):
-    def visit(self,node):
-        method_name='visit_'+type(node).__name__
-        visitor=getattr(self,method_name,self.generic_visit)
-        return visitor(node)
-    def generic_visit(self,node):
-        raise Exception(f'No visit_{type(node).__name__} method')
+from Utils.lexer_pascal import Error,ErrorCode,TokenType
+from Utils.Parser_pascal import BinOp,UnaryOp,Var
+from Utils.callstack_pascal import CallStack,ActivationRecord,SlotActivationRecord,ARType
+from Utils.visitor_pascal import NodeVisitor
+from Utils.trace_pascal import TraceLevel,default_tracer
+from Utils.limits_pascal import recursion_limit_error,interpreter_error
+from Utils.Semantic_Analyzer_pascal import promoted,type_name
+
+# The SemanticAnalyzer types every expression and rejects DIV on REALs, so
+# each operator is one Python operation with no conversions: DIV only ever
+# sees INTEGERs and / is true division for INTEGER and REAL operands alike.
+_BINARY_OPS={
+    TokenType.PLUS:operator.add,
+    TokenType.MINUS:operator.sub,
+    TokenType.MUL:operator.mul,
+    TokenType.INT_DIV:operator.floordiv,
+    TokenType.FLOAT_DIV:operator.truediv,
+}
 
 class Interpreter(NodeVisitor):
-    def __init__(self,tree):
+    def __init__(self,tree,profiler=None,tracer=None,limits=None):
         self.tree=tree
         self.call_stack=CallStack()
+        self.program_record=None
+        self.tracer=tracer if tracer is not None else default_tracer
+        # decided once, the visit methods only test this flag
+        self.tracing=self.tracer.enabled(TraceLevel.DEBUG,'interpreter')
+        self.profiler=profiler
+        if profiler is not None:
+            self.visit=profiler.instrument(self.visit)
+        self.limits=limits
+        if limits is not None:
+            self.visit=limits.instrument(self.visit)
+
+    def visit(self,node):
+        # NodeVisitor.visit, and the visit running when Python raised turns
+        # the exception into an Error at its node. The visits around it see
+        # an Error and pass it on.
+        try:
+            method=self._dispatch[node.__class__]
+        except KeyError:
+            method=self._resolve(node.__class__)
+        try:
+            return method(self,node)
+        except Error:
+            raise
+        except RecursionError as e:
+            raise recursion_limit_error(node) from e
+        except Exception as e:
+            raise interpreter_error(node,e) from e
     
     def visit_BinOp(self,node):
-        if node.op.type==TokenType.PLUS:
-            return self.visit(node.left)+self.visit(node.right)
-        elif node.op.type==TokenType.MINUS:
-            return self.visit(node.left)-self.visit(node.right)
-        elif node.op.type==TokenType.MUL:
-            return self.visit(node.left)*self.visit(node.right)
-        elif node.op.type==TokenType.INT_DIV:
-            return self.visit(node.left)//self.visit(node.right)
-        elif node.op.type==TokenType.FLOAT_DIV:
-            return float(self.visit(node.left))/float(self.visit(node.right))
+        return _BINARY_OPS[node.op.type](self.visit(node.left),self.visit(node.right))
     
     def visit_UnaryOp(self,node):
         op=node.op.type
@@ -42,39 +70,50 @@ class Interpreter(NodeVisitor):
     
     def visit_ProcedureCall(self,node):
         proc_name=node.proc_name
-        ar=ActivationRecord(name=proc_name,type=ARType.PROCEDURE,nesting_level=2)
         proc_symbol=node.proc_symbol
+        ar=ActivationRecord(name=proc_name,type=ARType.PROCEDURE,nesting_level=proc_symbol.scope_level)
         formal_params=proc_symbol.params
         actual_params=node.actual_params
         for param_symbol,argument_node in zip(formal_params,actual_params):
-            ar[param_symbol.name]=self.visit(argument_node)
+            value=self.visit(argument_node)
+            if promoted(type_name(param_symbol),argument_node):
+                value=self.to_real(value)
+            ar[param_symbol.name]=value
 
         self.call_stack.push(ar)
         
-        self.log(f'ENTER: PROCEDURE {proc_name}')
-        self.log(str(self.call_stack))
+        if self.tracing:
+            self.log('ENTER: PROCEDURE {}',proc_name)
+            self.log('{}',self.call_stack)
         
         self.visit(proc_symbol.block_ast)
         
-        self.log(f'LEAVE: PROCEDURE {proc_name}')
-        self.log(str(self.call_stack))
+        if self.tracing:
+            self.log('LEAVE: PROCEDURE {}',proc_name)
+            self.log('{}',self.call_stack)
         
         self.call_stack.pop()
 
     def visit_Assign(self,node):
         var_name=node.left.value
         var_value=self.visit(node.right)
-        ar=self.call_stack.peek()
+        if promoted(node.left.expr_type,node.right):
+            var_value=self.to_real(var_value)
+        ar=self.call_stack.display[node.left.scope_level]
         ar[var_name]=var_value
+
+    def to_real(self,value):
+        # an unassigned variable is copied as it is, like any other
+        return float(value) if value is not None else None
     
     def visit_Var(self,node):
         var_name=node.value
-        ar=self.call_stack.peek()
+        ar=self.call_stack.display[node.scope_level]
         val=ar.get(var_name)
         return val
     
-    def log(self,msg):
-        print(msg)
+    def log(self,msg,*args):
+        self.tracer.emit(TraceLevel.DEBUG,'interpreter',msg,*args)
     
     def visit_Program(self,node):
         program_name=node.name
@@ -82,13 +121,17 @@ class Interpreter(NodeVisitor):
         ar=ActivationRecord(name=program_name,type=ARType.PROGRAM,nesting_level=1)
         self.call_stack.push(ar)
         
-        self.log(str(self.call_stack))
+        if self.tracing:
+            self.log('{}',self.call_stack)
         self.visit(node.block)
         
-        self.log(f'LEAVE: PROGRAM {program_name}')
-        self.log(str(self.call_stack))
+        if self.tracing:
+            self.log('LEAVE: PROGRAM {}',program_name)
+            self.log('{}',self.call_stack)
         
-        self.call_stack.pop()
+        # kept so callers can read the final values of the globals
+        self.program_record=self.call_stack.pop()
+        self.program_record.discard(node.internal_names)
         
     
     def visit_ProcedureDecl(self,node):
@@ -112,4 +155,286 @@ class Interpreter(NodeVisitor):
         tree=self.tree
         if tree is None:
             return ''
+        if self.limits is not None:
+            self.limits.start()
         return self.visit(tree)
+
+class SlotInterpreter(Interpreter):
+    def visit_Var(self,node):
+        return self.call_stack.display[node.scope_level].slots[node.index]
+
+    def visit_Assign(self,node):
+        var_value=self.visit(node.right)
+        left=node.left
+        if promoted(left.expr_type,node.right):
+            var_value=self.to_real(var_value)
+        self.call_stack.display[left.scope_level].slots[left.index]=var_value
+
+    def visit_ProcedureCall(self,node):
+        proc_name=node.proc_name
+        proc_symbol=node.proc_symbol
+        ar=SlotActivationRecord(name=proc_name,type=ARType.PROCEDURE,nesting_level=proc_symbol.scope_level,names=proc_symbol.slot_names)
+        slots=ar.slots
+        for param_symbol,argument_node in zip(proc_symbol.params,node.actual_params):
+            value=self.visit(argument_node)
+            if promoted(type_name(param_symbol),argument_node):
+                value=self.to_real(value)
+            slots[param_symbol.index]=value
+
+        self.call_stack.push(ar)
+        
+        if self.tracing:
+            self.log('ENTER: PROCEDURE {}',proc_name)
+            self.log('{}',self.call_stack)
+        
+        self.visit(proc_symbol.block_ast)
+        
+        if self.tracing:
+            self.log('LEAVE: PROCEDURE {}',proc_name)
+            self.log('{}',self.call_stack)
+        
+        self.call_stack.pop()
+
+    def visit_Program(self,node):
+        program_name=node.name
+        
+        ar=SlotActivationRecord(name=program_name,type=ARType.PROGRAM,nesting_level=1,names=node.slot_names)
+        self.call_stack.push(ar)
+        
+        if self.tracing:
+            self.log('{}',self.call_stack)
+        self.visit(node.block)
+        
+        if self.tracing:
+            self.log('LEAVE: PROGRAM {}',program_name)
+            self.log('{}',self.call_stack)
+        
+        self.program_record=self.call_stack.pop()
+        self.program_record.discard(node.internal_names)
+
+_PUSH_NUM,_PUSH_VAR,_ADD,_SUB,_MUL,_INT_DIV,_FLOAT_DIV,_NEG,_POS=range(9)
+
+_POSTFIX_OPS={
+    TokenType.PLUS:_ADD,
+    TokenType.MINUS:_SUB,
+    TokenType.MUL:_MUL,
+    TokenType.INT_DIV:_INT_DIV,
+    TokenType.FLOAT_DIV:_FLOAT_DIV,
+}
+
+def postfix(node):
+    # Flattens an expression tree into postfix (op, arg1, arg2) tuples using
+    # an explicit stack, so the depth of the tree never turns into Python
+    # recursion. The entries carry the type of the parent operation, the
+    # INTEGER constants of a REAL operation are pushed as floats.
+    code=[]
+    stack=[(node,False,None)]
+    while stack:
+        node,expanded,parent_type=stack.pop()
+        kind=node.__class__.__name__
+        if kind=='BinOp':
+            if expanded:
+                code.append((_POSTFIX_OPS[node.op.type],None,None))
+            else:
+                stack.append((node,True,parent_type))
+                stack.append((node.right,False,node.expr_type))
+                stack.append((node.left,False,node.expr_type))
+        elif kind=='UnaryOp':
+            if expanded:
+                code.append((_POS if node.op.type==TokenType.PLUS else _NEG,None,None))
+            else:
+                stack.append((node,True,parent_type))
+                stack.append((node.expr,False,None))
+        elif kind=='Num':
+            code.append((_PUSH_NUM,float(node.value) if promoted(parent_type,node) else node.value,None))
+        elif kind=='Var':
+            code.append((_PUSH_VAR,node.scope_level,node.value))
+        else:
+            raise Exception(f'No postfix form for {kind}')
+    return code
+
+class StackInterpreter(Interpreter):
+    # Evaluates every expression from its postfix form with a value stack
+    # instead of recursing through visit_BinOp, the postfix code is built
+    # once per expression and reused. ExecutionLimits are charged one step
+    # per postfix op, the same count as one per visited node. A Profiler
+    # only sees the root of each expression, the time and count of the
+    # whole expression go to that node, and an error in it is reported
+    # at that node.
+    def __init__(self,tree,profiler=None,tracer=None,limits=None):
+        super().__init__(tree,profiler,tracer,limits)
+        self.postfix_cache={}
+
+    def evaluate(self,node):
+        code=self.postfix_cache.get(node)
+        if code is None:
+            code=self.postfix_cache[node]=postfix(node)
+        if self.limits is not None:
+            # the visit of node itself was the first step
+            self.limits.charge(len(code)-1,node)
+        display=self.call_stack.display
+        stack=[]
+        push=stack.append
+        pop=stack.pop
+        for op,arg1,arg2 in code:
+            if op==_PUSH_VAR:
+                push(display[arg1].get(arg2))
+            elif op==_PUSH_NUM:
+                push(arg1)
+            elif op==_NEG:
+                push(-pop())
+            elif op==_POS:
+                push(+pop())
+            else:
+                right=pop()
+                left=pop()
+                if op==_ADD:
+                    push(left+right)
+                elif op==_SUB:
+                    push(left-right)
+                elif op==_MUL:
+                    push(left*right)
+                elif op==_INT_DIV:
+                    push(left//right)
+                else:
+                    push(left/right)
+        return pop()
+
+    visit_BinOp=evaluate
+    visit_UnaryOp=evaluate
+
+# Quickened node classes. QuickeningInterpreter swaps the class of a
+# Parser_pascal node for one of these in place, they add no state of their
+# own. The original classes are put back when the run ends, so the other
+# visitors never see them.
+class IntAdd(BinOp): pass
+class IntSub(BinOp): pass
+class IntMul(BinOp): pass
+class IntDiv(BinOp): pass
+class FloatAdd(BinOp): pass
+class FloatSub(BinOp): pass
+class FloatMul(BinOp): pass
+# one operator for any operand types, no guard
+class Add(BinOp): pass
+class Sub(BinOp): pass
+class Mul(BinOp): pass
+class FloorDiv(BinOp): pass
+class RealDiv(BinOp): pass
+class Neg(UnaryOp): pass
+class Pos(UnaryOp): pass
+class SlotVar(Var): pass
+
+# (operator, operand type) -> quickened class, None is for operands of mixed
+# or changing types
+_QUICKENED={
+    (TokenType.PLUS,int):IntAdd,
+    (TokenType.MINUS,int):IntSub,
+    (TokenType.MUL,int):IntMul,
+    (TokenType.INT_DIV,int):IntDiv,
+    (TokenType.PLUS,float):FloatAdd,
+    (TokenType.MINUS,float):FloatSub,
+    (TokenType.MUL,float):FloatMul,
+    (TokenType.PLUS,None):Add,
+    (TokenType.MINUS,None):Sub,
+    (TokenType.MUL,None):Mul,
+    (TokenType.INT_DIV,None):FloorDiv,
+    (TokenType.FLOAT_DIV,None):RealDiv,
+}
+
+def _guarded(operation,value_type):
+    def visit(self,node):
+        left=self.visit(node.left)
+        right=self.visit(node.right)
+        if type(left) is value_type and type(right) is value_type:
+            return operation(left,right)
+        return self.despecialize(node,left,right)
+    return visit
+
+def _unguarded(operation):
+    def visit(self,node):
+        return operation(self.visit(node.left),self.visit(node.right))
+    return visit
+
+class QuickeningInterpreter(SlotInterpreter):
+    # Self-specializing tree walker. A BinOp is quickened on its first
+    # execution for the operand types it saw, e.g. into IntAdd, whose visit
+    # method does the one operation behind a type guard. A guard that fails
+    # turns the node back into a BinOp, which is quickened again on its next
+    # execution, after MAX_DESPECIALIZE failures it gets the unguarded
+    # operator class instead. UnaryOps and resolved Vars don't need a guard.
+    # Only Parser_pascal trees are quickened, compact and flat nodes are
+    # evaluated as they are. interpret() restores the tree.
+    MAX_DESPECIALIZE=2
+
+    def __init__(self,tree,profiler=None,tracer=None,limits=None):
+        super().__init__(tree,profiler,tracer,limits)
+        # node -> its class before quickening
+        self.quickened={}
+        # node -> number of failed guards
+        self.despecialized={}
+
+    def interpret(self):
+        try:
+            return super().interpret()
+        finally:
+            for node,node_class in self.quickened.items():
+                node.__class__=node_class
+            self.quickened.clear()
+            self.despecialized.clear()
+
+    def quicken(self,node,node_class):
+        self.quickened.setdefault(node,node.__class__)
+        node.__class__=node_class
+
+    def visit_BinOp(self,node):
+        left=self.visit(node.left)
+        right=self.visit(node.right)
+        op=node.op.type
+        if node.__class__ is BinOp:
+            value_type=type(left)
+            if value_type is not type(right) or value_type not in (int,float) or self.despecialized.get(node,0)>=self.MAX_DESPECIALIZE:
+                value_type=None
+            self.quicken(node,_QUICKENED.get((op,value_type)) or _QUICKENED[op,None])
+        return _BINARY_OPS[op](left,right)
+
+    def despecialize(self,node,left,right):
+        node.__class__=BinOp
+        self.despecialized[node]=self.despecialized.get(node,0)+1
+        if self.tracing:
+            self.log('DESPECIALIZE: {} at line {}',node.op.value,node.op.lineno)
+        return _BINARY_OPS[node.op.type](left,right)
+
+    visit_IntAdd=_guarded(operator.add,int)
+    visit_IntSub=_guarded(operator.sub,int)
+    visit_IntMul=_guarded(operator.mul,int)
+    visit_IntDiv=_guarded(operator.floordiv,int)
+    visit_FloatAdd=_guarded(operator.add,float)
+    visit_FloatSub=_guarded(operator.sub,float)
+    visit_FloatMul=_guarded(operator.mul,float)
+    visit_Add=_unguarded(operator.add)
+    visit_Sub=_unguarded(operator.sub)
+    visit_Mul=_unguarded(operator.mul)
+    visit_FloorDiv=_unguarded(operator.floordiv)
+    visit_RealDiv=_unguarded(operator.truediv)
+
+    def visit_UnaryOp(self,node):
+        if node.__class__ is UnaryOp:
+            self.quicken(node,Pos if node.op.type==TokenType.PLUS else Neg)
+        return super().visit_UnaryOp(node)
+
+    def visit_Neg(self,node):
+        return -self.visit(node.expr)
+
+    def visit_Pos(self,node):
+        return +self.visit(node.expr)
+
+    def visit_Var(self,node):
+        # a Var the analyzer gave no slot is looked up by name every time
+        if node.index is None:
+            return self.call_stack.display[node.scope_level].get(node.value)
+        if node.__class__ is Var:
+            self.quicken(node,SlotVar)
+        return self.call_stack.display[node.scope_level].slots[node.index]
+
+    def visit_SlotVar(self,node):
+        return self.call_stack.display[node.scope_level].slots[node.index]
@@ -1,4 +1,5 @@
 from Utils.lexer_pascal import ErrorCode,TokenType,ParserError
+from Utils.token_buffer_pascal import TOKEN_TYPES
 
 class AST(object):
     pass
@@ -8,16 +9,19 @@ class BinOp(AST):
         self.left=left
         self.token=self.op=op
         self.right=right
+        self.expr_type=None
 
 class UnaryOp(AST):
     def __init__(self,op,expr):
         self.token=self.op=op
         self.expr=expr
+        self.expr_type=None
     
 class Num(AST):
     def __init__(self,token):
         self.token=token
         self.value=token.value
+        self.expr_type=None
 
 class Param(AST):
     def __init__(self, var_node,type_node):
@@ -28,6 +32,9 @@ class Program(AST):
     def __init__(self,name,block):
         self.name=name
         self.block=block   
+        self.slot_names=None
+        # compiler temporaries, not part of the state the program reports
+        self.internal_names=frozenset()
         
 class Block(AST):
     def __init__(self,declarations,compount_statement):
@@ -71,39 +78,122 @@ class Var(AST):
     def __init__(self,token):
         self.token=token
         self.value=token.value
+        self.scope_level=None
+        self.index=None
+        self.expr_type=None
 
 class NoOp(AST):
     pass
     
+class TreeBuilder(object):
+    # Called by the Parser for every node it creates. Other builders can
+    # produce a different tree representation from the same grammar.
+    def bin_op(self,left,op,right):
+        return BinOp(left,op,right)
+    
+    def unary_op(self,op,expr):
+        return UnaryOp(op,expr)
+    
+    def num(self,token):
+        return Num(token)
+    
+    def var(self,token):
+        return Var(token)
+    
+    def param(self,var_node,type_node):
+        return Param(var_node,type_node)
+    
+    def program(self,name,block):
+        return Program(name,block)
+    
+    def block(self,declarations,compound_statement):
+        return Block(declarations,compound_statement)
+    
+    def var_decl(self,var_node,type_node):
+        return VarDecl(var_node,type_node)
+    
+    def procedure_decl(self,proc_name,params,block_node):
+        return ProcedureDecl(proc_name,params,block_node)
+    
+    def type_spec(self,token):
+        return Type(token)
+    
+    def compound(self,children):
+        node=Compound()
+        node.children.extend(children)
+        return node
+    
+    def assign(self,left,op,right):
+        return Assign(left,op,right)
+    
+    def procedure_call(self,proc_name,actual_params,token):
+        return ProcedureCall(proc_name=proc_name,actual_params=actual_params,token=token)
+    
+    def no_op(self):
+        return NoOp()
+    
+    def finish(self,root):
+        return root
+    
+_BINARY_PRECEDENCE={
+    TokenType.PLUS:1,
+    TokenType.MINUS:1,
+    TokenType.MUL:2,
+    TokenType.INT_DIV:2,
+    TokenType.FLOAT_DIV:2,
+}
+
 class Parser(object):
-    def __init__(self,lexer):
+    def __init__(self,lexer,builder=None,iterative=False):
+        self.build=builder if builder is not None else TreeBuilder()
+        if iterative:
+            self.expr=self.expr_iterative
         self.lexer=lexer
         self.current_token=self.lexer.get_next_token()
+        self.current_type=self.current_token.type
+        self.next_token=None
+    
+    @property
+    def current_value(self):
+        return self.current_token.value
     
     def error(self,error_code,token):
         raise ParserError(error_code=error_code,token=token,message=f"{error_code.value} -> {token}")
     
     def eat(self,token_type):
-        if self.current_token.type==token_type:
-            self.current_token=self.lexer.get_next_token()
+        if self.current_type==token_type:
+            if self.next_token is None:
+                self.current_token=self.lexer.get_next_token()
+            else:
+                self.current_token,self.next_token=self.next_token,None
+            self.current_type=self.current_token.type
         else:
             self.error(error_code=ErrorCode.UNEXPECTED_TOKEN,token=self.current_token)
     
+    def peek_type(self):
+        # one token of lookahead, kept until eat moves onto it
+        if self.next_token is None:
+            self.next_token=self.lexer.get_next_token()
+        return self.next_token.type
+    
+    def at_call(self):
+        return self.peek_type()==TokenType.LBRAK
+    
     def block(self):
         declaration_nodes=self.declarations()
         compound_statement_node=self.compound_statement()
-        node=Block(declaration_nodes,compound_statement_node)
+        node=self.build.block(declaration_nodes,compound_statement_node)
         return node
     
     def declarations(self):
         declarations=[]
-        while self.current_token.type==TokenType.VAR:
+        while self.current_type==TokenType.VAR:
             self.eat(TokenType.VAR)
-            while self.current_token.type==TokenType.ID:
+            while self.current_type==TokenType.ID:
                 var_decl=self.variable_declarations()
                 declarations.extend(var_decl)
                 self.eat(TokenType.SEMI)
-        while self.current_token.type==TokenType.PROCEDURE:
+        while self.current_type==TokenType.PROCEDURE:
             proc_decl=self.procedure_declaration()
             declarations.append(proc_decl)
         
@@ -111,28 +201,28 @@ class Parser(object):
 
     def procedure_declaration(self):
         self.eat(TokenType.PROCEDURE)
-        proc_name=self.current_token.value
+        proc_name=self.current_value
         self.eat(TokenType.ID)
         params=[]
         
-        if self.current_token.type==TokenType.LBRAK:
+        if self.current_type==TokenType.LBRAK:
             self.eat(TokenType.LBRAK)
             params=self.formal_parameter_list()
             self.eat(TokenType.RBRAK)
         
         self.eat(TokenType.SEMI)
         block_node=self.block()
-        proc_decl=ProcedureDecl(proc_name,params,block_node)
+        proc_decl=self.build.procedure_decl(proc_name,params,block_node)
         self.eat(TokenType.SEMI)
         return proc_decl
     
     def formal_parameter_list(self):
-        if not self.current_token.type==TokenType.ID:
+        if not self.current_type==TokenType.ID:
             return []
         
         param_nodes=self.formal_parameters()
         
-        while self.current_token.type==TokenType.SEMI:
+        while self.current_type==TokenType.SEMI:
             self.eat(TokenType.SEMI)
             param_nodes.extend(self.formal_parameters())
             
@@ -142,7 +232,7 @@ class Parser(object):
         param_nodes=[]
         param_tokens=[self.current_token]
         self.eat(TokenType.ID)
-        while self.current_token.type==TokenType.COMMA:
+        while self.current_type==TokenType.COMMA:
             self.eat(TokenType.COMMA)
             param_tokens.append(self.current_token)
             self.eat(TokenType.ID)
@@ -151,42 +241,42 @@ class Parser(object):
         type_node=self.type_spec()
         
         for param_token in param_tokens:
-            param_node=Param(Var(param_token),type_node)
+            param_node=self.build.param(self.build.var(param_token),type_node)
             param_nodes.append(param_node)
         return param_nodes
             
     def variable_declarations(self):
-        var_nodes=[Var(self.current_token)]
+        var_nodes=[self.build.var(self.current_token)]
         self.eat(TokenType.ID)
         
-        while self.current_token.type==TokenType.COMMA:
+        while self.current_type==TokenType.COMMA:
             self.eat(TokenType.COMMA)
-            var_nodes.append(Var(self.current_token))
+            var_nodes.append(self.build.var(self.current_token))
             self.eat(TokenType.ID)
         
         self.eat(TokenType.COLON)
         
         type_node=self.type_spec()
-        var_declarations=[VarDecl(var_node,type_node) for var_node in var_nodes]
+        var_declarations=[self.build.var_decl(var_node,type_node) for var_node in var_nodes]
         
         return var_declarations
     
     def type_spec(self):
         token=self.current_token
-        if self.current_token.type==TokenType.INT:
+        if self.current_type==TokenType.INT:
             self.eat(TokenType.INT)
         else:
             self.eat(TokenType.REAL)
-        node=Type(token)
+        node=self.build.type_spec(token)
         return node           
     
     def program(self):
         self.eat(TokenType.PROGRAM)
-        var_node=self.variable()
-        prog_name=var_node.value
+        prog_name=self.current_value
+        self.eat(TokenType.ID)
         self.eat(TokenType.SEMI)
         block_node=self.block()
-        program_node=Program(prog_name,block_node)
+        program_node=self.build.program(prog_name,block_node)
         self.eat(TokenType.DOT)
         return program_node
     
@@ -195,27 +285,25 @@ class Parser(object):
         nodes=self.statement_list()
         self.eat(TokenType.END)
         
-        root=Compound()
-        for node in nodes:
-            root.children.append(node)
+        root=self.build.compound(nodes)
         return root
 
     def statement_list(self):
         node=self.statement()
         results=[node]
         
-        while self.current_token.type==TokenType.SEMI:
+        while self.current_type==TokenType.SEMI:
             self.eat(TokenType.SEMI)
             results.append(self.statement())
         
         return results
     
     def statement(self):
-        if self.current_token.type==TokenType.BEGIN:
+        if self.current_type==TokenType.BEGIN:
             node=self.compound_statement()
-        elif self.current_token.type==TokenType.ID and self.lexer.current_char=='(':
+        elif self.current_type==TokenType.ID and self.at_call():
             node=self.proccall_statement()
-        elif self.current_token.type==TokenType.ID:
+        elif self.current_type==TokenType.ID:
             node=self.assignment_statement()
         else:
             node=self.empty()
@@ -226,52 +314,56 @@ class Parser(object):
         token=self.current_token
         self.eat(TokenType.ASSIGN)
         right=self.expr()
-        node=Assign(left,token,right)
+        node=self.build.assign(left,token,right)
         return node
     
     def proccall_statement(self):
         token=self.current_token
-        proc_name=self.current_token.value
+        proc_name=token.value
         self.eat(TokenType.ID)
         self.eat(TokenType.LBRAK)
         
         actual_params=[]
-        if self.current_token.type!=TokenType.COLON:
+        if self.current_type!=TokenType.COLON:
             node=self.expr()
             actual_params.append(node)
-        while self.current_token.type==TokenType.COMMA:
+        while self.current_type==TokenType.COMMA:
             self.eat(TokenType.COMMA)
             node=self.expr()
             actual_params.append(node)
 
         self.eat(TokenType.RBRAK)
-        node=ProcedureCall(proc_name=proc_name,actual_params=actual_params,token=token)
+        node=self.build.procedure_call(proc_name,actual_params,token)
         return node    
     def variable(self):
-        node=Var(self.current_token)
+        node=self.build.var(self.current_token)
         self.eat(TokenType.ID)
         return node
     
     def empty(self):
-        return NoOp()
+        return self.build.no_op()
     
     def factor(self):
-        token=self.current_token
-        if token.type==TokenType.PLUS:
+        token_type=self.current_type
+        if token_type==TokenType.PLUS:
+            token=self.current_token
             self.eat(TokenType.PLUS)
-            node=UnaryOp(token,self.factor())
+            node=self.build.unary_op(token,self.factor())
             return node
-        elif token.type==TokenType.MINUS:
+        elif token_type==TokenType.MINUS:
+            token=self.current_token
             self.eat(TokenType.MINUS)
-            node=UnaryOp(token,self.factor())
+            node=self.build.unary_op(token,self.factor())
             return node
-        elif token.type==TokenType.INT_CONST:
+        elif token_type==TokenType.INT_CONST:
+            token=self.current_token
             self.eat(TokenType.INT_CONST)
-            return Num(token)
-        elif token.type==TokenType.REAL_CONST:
+            return self.build.num(token)
+        elif token_type==TokenType.REAL_CONST:
+            token=self.current_token
             self.eat(TokenType.REAL_CONST)
-            return Num(token)
-        elif token.type==TokenType.LBRAK:
+            return self.build.num(token)
+        elif token_type==TokenType.LBRAK:
             self.eat(TokenType.LBRAK)
             node=self.expr()
             self.eat(TokenType.RBRAK)
@@ -282,30 +374,116 @@ class Parser(object):
     
     def term(self):
         node=self.factor()
-        while self.current_token.type in (TokenType.MUL,TokenType.INT_DIV,TokenType.FLOAT_DIV):
+        while self.current_type in (TokenType.MUL,TokenType.INT_DIV,TokenType.FLOAT_DIV):
             token=self.current_token
-            if token.type==TokenType.MUL:
-                self.eat(TokenType.MUL)
-            elif token.type==TokenType.INT_DIV:
-                self.eat(TokenType.INT_DIV)
-            elif token.type==TokenType.FLOAT_DIV:
-                self.eat(TokenType.FLOAT_DIV)
-            node=BinOp(left=node,op=token,right=self.factor())
+            self.eat(self.current_type)
+            node=self.build.bin_op(node,token,self.factor())
         return node
     
     def expr(self):
         node=self.term()
-        while self.current_token.type in (TokenType.PLUS,TokenType.MINUS):
+        while self.current_type in (TokenType.PLUS,TokenType.MINUS):
             token=self.current_token
-            if token.type==TokenType.PLUS:
-                self.eat(TokenType.PLUS)
-            else:
-                self.eat(TokenType.MINUS)
-            node=BinOp(left=node,op=token,right=self.term())
+            self.eat(self.current_type)
+            node=self.build.bin_op(node,token,self.term())
         return node
     
+    def expr_iterative(self):
+        # Shunting-yard version of expr/term/factor. It builds the same tree
+        # but keeps pending operators and operands on lists, so nesting depth
+        # and expression length are not bounded by the recursion limit.
+        operands=[]
+        operators=[]
+        
+        def reduce_binary():
+            token=operators.pop()[1]
+            right=operands.pop()
+            left=operands.pop()
+            operands.append(self.build.bin_op(left,token,right))
+        
+        def reduce_unary():
+            while operators and operators[-1][0]=='unary':
+                operands.append(self.build.unary_op(operators.pop()[1],operands.pop()))
+        
+        while True:
+            token_type=self.current_type
+            if token_type in (TokenType.PLUS,TokenType.MINUS):
+                operators.append(('unary',self.current_token))
+                self.eat(token_type)
+                continue
+            if token_type==TokenType.LBRAK:
+                self.eat(TokenType.LBRAK)
+                operators.append(('paren',None))
+                continue
+            if token_type in (TokenType.INT_CONST,TokenType.REAL_CONST):
+                token=self.current_token
+                self.eat(token_type)
+                operands.append(self.build.num(token))
+            else:
+                operands.append(self.variable())
+            reduce_unary()
+            
+            while True:
+                token_type=self.current_type
+                precedence=_BINARY_PRECEDENCE.get(token_type)
+                if precedence is not None:
+                    while operators and operators[-1][0]=='binary' and _BINARY_PRECEDENCE[operators[-1][1].type]>=precedence:
+                        reduce_binary()
+                    operators.append(('binary',self.current_token))
+                    self.eat(token_type)
+                    break
+                if token_type==TokenType.RBRAK and any(kind=='paren' for kind,_ in operators):
+                    while operators[-1][0]!='paren':
+                        reduce_binary()
+                    operators.pop()
+                    self.eat(TokenType.RBRAK)
+                    reduce_unary()
+                    continue
+                while operators:
+                    if operators[-1][0]=='paren':
+                        self.eat(TokenType.RBRAK)
+                    reduce_binary()
+                return operands.pop()
+    
     def parse(self):
         node=self.program()
-        if self.current_token.type!=TokenType.EOF:
+        if self.current_type!=TokenType.EOF:
             self.error(error_code=ErrorCode.UNEXPECTED_TOKEN,token=self.current_token)
-        return node
\ No newline at end of file
+        return self.build.finish(node)
+
+class BufferedParser(Parser):
+    # Parser over a TokenBuffer. Token types and values are read straight
+    # from the buffer arrays; a Token object is only built when a rule asks
+    # for current_token to store it in the tree, and lookahead is an index
+    # into the buffer. The index stops at the closing EOF entry.
+    def __init__(self,buffer,builder=None,iterative=False):
+        self.build=builder if builder is not None else TreeBuilder()
+        if iterative:
+            self.expr=self.expr_iterative
+        self.buffer=buffer
+        self.types=buffer.types
+        self.last=len(buffer)-1
+        self.index=0
+        self.current_type=buffer.type(0)
+    
+    @property
+    def current_token(self):
+        return self.buffer.token(self.index)
+    
+    @property
+    def current_value(self):
+        return self.buffer.pool[self.buffer.values[self.index]]
+    
+    def peek_type(self,k=1):
+        return self.buffer.type(self.index+k)
+    
+    def eat(self,token_type):
+        if self.current_type==token_type:
+            if self.index<self.last:
+                self.index+=1
+            self.current_type=TOKEN_TYPES[self.types[self.index]]
+        else:
+            self.error(error_code=ErrorCode.UNEXPECTED_TOKEN,token=self.current_token)
+    
+    def at_call(self):
+        return self.peek_type()==TokenType.LBRAK
@@ -1,30 +1,31 @@
 import argparse
 import sys
 
-_SHOULD_LOG_SCOPE=False
-
-from Utils.lexer_pascal import Lexer,SemanticError,ParserError,LexerError,ErrorCode
+from Utils.lexer_pascal import Lexer,TokenType,SemanticError,ParserError,LexerError,ErrorCode
 from Utils.Parser_pascal import Parser
 from Utils.Symboltable_pascal import ScopedSymbolTable,VarSymbol,ProcedureSymbol
+from Utils.visitor_pascal import NodeVisitor
+from Utils.trace_pascal import TraceLevel,default_tracer
+
+def promoted(target_type,node):
+    # An INTEGER expression in a REAL place: a REAL variable or parameter it
+    # is stored in, or a REAL operation it is an operand of. The engines
+    # make it a float there, so every REAL value is a Python float.
+    return target_type=='REAL' and node.expr_type=='INTEGER'
 
-class NodeVisitor(object):
-    def visit(self,node):
-        method_name='visit_'+type(node).__name__
-        visitor=getattr(self,method_name,self.generic_visit)
-        return visitor(node)
-    def generic_visit(self,node):
-        raise Exception(f'No visit_{type(node).__name__} method')
+def type_name(var_symbol):
+    return var_symbol.type.name if var_symbol.type is not None else None
         
 class SemanticAnalyzer(NodeVisitor):
-    def __init__(self):
+    def __init__(self,tracer=None):
         self.current_scope=None
+        self.tracer=tracer if tracer is not None else default_tracer
     
     def error(self,error_code,token):
-        raise SemanticError(error_code==error_code,token=token,message=f'{error_code.value} -> {token}')
+        raise SemanticError(error_code=error_code,token=token,message=f'{error_code.value} -> {token}')
     
-    def log(self,msg):
-        if _SHOULD_LOG_SCOPE:
-            print(msg)
+    def log(self,msg,*args):
+        self.tracer.emit(TraceLevel.DEBUG,'semantic',msg,*args)
     
     def visit_Block(self,node):
         for declaration in node.declarations:
@@ -32,14 +33,15 @@ class SemanticAnalyzer(NodeVisitor):
         self.visit(node.compound_statement)
     
     def visit_Program(self,node):
-        print('ENTER scope: global')
+        self.log('ENTER scope: global')
         global_scope=ScopedSymbolTable(scope_name='global',scope_level=1,enclosing_scope=self.current_scope)
         self.current_scope=global_scope
     
         self.visit(node.block)
-        print(global_scope)
+        node.slot_names=global_scope.slot_names
+        self.log('{}',global_scope)
         self.current_scope=self.current_scope.enclosing_scope
-        print('LEAVE scope: global')
+        self.log('LEAVE scope: global')
     
     def visit_ProcedureCall(self,node):
         proc_name=node.proc_name
@@ -50,6 +52,9 @@ class SemanticAnalyzer(NodeVisitor):
             self.visit(param_node)
         proc_symbol=self.current_scope.lookup(node.proc_name)
         node.proc_symbol=proc_symbol
+        for param_symbol,param_node in zip(proc_symbol.params,node.actual_params):
+            if not self.assignable(type_name(param_symbol),param_node.expr_type):
+                self.error(error_code=ErrorCode.INCOMPATIBLE_TYPES,token=node.token)
     
     def visit_Compound(self,node):
         for child in node.children:
@@ -64,16 +69,57 @@ class SemanticAnalyzer(NodeVisitor):
     def visit_Assign(self,node):
         self.visit(node.right)
         self.visit(node.left)
+        if not self.assignable(node.left.expr_type,node.right.expr_type):
+            self.error(error_code=ErrorCode.INCOMPATIBLE_TYPES,token=node.token)
+    
+    def assignable(self,target_type,expr_type):
+        # An INTEGER value may go into a REAL variable, not the other way
+        return not (target_type=='INTEGER' and expr_type=='REAL')
+    
+    def binary_type(self,node):
+        op=node.op.type
+        if op==TokenType.FLOAT_DIV:
+            return 'REAL'
+        left=node.left.expr_type
+        right=node.right.expr_type
+        if op==TokenType.INT_DIV:
+            if left=='REAL' or right=='REAL':
+                self.error(error_code=ErrorCode.INCOMPATIBLE_TYPES,token=node.op)
+            return 'INTEGER'
+        # an INTEGER operand is promoted when the other one is REAL
+        if left=='REAL' or right=='REAL':
+            return 'REAL'
+        return 'INTEGER'
     
     def visit_BinOp(self,node):
-        self.visit(node.left)
-        self.visit(node.right)
+        # operands are walked with an explicit stack, long generated
+        # expressions would otherwise exhaust the recursion limit. The type of
+        # an operator node is recorded once both operands have one.
+        stack=[(node,False)]
+        while stack:
+            node,expanded=stack.pop()
+            kind=node.__class__.__name__
+            if kind=='BinOp':
+                if expanded:
+                    node.expr_type=self.binary_type(node)
+                else:
+                    stack.append((node,True))
+                    stack.append((node.right,False))
+                    stack.append((node.left,False))
+            elif kind=='UnaryOp':
+                if expanded:
+                    node.expr_type=node.expr.expr_type
+                else:
+                    stack.append((node,True))
+                    stack.append((node.expr,False))
+            else:
+                self.visit(node)
     
     def visit_Num(self,node):
-        pass
+        node.expr_type='INTEGER' if node.token.type==TokenType.INT_CONST else 'REAL'
     
     def visit_UnaryOp(self,node):
-        pass
+        self.visit_BinOp(node)
     
     def visit_NoOp(self,node):
         pass
@@ -83,7 +129,7 @@ class SemanticAnalyzer(NodeVisitor):
         proc_symbol=ProcedureSymbol(proc_name)
         self.current_scope.insert(proc_symbol)
         
-        print(f'ENTER scope: {proc_name}')
+        self.log('ENTER scope: {}',proc_name)
         procedure_scope=ScopedSymbolTable(scope_name=proc_name,scope_level=self.current_scope.scope_level+1,enclosing_scope=self.current_scope)
         self.current_scope=procedure_scope
         
@@ -91,16 +137,19 @@ class SemanticAnalyzer(NodeVisitor):
             param_type=self.current_scope.lookup(param.type_node.value)
             param_name=param.var_node.value
             var_symbol=VarSymbol(param_name,param_type)
+            if self.current_scope.lookup(param_name,current_scope_only=True):
+                self.error(error_code=ErrorCode.DUPLICATE_ID,token=param.var_node.token)
             self.current_scope.insert(var_symbol)
             proc_symbol.params.append(var_symbol)
             
         self.visit(node.block_node)
         
-        print(procedure_scope)
+        self.log('{}',procedure_scope)
         self.current_scope=self.current_scope.enclosing_scope
-        print(f'LEAVE scope: {proc_name}')
-        self.log(f'LEAVE scope: {proc_name}')
+        self.log('LEAVE scope: {}',proc_name)
         proc_symbol.block_ast=node.block_node
+        proc_symbol.scope_level=procedure_scope.scope_level
+        proc_symbol.slot_names=procedure_scope.slot_names
                
     def visit_VarDecl(self,node):
         type_name=node.type_node.value
@@ -118,6 +167,11 @@ class SemanticAnalyzer(NodeVisitor):
         var_symbol=self.current_scope.lookup(var_name)
         if var_symbol is None:
             self.error(error_code=ErrorCode.ID_NOT_FOUND,token=node.token)
+        if isinstance(var_symbol,VarSymbol):
+            node.scope_level=var_symbol.scope_level
+            node.index=var_symbol.index
+            if var_symbol.type is not None:
+                node.expr_type=var_symbol.type.name
             
     
         
@@ -166,8 +220,8 @@ end.  { Main }
     #    action='store_true',
     #)
     #args = parser.parse_args()
-    #global _SHOULD_LOG_SCOPE
-    #_SHOULD_LOG_SCOPE = args.scope
+    #if args.scope:
+    #    default_tracer.add_sink(StreamSink())
     
     lexer = Lexer(text)
     try:
@@ -1,12 +1,5 @@
 from collections import OrderedDict
-
-class NodeVisitor(object):
-    def visit(self,node):
-        method_name='visit_'+type(node).__name__
-        visitor=getattr(self,method_name,self.generic_visit)
-        return visitor(node)
-    def generic_visit(self,node):
-        raise Exception(f'No visit_{type(node).__name__} method')
+from Utils.visitor_pascal import NodeVisitor
 
 class Symbol(object):
     def __init__(self,name,type=None):
@@ -18,6 +11,8 @@ class ProcedureSymbol(Symbol):
         super(ProcedureSymbol,self).__init__(name)
         self.params=params if params is not None else [] 
         self.block_ast=None
+        self.scope_level=None
+        self.slot_names=None
     def __str__(self):
         return f'<{self.__class__.__name__}(name={self.name}, parameters={self.params})>'
 
@@ -36,6 +31,8 @@ class BuiltinTypeSymbol(Symbol):
 class VarSymbol(Symbol):
     def __init__(self,name,type):
         super().__init__(name,type)
+        self.scope_level=None
+        self.index=None
     
     def __str__(self):
         return f"<{self.__class__.__name__}(name='{self.name}', type='{self.type}')>"
@@ -48,6 +45,7 @@ class ScopedSymbolTable(object):
         self.scope_name=scope_name
         self.scope_level=scope_level
         self.enclosing_scope=enclosing_scope
+        self.slot_names=[]
         self._init_builtins()
     
     def _init_builtins(self):
@@ -70,7 +68,10 @@ class ScopedSymbolTable(object):
     __repr__=__str__
     
     def insert(self,symbol):
-        
+        if isinstance(symbol,VarSymbol) and symbol.name not in self._symbols:
+            symbol.scope_level=self.scope_level
+            symbol.index=len(self.slot_names)
+            self.slot_names.append(symbol.name)
         self._symbols[symbol.name]=symbol
 
     def lookup(self,name,current_scope_only=False):
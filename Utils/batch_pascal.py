@@ -0,0 +1,129 @@
+import glob
+import json
+import os
+import time
+from enum import Enum
+
+from Utils.lexer_pascal import Lexer,Error,LexerError
+from Utils.Parser_pascal import Parser
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.Interpreter_pascal import Interpreter
+from Utils.limits_pascal import ExecutionLimits
+
+def iter_directory(path,pattern='*.pas'):
+    for file_path in sorted(glob.glob(os.path.join(path,pattern))):
+        with open(file_path,encoding='utf-8') as f:
+            yield os.path.basename(file_path),f.read()
+
+def iter_jsonl(stream):
+    # One program per line: {"name": ..., "source": ...}. "id" and "text"
+    # are accepted as well, lines without a name are numbered.
+    for number,line in enumerate(stream,1):
+        line=line.strip()
+        if not line:
+            continue
+        record=json.loads(line)
+        name=record.get('name',record.get('id',number))
+        source=record.get('source',record.get('text'))
+        yield name,source
+
+def iter_path(path):
+    if os.path.isdir(path):
+        return iter_directory(path)
+    def lines():
+        with open(path,encoding='utf-8') as f:
+            yield from iter_jsonl(f)
+    return lines()
+
+def named_sources(sources):
+    # sources is an iterable of (name, source) pairs or of plain source
+    # strings, plain strings are named by their position
+    for number,item in enumerate(sources):
+        if isinstance(item,str):
+            yield number,item
+        else:
+            yield item
+
+def error_result(name,phase,e):
+    return {'name':name,'ok':False,'variables':None,'error':_error_record(phase,e),'timings':{}}
+
+def _error_record(phase,e):
+    record={'phase':phase,'type':e.__class__.__name__,'message':str(e),'code':None,'line':None,'column':None}
+    if isinstance(e,Error):
+        record['message']=e.message
+        if isinstance(e.error_code,Enum):
+            record['code']=e.error_code.value
+    if isinstance(e,LexerError):
+        record['line']=e.lineno
+        record['column']=e.column
+    token=getattr(e,'token',None)
+    if token is not None:
+        record['line']=token.lineno
+        record['column']=token.column
+    return record
+
+class BatchRunner(object):
+    # Runs many programs in one process. Errors are caught per program and
+    # turned into the result record, so one bad program never stops the
+    # batch. One SemanticAnalyzer is reused across programs, a Lexer and
+    # Parser hold nothing but their position in one source and are built
+    # per program, the token regex is compiled once per process. An optional
+    # FrontendCache skips the front end for programs seen before. max_steps
+    # and time_limit bound every interpreter run, see ExecutionLimits.
+    # interpreter_class is any engine taking (tree,limits=) and leaving a
+    # program_record, only the Interpreter family can enforce limits.
+    def __init__(self,interpreter_class=Interpreter,lexer_class=Lexer,cache=None,max_steps=None,time_limit=None):
+        if (max_steps is not None or time_limit is not None) and not issubclass(interpreter_class,Interpreter):
+            raise ValueError(f'{interpreter_class.__name__} cannot enforce ExecutionLimits')
+        self.interpreter_class=interpreter_class
+        self.max_steps=max_steps
+        self.time_limit=time_limit
+        self.lexer_class=lexer_class
+        self.cache=cache
+        self.analyzer=SemanticAnalyzer()
+
+    def front_end(self,source,timings):
+        if self.cache is not None:
+            start=time.perf_counter()
+            tree=self.cache.get(source)
+            timings['front_end']=time.perf_counter()-start
+            return tree
+        start=time.perf_counter()
+        tree=Parser(self.lexer_class(source)).parse()
+        timings['parse']=time.perf_counter()-start
+        start=time.perf_counter()
+        # a failed run may have left a scope behind
+        self.analyzer.current_scope=None
+        self.analyzer.visit(tree)
+        timings['semantic']=time.perf_counter()-start
+        return tree
+
+    def run_one(self,name,source):
+        timings={}
+        result={'name':name,'ok':False,'variables':None,'error':None,'timings':timings}
+        phase='front_end'
+        try:
+            tree=self.front_end(source,timings)
+            phase='interpret'
+            start=time.perf_counter()
+            limits=None
+            if self.max_steps is not None or self.time_limit is not None:
+                limits=ExecutionLimits(self.max_steps,self.time_limit)
+            interpreter=self.interpreter_class(tree,limits=limits)
+            interpreter.interpret()
+            timings['interpret']=time.perf_counter()-start
+        except Exception as e:
+            result['error']=_error_record(phase,e)
+            return result
+        record=interpreter.program_record
+        result['variables']=dict(record.members) if record is not None else {}
+        result['ok']=True
+        return result
+
+    def run_many(self,sources):
+        # results are yielded in the order of sources
+        for name,source in named_sources(sources):
+            yield self.run_one(name,source)
+
+def run_many(sources,**kwargs):
+    return BatchRunner(**kwargs).run_many(sources)
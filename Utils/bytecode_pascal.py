@@ -0,0 +1,427 @@
+import struct
+import sys
+from array import array
+from enum import IntEnum
+
+from Utils.lexer_pascal import TokenType,Error
+from Utils.visitor_pascal import NodeVisitor
+from Utils.callstack_pascal import ActivationRecord,ARType
+from Utils.Semantic_Analyzer_pascal import promoted,type_name
+
+class BytecodeError(Error):
+    pass
+
+class Op(IntEnum):
+    LOADK=0     # slot[a]=consts[b]
+    MOVE=1      # slot[a]=slot[b]
+    ADD=2       # slot[a]=slot[b]+slot[c]
+    SUB=3
+    MUL=4
+    IDIV=5
+    FDIV=6
+    NEG=7       # slot[a]=-slot[b]
+    POS=8       # slot[a]=+slot[b]
+    CALL=9      # call procs[a] with arguments in slot[b]..slot[b+c-1]
+    RET=10
+    GETUP=11    # slot[a]=display[b][c]
+    SETUP=12    # display[a][b]=slot[c]
+    FLOAT=13    # slot[a]=float(slot[b]), an unset slot stays unset
+
+_BINARY_OPS={
+    TokenType.PLUS:Op.ADD,
+    TokenType.MINUS:Op.SUB,
+    TokenType.MUL:Op.MUL,
+    TokenType.INT_DIV:Op.IDIV,
+    TokenType.FLOAT_DIV:Op.FDIV,
+}
+
+class CodeObject(object):
+    def __init__(self,name,level=1,nparams=0):
+        self.name=name
+        self.level=level
+        self.nparams=nparams
+        self.slot_names=[]
+        self.nslots=0
+        self.consts=[]
+        self.code=[]
+
+    def __str__(self):
+        lines=[f'CODE {self.name} (level={self.level}, params={self.nparams}, slots={self.nslots})']
+        for pc,(op,a,b,c) in enumerate(self.code):
+            lines.append(f'   {pc:>4} {Op(op).name:<6} {a} {b} {c}')
+        return '\n'.join(lines)
+
+    __repr__=__str__
+
+class BytecodeProgram(object):
+    def __init__(self,name,procedures,internal_names=frozenset()):
+        self.name=name
+        # procedures[0] is the main program body
+        self.procedures=procedures
+        # globals left out of the result, see Program.internal_names
+        self.internal_names=internal_names
+
+    @property
+    def main(self):
+        return self.procedures[0]
+
+    def __str__(self):
+        return '\n\n'.join(str(code_obj) for code_obj in self.procedures)
+
+    __repr__=__str__
+
+class _CodeBuilder(object):
+    # Named slots use the indexes the SemanticAnalyzer gave the VarSymbols,
+    # temporaries are numbered above them.
+    def __init__(self,code_obj,slot_names):
+        self.code_obj=code_obj
+        code_obj.slot_names=list(slot_names)
+        self.const_index={}
+        self.temp_base=self.next_temp=len(slot_names)
+
+    def const(self,value):
+        # keep 1 and 1.0 apart, they compare equal as dict keys
+        key=(type(value),value)
+        index=self.const_index.get(key)
+        if index is None:
+            index=self.const_index[key]=len(self.code_obj.consts)
+            self.code_obj.consts.append(value)
+        return index
+
+    def temp(self):
+        index=self.next_temp
+        self.next_temp+=1
+        return index
+
+    def emit(self,op,a=0,b=0,c=0):
+        self.code_obj.code.append((int(op),a,b,c))
+
+    def finish(self):
+        self.emit(Op.RET)
+        self.code_obj.nslots=max(self.code_obj.nslots,len(self.code_obj.slot_names))
+
+class BytecodeCompiler(NodeVisitor):
+    def __init__(self):
+        self.procedures=[]
+        self.proc_index={}
+        self.builder=None
+
+    def compile(self,tree):
+        self.visit(tree)
+        return BytecodeProgram(tree.name,self.procedures,tree.internal_names)
+
+    def _new_code(self,name,level,nparams=0):
+        code_obj=CodeObject(name,level,nparams)
+        self.procedures.append(code_obj)
+        return code_obj
+
+    def visit_Program(self,node):
+        self.builder=_CodeBuilder(self._new_code(node.name,1),node.slot_names)
+        self.visit(node.block)
+        self.builder.finish()
+
+    def visit_Block(self,node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.visit(node.compound_statement)
+
+    def visit_VarDecl(self,node):
+        pass
+
+    def visit_ProcedureDecl(self,node):
+        pass
+
+    def visit_Type(self,node):
+        pass
+
+    def visit_NoOp(self,node):
+        pass
+
+    def visit_Compound(self,node):
+        for child in node.children:
+            self.visit(child)
+
+    def visit_Assign(self,node):
+        builder=self.builder
+        left=node.left
+        if left.scope_level==builder.code_obj.level:
+            self.stored(node.right,left.expr_type,left.index)
+        else:
+            src=self.stored(node.right,left.expr_type)
+            builder.emit(Op.SETUP,left.scope_level,left.index,src)
+        builder.next_temp=builder.temp_base
+
+    def procedure(self,proc_symbol):
+        index=self.proc_index.get(proc_symbol)
+        if index is not None:
+            return index
+        index=self.proc_index[proc_symbol]=len(self.procedures)
+        code_obj=self._new_code(proc_symbol.name,proc_symbol.scope_level,len(proc_symbol.params))
+        outer=self.builder
+        self.builder=_CodeBuilder(code_obj,proc_symbol.slot_names)
+        self.visit(proc_symbol.block_ast)
+        self.builder.finish()
+        self.builder=outer
+        return index
+
+    def visit_ProcedureCall(self,node):
+        index=self.procedure(node.proc_symbol)
+        builder=self.builder
+        nargs=len(node.actual_params)
+        base=builder.next_temp
+        for _ in range(nargs):
+            builder.temp()
+        for offset,(param_symbol,argument_node) in enumerate(zip(node.proc_symbol.params,node.actual_params)):
+            self.stored(argument_node,type_name(param_symbol),base+offset)
+        builder.code_obj.nslots=max(builder.code_obj.nslots,builder.next_temp)
+        builder.emit(Op.CALL,index,base,nargs)
+        builder.next_temp=builder.temp_base
+
+    def stored(self,node,target_type,dst=None):
+        # An INTEGER value stored in a REAL variable or parameter becomes a
+        # float. Constants are converted here, anything else by a FLOAT.
+        if not promoted(target_type,node) or type(node).__name__=='Num':
+            return self.operand(node,target_type,dst)
+        builder=self.builder
+        src=self.expr(node)
+        if dst is None:
+            dst=builder.temp()
+        builder.emit(Op.FLOAT,dst,src)
+        builder.code_obj.nslots=max(builder.code_obj.nslots,builder.next_temp,dst+1)
+        return dst
+
+    def operand(self,node,operation_type,dst=None):
+        # INTEGER constants of a REAL operation are loaded as floats, other
+        # INTEGER operands are promoted by Python's mixed arithmetic
+        if type(node).__name__=='Num' and promoted(operation_type,node):
+            builder=self.builder
+            if dst is None:
+                dst=builder.temp()
+            builder.emit(Op.LOADK,dst,builder.const(float(node.value)))
+            builder.code_obj.nslots=max(builder.code_obj.nslots,builder.next_temp,dst+1)
+            return dst
+        return self.expr(node,dst)
+
+    def expr(self,node,dst=None):
+        # Compiles an expression and returns the slot holding its value. If
+        # dst is given the result is written straight into that slot.
+        builder=self.builder
+        node_type=type(node).__name__
+        if node_type=='Var':
+            if node.scope_level!=builder.code_obj.level:
+                if dst is None:
+                    dst=builder.temp()
+                builder.emit(Op.GETUP,dst,node.scope_level,node.index)
+            elif dst is None or dst==node.index:
+                return node.index
+            else:
+                builder.emit(Op.MOVE,dst,node.index)
+        elif node_type=='Num':
+            if dst is None:
+                dst=builder.temp()
+            builder.emit(Op.LOADK,dst,builder.const(node.value))
+        elif node_type=='UnaryOp':
+            src=self.expr(node.expr)
+            if dst is None:
+                dst=builder.temp()
+            builder.emit(Op.POS if node.op.type==TokenType.PLUS else Op.NEG,dst,src)
+        elif node_type=='BinOp':
+            mark=builder.next_temp
+            left=self.operand(node.left,node.expr_type)
+            right=self.operand(node.right,node.expr_type)
+            builder.code_obj.nslots=max(builder.code_obj.nslots,builder.next_temp)
+            builder.next_temp=mark
+            if dst is None:
+                dst=builder.temp()
+            builder.emit(_BINARY_OPS[node.op.type],dst,left,right)
+        else:
+            raise BytecodeError(message=f'Cannot compile expression node {node_type}')
+        builder.code_obj.nslots=max(builder.code_obj.nslots,builder.next_temp,dst+1)
+        return dst
+
+class VM(object):
+    def __init__(self,program):
+        self.program=program
+        # display[n] is the frame of the innermost active code object at
+        # nesting level n, non-local slots are reached through it
+        self.display=[None]*(max(code_obj.level for code_obj in program.procedures)+1)
+
+    def execute(self,code_obj,frame):
+        code=code_obj.code
+        consts=code_obj.consts
+        procedures=self.program.procedures
+        display=self.display
+        level=code_obj.level
+        saved=display[level]
+        display[level]=frame
+        pc=0
+        while True:
+            op,a,b,c=code[pc]
+            pc+=1
+            if op==0:
+                frame[a]=consts[b]
+            elif op==1:
+                frame[a]=frame[b]
+            elif op==2:
+                frame[a]=frame[b]+frame[c]
+            elif op==3:
+                frame[a]=frame[b]-frame[c]
+            elif op==4:
+                frame[a]=frame[b]*frame[c]
+            elif op==5:
+                frame[a]=frame[b]//frame[c]
+            elif op==6:
+                frame[a]=frame[b]/frame[c]
+            elif op==7:
+                frame[a]=-frame[b]
+            elif op==8:
+                frame[a]=+frame[b]
+            elif op==9:
+                callee=procedures[a]
+                callee_frame=frame[b:b+c]
+                callee_frame.extend([None]*(callee.nslots-c))
+                self.execute(callee,callee_frame)
+            elif op==11:
+                frame[a]=display[b][c]
+            elif op==12:
+                display[a][b]=frame[c]
+            elif op==13:
+                value=frame[b]
+                frame[a]=float(value) if value is not None else None
+            elif op==10:
+                display[level]=saved
+                return frame
+            else:
+                raise BytecodeError(message=f'Unknown opcode {op} at {code_obj.name}:{pc-1}')
+
+    def run(self):
+        main=self.program.main
+        frame=self.execute(main,[None]*main.nslots)
+        internal_names=self.program.internal_names
+        return {name:value for name,value in zip(main.slot_names,frame) if value is not None and name not in internal_names}
+
+class BytecodeInterpreter(object):
+    def __init__(self,tree=None,limits=None,program=None):
+        if limits is not None:
+            raise ValueError('BytecodeInterpreter cannot enforce ExecutionLimits')
+        if program is None and tree is not None:
+            program=BytecodeCompiler().compile(tree)
+        self.program=program
+        self.program_record=None
+
+    def interpret(self):
+        if self.program is None:
+            return ''
+        # the final globals, like the record the tree interpreters leave
+        record=ActivationRecord(name=self.program.name,type=ARType.PROGRAM,nesting_level=1)
+        record.members.update(VM(self.program).run())
+        self.program_record=record
+
+# Binary format:
+#   header    : MAGIC, version (u16), program name, procedure count (u32)
+#   procedure : name, level (u32), nparams (u32), nslots (u32), slot names,
+#               constant pool, instruction count (u32), instructions (4 x i32)
+#   trailer   : internal name count (u32), internal names
+# All strings are u32 length prefixed UTF-8, integers are little endian.
+MAGIC=b'PASBC'
+FORMAT_VERSION=4
+
+def _write_str(out,s):
+    data=s.encode('utf-8')
+    out.append(struct.pack('<I',len(data)))
+    out.append(data)
+
+def _write_const(out,value):
+    if isinstance(value,float):
+        out.append(b'f'+struct.pack('<d',value))
+    elif -2**63<=value<2**63:
+        out.append(b'i'+struct.pack('<q',value))
+    else:
+        out.append(b'I')
+        _write_str(out,str(value))
+
+def dumps(program):
+    out=[MAGIC,struct.pack('<H',FORMAT_VERSION)]
+    _write_str(out,program.name)
+    out.append(struct.pack('<I',len(program.procedures)))
+    for code_obj in program.procedures:
+        _write_str(out,code_obj.name)
+        out.append(struct.pack('<IIII',code_obj.level,code_obj.nparams,code_obj.nslots,len(code_obj.slot_names)))
+        for name in code_obj.slot_names:
+            _write_str(out,name)
+        out.append(struct.pack('<I',len(code_obj.consts)))
+        for value in code_obj.consts:
+            _write_const(out,value)
+        out.append(struct.pack('<I',len(code_obj.code)))
+        fields=array('i',(field for instr in code_obj.code for field in instr))
+        if sys.byteorder=='big':
+            fields.byteswap()
+        out.append(fields.tobytes())
+    out.append(struct.pack('<I',len(program.internal_names)))
+    for name in sorted(program.internal_names):
+        _write_str(out,name)
+    return b''.join(out)
+
+class _Reader(object):
+    def __init__(self,data):
+        self.data=data
+        self.pos=0
+
+    def take(self,size):
+        if self.pos+size>len(self.data):
+            raise BytecodeError(message='Truncated bytecode file')
+        chunk=self.data[self.pos:self.pos+size]
+        self.pos+=size
+        return chunk
+
+    def unpack(self,fmt):
+        return struct.unpack(fmt,self.take(struct.calcsize(fmt)))
+
+    def string(self):
+        (size,)=self.unpack('<I')
+        return bytes(self.take(size)).decode('utf-8')
+
+    def const(self):
+        tag=bytes(self.take(1))
+        if tag==b'f':
+            return self.unpack('<d')[0]
+        if tag==b'i':
+            return self.unpack('<q')[0]
+        if tag==b'I':
+            return int(self.string())
+        raise BytecodeError(message=f'Unknown constant tag {tag!r}')
+
+def loads(data):
+    reader=_Reader(memoryview(data))
+    if bytes(reader.take(len(MAGIC)))!=MAGIC:
+        raise BytecodeError(message='Not a Pascal bytecode file')
+    (version,)=reader.unpack('<H')
+    if version!=FORMAT_VERSION:
+        raise BytecodeError(message=f'Unsupported bytecode version {version} (expected {FORMAT_VERSION})')
+    name=reader.string()
+    (nprocs,)=reader.unpack('<I')
+    procedures=[]
+    for _ in range(nprocs):
+        code_obj=CodeObject(reader.string())
+        code_obj.level,code_obj.nparams,code_obj.nslots,nnames=reader.unpack('<IIII')
+        code_obj.slot_names=[reader.string() for _ in range(nnames)]
+        (nconsts,)=reader.unpack('<I')
+        code_obj.consts=[reader.const() for _ in range(nconsts)]
+        (ninstr,)=reader.unpack('<I')
+        fields=array('i')
+        fields.frombytes(reader.take(ninstr*4*fields.itemsize))
+        if sys.byteorder=='big':
+            fields.byteswap()
+        code_obj.code=[tuple(fields[i:i+4]) for i in range(0,len(fields),4)]
+        procedures.append(code_obj)
+    (ninternal,)=reader.unpack('<I')
+    internal_names=frozenset(reader.string() for _ in range(ninternal))
+    return BytecodeProgram(name,procedures,internal_names)
+
+def save(program,path):
+    with open(path,'wb') as f:
+        f.write(dumps(program))
+
+def load(path):
+    with open(path,'rb') as f:
+        return loads(f.read())
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pickle
+import zlib
+from collections import OrderedDict
+
+from Utils.lexer_pascal import Lexer
+from Utils.Parser_pascal import Parser
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+
+# Bump whenever the AST or symbol classes change shape, stale files on disk
+# are then treated as misses.
+CACHE_VERSION=3
+_MAGIC=b'PASAST'
+
+def source_key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def analyze(text):
+    lexer=Lexer(text)
+    parser=Parser(lexer)
+    tree=parser.parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+def dumps(tree):
+    # pickle keeps shared references, so every ProcedureCall.proc_symbol
+    # and its block_ast still point into the same tree after loading
+    return _MAGIC+bytes([CACHE_VERSION])+zlib.compress(pickle.dumps(tree,protocol=pickle.HIGHEST_PROTOCOL))
+
+def loads(data):
+    header=_MAGIC+bytes([CACHE_VERSION])
+    if not data.startswith(header):
+        return None
+    return pickle.loads(zlib.decompress(data[len(header):]))
+
+class FrontendCache(object):
+    # Analyzed ASTs keyed by a hash of the program text. Entries are kept in
+    # memory in LRU order and, if a directory is given, also written there.
+    # The directory should only ever hold files written by this class since
+    # entries are unpickled. The memory entries are pickles as well, every
+    # get returns a tree of its own that the optimizers may rewrite.
+    def __init__(self,maxsize=128,directory=None):
+        self.maxsize=maxsize
+        self.directory=directory
+        self._trees=OrderedDict()
+        self.hits=0
+        self.disk_hits=0
+        self.misses=0
+        if directory is not None:
+            os.makedirs(directory,exist_ok=True)
+
+    def __len__(self):
+        return len(self._trees)
+
+    def path(self,key):
+        return os.path.join(self.directory,key+'.ast')
+
+    def get(self,text):
+        key=source_key(text)
+        data=self._trees.get(key)
+        if data is not None:
+            self._trees.move_to_end(key)
+            self.hits+=1
+            return pickle.loads(data)
+
+        tree=self._load(key)
+        if tree is not None:
+            self.disk_hits+=1
+        else:
+            self.misses+=1
+            tree=analyze(text)
+            self._store(key,tree)
+        self._remember(key,pickle.dumps(tree,protocol=pickle.HIGHEST_PROTOCOL))
+        return tree
+
+    def _remember(self,key,data):
+        self._trees[key]=data
+        while len(self._trees)>self.maxsize:
+            self._trees.popitem(last=False)
+
+    def _load(self,key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key),'rb') as f:
+                return loads(f.read())
+        except (OSError,EOFError,zlib.error,pickle.UnpicklingError,AttributeError,ValueError,ImportError):
+            # a truncated or corrupted file, or one pickled from classes
+            # that are gone, is a miss and gets written again
+            return None
+
+    def _store(self,key,tree):
+        if self.directory is None:
+            return
+        path=self.path(key)
+        tmp_path=f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path,'wb') as f:
+            f.write(dumps(tree))
+        os.replace(tmp_path,path)
+
+    def clear(self):
+        self._trees.clear()
+
+    def stats(self):
+        return {'hits':self.hits,'disk_hits':self.disk_hits,'misses':self.misses,'size':len(self._trees)}
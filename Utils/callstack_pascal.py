@@ -3,12 +3,24 @@ from enum import Enum
 class CallStack:
     def __init__(self):
         self._records=[]
+        # display[n] is the innermost active record at nesting level n, the
+        # entry it replaced is saved on push and put back on pop
+        self.display=[None]
+        self._saved=[]
     
     def push(self,ar):
+        display=self.display
+        level=ar.nesting_level
+        while len(display)<=level:
+            display.append(None)
+        self._saved.append(display[level])
+        display[level]=ar
         self._records.append(ar)
     
     def pop(self):
-        return self._records.pop()
+        ar=self._records.pop()
+        self.display[ar.nesting_level]=self._saved.pop()
+        return ar
     
     def peek(self):
         return self._records[-1]
@@ -40,6 +52,10 @@ class ActivationRecord:
     def get(self,key):
         return self.members.get(key)
 
+    def discard(self,names):
+        for name in names:
+            self.members.pop(name,None)
+
     def __str__(self):
         lines=[f'{self.nesting_level}: {self.type} {self.name}']
         
@@ -50,7 +66,62 @@ class ActivationRecord:
         return s
     
     __repr__=__str__
-    
 
-        
-        
\ No newline at end of file
+class SlotActivationRecord:
+    __slots__=('name','type','nesting_level','names','slots','_indexes')
+
+    def __init__(self,name,type,nesting_level,names):
+        self.name=name
+        self.type=type
+        self.nesting_level=nesting_level
+        self.names=names
+        self.slots=[None]*len(names)
+        self._indexes=None
+
+    @property
+    def members(self):
+        return {name:val for name,val in zip(self.names,self.slots) if val is not None}
+
+    def index(self,key):
+        # the interpreters use the analyzer's slot indexes, the name -> slot
+        # dict is only built for the first access by name
+        indexes=self._indexes
+        if indexes is None:
+            indexes=self._indexes={name:i for i,name in enumerate(self.names)}
+        return indexes.get(key)
+
+    def __setitem__(self,key,value):
+        index=self.index(key)
+        if index is None:
+            raise KeyError(key)
+        self.slots[index]=value
+
+    def __getitem__(self,key):
+        index=self.index(key)
+        value=self.slots[index] if index is not None else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self,key):
+        index=self.index(key)
+        if index is None:
+            return None
+        return self.slots[index]
+
+    def discard(self,names):
+        for name in names:
+            index=self.index(name)
+            if index is not None:
+                self.slots[index]=None
+
+    def __str__(self):
+        lines=[f'{self.nesting_level}: {self.type} {self.name}']
+
+        for name,val in self.members.items():
+            lines.append(f'   {name:<20}: {val}')
+
+        s='\n'.join(lines)
+        return s
+
+    __repr__=__str__
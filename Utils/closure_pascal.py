@@ -0,0 +1,189 @@
+from Utils.lexer_pascal import TokenType
+from Utils.callstack_pascal import CallStack,SlotActivationRecord,ARType
+from Utils.visitor_pascal import NodeVisitor
+from Utils.Semantic_Analyzer_pascal import promoted,type_name
+
+def _constant(value):
+    def num():
+        return value
+    return num
+
+class ClosureCompiler(NodeVisitor):
+    def __init__(self,call_stack):
+        self.call_stack=call_stack
+        self.proc_cells={}
+
+    def visit_Program(self,node):
+        program_name=node.name
+        slot_names=node.slot_names
+        internal_names=node.internal_names
+        call_stack=self.call_stack
+        block=self.visit(node.block)
+
+        def run_program():
+            call_stack.push(SlotActivationRecord(name=program_name,type=ARType.PROGRAM,nesting_level=1,names=slot_names))
+            if block is not None:
+                block()
+            program_record=call_stack.pop()
+            program_record.discard(internal_names)
+            return program_record
+        return run_program
+
+    def visit_Block(self,node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        return self.visit(node.compound_statement)
+
+    def visit_VarDecl(self,node):
+        pass
+
+    def visit_ProcedureDecl(self,node):
+        pass
+
+    def visit_Type(self,node):
+        pass
+
+    def visit_Compound(self,node):
+        statements=tuple(stmt for stmt in (self.visit(child) for child in node.children) if stmt is not None)
+        if not statements:
+            return None
+        if len(statements)==1:
+            return statements[0]
+
+        def compound():
+            for stmt in statements:
+                stmt()
+        return compound
+
+    def visit_NoOp(self,node):
+        return None
+
+    # Variables live in slot records, the slot index of every access is
+    # bound into its closure here, only the record is looked up at run time
+    def visit_Assign(self,node):
+        index=node.left.index
+        level=node.left.scope_level
+        right=self.stored(node.right,node.left.expr_type)
+        display=self.call_stack.display
+
+        def assign():
+            value=right()
+            display[level].slots[index]=value
+        return assign
+
+    def visit_Var(self,node):
+        index=node.index
+        level=node.scope_level
+        display=self.call_stack.display
+
+        def var():
+            return display[level].slots[index]
+        return var
+
+    def visit_Num(self,node):
+        return _constant(node.value)
+
+    def operand(self,node,operation_type):
+        # INTEGER constants of a REAL operation are made floats here, other
+        # INTEGER operands are promoted by Python's mixed arithmetic
+        if node.__class__.__name__=='Num' and promoted(operation_type,node):
+            return _constant(float(node.value))
+        return self.visit(node)
+
+    def stored(self,node,target_type):
+        # an INTEGER value stored in a REAL variable or parameter becomes a
+        # float, the type is known now so only those stores convert
+        if not promoted(target_type,node) or node.__class__.__name__=='Num':
+            return self.operand(node,target_type)
+        expr=self.visit(node)
+        if node.__class__.__name__=='Var':
+            def real():
+                # an unassigned variable is copied as it is
+                value=expr()
+                return float(value) if value is not None else None
+        else:
+            def real():
+                return float(expr())
+        return real
+
+    def visit_UnaryOp(self,node):
+        expr=self.visit(node.expr)
+        if node.op.type==TokenType.PLUS:
+            def unary():
+                return +expr()
+        else:
+            def unary():
+                return -expr()
+        return unary
+
+    def visit_BinOp(self,node):
+        left=self.operand(node.left,node.expr_type)
+        right=self.operand(node.right,node.expr_type)
+        op=node.op.type
+        if op==TokenType.PLUS:
+            def binop():
+                return left()+right()
+        elif op==TokenType.MINUS:
+            def binop():
+                return left()-right()
+        elif op==TokenType.MUL:
+            def binop():
+                return left()*right()
+        elif op==TokenType.INT_DIV:
+            def binop():
+                return left()//right()
+        elif op==TokenType.FLOAT_DIV:
+            def binop():
+                return left()/right()
+        else:
+            raise Exception(f'No closure for operator {op}')
+        return binop
+
+    def procedure_cell(self,proc_symbol):
+        # The cell is registered before the body is compiled so that a
+        # procedure can refer to itself.
+        cell=self.proc_cells.get(proc_symbol)
+        if cell is None:
+            cell=self.proc_cells[proc_symbol]=[None]
+            body=self.visit(proc_symbol.block_ast)
+            cell[0]=body if body is not None else (lambda: None)
+        return cell
+
+    def visit_ProcedureCall(self,node):
+        proc_name=node.proc_name
+        proc_symbol=node.proc_symbol
+        param_indexes=tuple(param_symbol.index for param_symbol in proc_symbol.params)
+        args=tuple(self.stored(argument_node,type_name(param_symbol)) for param_symbol,argument_node in zip(proc_symbol.params,node.actual_params))
+        bindings=tuple(zip(param_indexes,args))
+        slot_names=proc_symbol.slot_names
+        level=proc_symbol.scope_level
+        call_stack=self.call_stack
+        cell=self.procedure_cell(proc_symbol)
+
+        def call():
+            ar=SlotActivationRecord(name=proc_name,type=ARType.PROCEDURE,nesting_level=level,names=slot_names)
+            slots=ar.slots
+            for index,arg in bindings:
+                slots[index]=arg()
+            call_stack.push(ar)
+            cell[0]()
+            call_stack.pop()
+        return call
+
+class ClosureInterpreter(object):
+    def __init__(self,tree,limits=None):
+        # the compiled closures have no visit to count steps in
+        if limits is not None:
+            raise ValueError('ClosureInterpreter cannot enforce ExecutionLimits')
+        self.tree=tree
+        self.call_stack=CallStack()
+        self.program_record=None
+        self.code=None
+        if tree is not None:
+            self.code=ClosureCompiler(self.call_stack).visit(tree)
+
+    def interpret(self):
+        if self.code is None:
+            return ''
+        # kept so callers can read the final values of the globals
+        self.program_record=self.code()
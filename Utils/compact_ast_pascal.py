@@ -0,0 +1,333 @@
+from array import array
+
+from Utils.lexer_pascal import Token,TokenType
+from Utils.token_buffer_pascal import TOKEN_TYPES,TYPE_CODES
+from Utils.Parser_pascal import TreeBuilder
+from Utils.visitor_pascal import NodeVisitor
+
+# Compact counterparts of the Parser_pascal AST classes. They carry the same
+# class names and attributes, so every NodeVisitor works on them unchanged,
+# but they use __slots__, keep operator kinds as small TokenType codes and
+# keep source positions in a PositionTable shared by the whole tree instead
+# of holding on to Token objects. node.token / node.op are rebuilt on demand.
+
+class PositionTable(object):
+    def __init__(self):
+        self.lines=array('I')
+        self.columns=array('I')
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self,lineno,column):
+        self.lines.append(lineno or 0)
+        self.columns.append(column or 0)
+        return len(self.lines)-1
+
+    def position(self,pos):
+        return self.lines[pos],self.columns[pos]
+
+# One shared, position-less token per kind for node.op, visitors only ever
+# look at op.type
+_OPERATORS=[Token(token_type,token_type.value) for token_type in TOKEN_TYPES]
+
+_ID=TYPE_CODES[TokenType.ID]
+_ASSIGN=TYPE_CODES[TokenType.ASSIGN]
+
+class AST(object):
+    __slots__=()
+
+class _Located(AST):
+    __slots__=('src','pos')
+
+    def _token(self,kind,value):
+        lineno,column=self.src.position(self.pos)
+        return Token(TOKEN_TYPES[kind],value,lineno,column)
+
+class BinOp(_Located):
+    __slots__=('left','kind','right','expr_type')
+
+    def __init__(self,left,kind,right,src,pos,expr_type=None):
+        self.left=left
+        self.kind=kind
+        self.right=right
+        self.src=src
+        self.pos=pos
+        self.expr_type=expr_type
+
+    @property
+    def op(self):
+        return _OPERATORS[self.kind]
+
+    @property
+    def token(self):
+        return self._token(self.kind,TOKEN_TYPES[self.kind].value)
+
+class UnaryOp(_Located):
+    __slots__=('kind','expr','expr_type')
+
+    def __init__(self,kind,expr,src,pos,expr_type=None):
+        self.kind=kind
+        self.expr=expr
+        self.src=src
+        self.pos=pos
+        self.expr_type=expr_type
+
+    @property
+    def op(self):
+        return _OPERATORS[self.kind]
+
+    @property
+    def token(self):
+        return self._token(self.kind,TOKEN_TYPES[self.kind].value)
+
+class Num(_Located):
+    __slots__=('value','kind','expr_type')
+
+    def __init__(self,value,kind,src,pos,expr_type=None):
+        self.value=value
+        self.kind=kind
+        self.src=src
+        self.pos=pos
+        self.expr_type=expr_type
+
+    @property
+    def token(self):
+        return self._token(self.kind,self.value)
+
+class Var(_Located):
+    __slots__=('value','scope_level','index','expr_type')
+
+    def __init__(self,value,src,pos,scope_level=None,index=None,expr_type=None):
+        self.value=value
+        self.src=src
+        self.pos=pos
+        self.scope_level=scope_level
+        self.index=index
+        self.expr_type=expr_type
+
+    @property
+    def token(self):
+        return self._token(_ID,self.value)
+
+class Type(_Located):
+    __slots__=('value','kind')
+
+    def __init__(self,value,kind,src,pos):
+        self.value=value
+        self.kind=kind
+        self.src=src
+        self.pos=pos
+
+    @property
+    def token(self):
+        return self._token(self.kind,self.value)
+
+class Assign(_Located):
+    __slots__=('left','right')
+
+    def __init__(self,left,right,src,pos):
+        self.left=left
+        self.right=right
+        self.src=src
+        self.pos=pos
+
+    @property
+    def op(self):
+        return _OPERATORS[_ASSIGN]
+
+    @property
+    def token(self):
+        return self._token(_ASSIGN,TokenType.ASSIGN.value)
+
+class ProcedureCall(_Located):
+    __slots__=('proc_name','actual_params','proc_symbol')
+
+    def __init__(self,proc_name,actual_params,src,pos,proc_symbol=None):
+        self.proc_name=proc_name
+        self.actual_params=actual_params
+        self.src=src
+        self.pos=pos
+        self.proc_symbol=proc_symbol
+
+    @property
+    def token(self):
+        return self._token(_ID,self.proc_name)
+
+class Param(AST):
+    __slots__=('var_node','type_node')
+
+    def __init__(self,var_node,type_node):
+        self.var_node=var_node
+        self.type_node=type_node
+
+class Program(AST):
+    __slots__=('name','block','slot_names','positions','internal_names')
+
+    def __init__(self,name,block,positions,slot_names=None,internal_names=frozenset()):
+        self.name=name
+        self.block=block
+        self.positions=positions
+        self.slot_names=slot_names
+        self.internal_names=internal_names
+
+class Block(AST):
+    __slots__=('declarations','compound_statement')
+
+    def __init__(self,declarations,compound_statement):
+        self.declarations=declarations
+        self.compound_statement=compound_statement
+
+class VarDecl(AST):
+    __slots__=('var_node','type_node')
+
+    def __init__(self,var_node,type_node):
+        self.var_node=var_node
+        self.type_node=type_node
+
+class ProcedureDecl(AST):
+    __slots__=('proc_name','params','block_node')
+
+    def __init__(self,proc_name,params,block_node):
+        self.proc_name=proc_name
+        self.params=params
+        self.block_node=block_node
+
+class Compound(AST):
+    __slots__=('children',)
+
+    def __init__(self,children=None):
+        self.children=children if children is not None else []
+
+class NoOp(AST):
+    __slots__=()
+
+class CompactBuilder(TreeBuilder):
+    # Parser builder that creates the compact nodes directly, without an
+    # object tree to convert first:
+    #     tree=Parser(lexer,builder=CompactBuilder()).parse()
+    def __init__(self):
+        self.positions=PositionTable()
+
+    def add(self,token):
+        return self.positions.add(token.lineno,token.column)
+
+    def bin_op(self,left,op,right):
+        return BinOp(left,TYPE_CODES[op.type],right,self.positions,self.add(op))
+
+    def unary_op(self,op,expr):
+        return UnaryOp(TYPE_CODES[op.type],expr,self.positions,self.add(op))
+
+    def num(self,token):
+        return Num(token.value,TYPE_CODES[token.type],self.positions,self.add(token))
+
+    def var(self,token):
+        return Var(token.value,self.positions,self.add(token))
+
+    def param(self,var_node,type_node):
+        return Param(var_node,type_node)
+
+    def program(self,name,block):
+        return Program(name,block,self.positions)
+
+    def block(self,declarations,compound_statement):
+        return Block(declarations,compound_statement)
+
+    def var_decl(self,var_node,type_node):
+        return VarDecl(var_node,type_node)
+
+    def procedure_decl(self,proc_name,params,block_node):
+        return ProcedureDecl(proc_name,params,block_node)
+
+    def type_spec(self,token):
+        return Type(token.value,TYPE_CODES[token.type],self.positions,self.add(token))
+
+    def compound(self,children):
+        return Compound(list(children))
+
+    def assign(self,left,op,right):
+        return Assign(left,right,self.positions,self.add(op))
+
+    def procedure_call(self,proc_name,actual_params,token):
+        return ProcedureCall(proc_name,actual_params,self.positions,self.add(token))
+
+    def no_op(self):
+        return NoOp()
+
+class Compactor(NodeVisitor):
+    # Converts a Parser_pascal tree into compact nodes. Analyzer results
+    # already on the tree (addresses, proc_symbol links) are carried over and
+    # ProcedureSymbol.block_ast is pointed at the converted block.
+    def __init__(self):
+        self.positions=PositionTable()
+        self.converted={}
+        self.proc_symbols=[]
+
+    def compact(self,tree):
+        node=self.convert(tree)
+        for proc_symbol in self.proc_symbols:
+            block=self.converted.get(id(proc_symbol.block_ast))
+            if block is not None:
+                proc_symbol.block_ast=block
+        return node
+
+    def add(self,token):
+        return self.positions.add(token.lineno,token.column)
+
+    def convert(self,node):
+        if node is None:
+            return None
+        new=self.converted.get(id(node))
+        # Type nodes are shared between declarations and block_ast is shared
+        # with its ProcedureDecl, the source tree stays alive while converting
+        # so ids are stable
+        if new is None:
+            new=self.converted[id(node)]=self.visit(node)
+        return new
+
+    def visit_BinOp(self,node):
+        return BinOp(self.convert(node.left),TYPE_CODES[node.op.type],self.convert(node.right),self.positions,self.add(node.op),node.expr_type)
+
+    def visit_UnaryOp(self,node):
+        return UnaryOp(TYPE_CODES[node.op.type],self.convert(node.expr),self.positions,self.add(node.op),node.expr_type)
+
+    def visit_Num(self,node):
+        return Num(node.value,TYPE_CODES[node.token.type],self.positions,self.add(node.token),node.expr_type)
+
+    def visit_Var(self,node):
+        return Var(node.value,self.positions,self.add(node.token),node.scope_level,node.index,node.expr_type)
+
+    def visit_Type(self,node):
+        return Type(node.value,TYPE_CODES[node.token.type],self.positions,self.add(node.token))
+
+    def visit_Assign(self,node):
+        return Assign(self.convert(node.left),self.convert(node.right),self.positions,self.add(node.op))
+
+    def visit_ProcedureCall(self,node):
+        if node.proc_symbol is not None:
+            self.proc_symbols.append(node.proc_symbol)
+        return ProcedureCall(node.proc_name,[self.convert(param) for param in node.actual_params],self.positions,self.add(node.token),node.proc_symbol)
+
+    def visit_Param(self,node):
+        return Param(self.convert(node.var_node),self.convert(node.type_node))
+
+    def visit_Program(self,node):
+        return Program(node.name,self.convert(node.block),self.positions,node.slot_names,node.internal_names)
+
+    def visit_Block(self,node):
+        return Block([self.convert(decl) for decl in node.declarations],self.convert(node.compound_statement))
+
+    def visit_VarDecl(self,node):
+        return VarDecl(self.convert(node.var_node),self.convert(node.type_node))
+
+    def visit_ProcedureDecl(self,node):
+        return ProcedureDecl(node.proc_name,[self.convert(param) for param in node.params],self.convert(node.block_node))
+
+    def visit_Compound(self,node):
+        return Compound([self.convert(child) for child in node.children])
+
+    def visit_NoOp(self,node):
+        return NoOp()
+
+def compact(tree):
+    return Compactor().compact(tree)
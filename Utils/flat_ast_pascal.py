@@ -0,0 +1,525 @@
+import mmap
+import struct
+import sys
+from array import array
+from enum import IntEnum
+
+from Utils.lexer_pascal import Token,TokenType,Error
+from Utils.token_buffer_pascal import TOKEN_TYPES,TYPE_CODES
+
+class FlatASTError(Error):
+    pass
+
+class NodeKind(IntEnum):
+    PROGRAM=0       # payload: name,  children: block
+    BLOCK=1         # children: declarations..., compound statement
+    VARDECL=2       # children: var, type
+    PROCDECL=3      # payload: name,  children: params..., block
+    PARAM=4         # children: var, type
+    TYPE=5          # payload: type name
+    COMPOUND=6      # children: statements...
+    ASSIGN=7        # children: var, expression
+    PROCCALL=8      # payload: name,  children: arguments...
+    VAR=9           # payload: name
+    NUM=10          # payload: value
+    BINOP=11        # children: left, right
+    UNARYOP=12      # children: expression
+    NOOP=13
+
+_NONE=-1
+# expr_types codes, 0 means not annotated
+_EXPR_TYPES=(None,'INTEGER','REAL')
+
+class FlatAST(object):
+    # A whole tree in parallel arrays indexed by node number. Node i has
+    # kind[i], the TokenType code of its token in tok[i], its first child and
+    # next sibling (or -1), a constant pool index in payload[i] (or -1) and
+    # its source position in lines[i]/columns[i]. Children always have
+    # smaller numbers than their parent.
+    def __init__(self):
+        self.kind=bytearray()
+        self.tok=bytearray()
+        self.first_child=array('i')
+        self.next_sibling=array('i')
+        self.payload=array('i')
+        self.lines=array('I')
+        self.columns=array('I')
+        self.pool=[]
+        self.root=_NONE
+        # filled in through the adapter by the SemanticAnalyzer
+        self.scope_levels=None
+        self.slot_indexes=None
+        self.proc_symbols={}
+        self.slot_names=None
+        self.expr_types=None
+        self._mmap=None
+
+    def __len__(self):
+        return len(self.kind)
+
+    def children(self,i):
+        child=self.first_child[i]
+        next_sibling=self.next_sibling
+        while child!=_NONE:
+            yield child
+            child=next_sibling[child]
+
+    def value(self,i):
+        return self.pool[self.payload[i]]
+
+    def view(self,i):
+        return _VIEWS[self.kind[i]](self,i)
+
+    def program(self):
+        return self.view(self.root)
+
+    def annotate(self,i,scope_level,index):
+        if self.scope_levels is None:
+            self.scope_levels=array('i',[_NONE])*len(self)
+            self.slot_indexes=array('i',[_NONE])*len(self)
+        self.scope_levels[i]=_NONE if scope_level is None else scope_level
+        self.slot_indexes[i]=_NONE if index is None else index
+
+    def expr_type(self,i):
+        if self.expr_types is None:
+            return None
+        return _EXPR_TYPES[self.expr_types[i]]
+
+    def set_expr_type(self,i,expr_type):
+        if self.expr_types is None:
+            self.expr_types=bytearray(len(self))
+        self.expr_types[i]=_EXPR_TYPES.index(expr_type)
+
+    # Only the parsed tree is written. The analyzer annotations (scope levels,
+    # slot indexes, slot names, expression types and the proc_symbol links,
+    # which point at symbol objects) are left out, a loaded tree has to go
+    # through the SemanticAnalyzer again before it is interpreted.
+    def dumps(self):
+        return b''.join(_dump(self))
+
+    def save(self,path):
+        with open(path,'wb') as f:
+            for chunk in _dump(self):
+                f.write(chunk)
+
+    @classmethod
+    def load(cls,path):
+        # The node arrays are memoryviews straight into a read-only mapping
+        # of the file, nothing is copied or unpickled. Several processes
+        # loading the same file share its pages.
+        with open(path,'rb') as f:
+            mapping=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        tree=cls.loads(mapping)
+        tree._mmap=mapping
+        return tree
+
+    @classmethod
+    def loads(cls,data):
+        view=memoryview(data)
+        if len(view)<_HEADER.size:
+            raise FlatASTError(message='Truncated flat AST file')
+        magic,version,byteorder,n,root,npool=_HEADER.unpack_from(view,0)
+        if magic!=_MAGIC:
+            raise FlatASTError(message='Not a flat AST file')
+        if version!=FORMAT_VERSION:
+            raise FlatASTError(message=f'Unsupported flat AST version {version} (expected {FORMAT_VERSION})')
+        if byteorder!=_BYTEORDER:
+            raise FlatASTError(message='Flat AST file was written with a different byte order')
+        tree=cls()
+        pos=_HEADER.size
+        if len(view)<pos+2*n+-(pos+2*n)%4+4*n*len(_INT_ARRAYS):
+            raise FlatASTError(message='Truncated flat AST file')
+        tree.kind=view[pos:pos+n]
+        pos+=n
+        tree.tok=view[pos:pos+n]
+        pos+=n
+        pos+=-pos%4
+        for name,code in _INT_ARRAYS:
+            setattr(tree,name,view[pos:pos+4*n].cast(code))
+            pos+=4*n
+        tree.pool=_load_pool(view,pos,npool)
+        tree.root=root
+        return tree
+
+# File layout: header, kind and tok bytes, padding to 4 bytes, then the
+# first_child, next_sibling, payload, lines and columns arrays (4 bytes per
+# node each, native byte order) and finally the constant pool.
+_MAGIC=b'PASFLAT'
+FORMAT_VERSION=1
+_HEADER=struct.Struct('<7sHBIiI')
+_BYTEORDER=0 if sys.byteorder=='little' else 1
+_INT_ARRAYS=(('first_child','i'),('next_sibling','i'),('payload','i'),('lines','I'),('columns','I'))
+
+def _dump(tree):
+    n=len(tree)
+    yield _HEADER.pack(_MAGIC,FORMAT_VERSION,_BYTEORDER,n,tree.root,len(tree.pool))
+    yield bytes(tree.kind)
+    yield bytes(tree.tok)
+    yield b'\0'*(-(_HEADER.size+2*n)%4)
+    for name,_ in _INT_ARRAYS:
+        yield memoryview(getattr(tree,name)).tobytes()
+    for value in tree.pool:
+        if isinstance(value,str):
+            data=value.encode('utf-8')
+            yield b's'+struct.pack('<I',len(data))+data
+        elif isinstance(value,float):
+            yield b'f'+struct.pack('<d',value)
+        else:
+            data=str(value).encode('ascii')
+            yield b'i'+struct.pack('<I',len(data))+data
+
+def _take(view,pos,size):
+    if pos+size>len(view):
+        raise FlatASTError(message='Truncated flat AST file')
+    return view[pos:pos+size]
+
+def _load_pool(view,pos,npool):
+    pool=[]
+    for _ in range(npool):
+        tag=bytes(_take(view,pos,1))
+        pos+=1
+        if tag==b'f':
+            pool.append(struct.unpack('<d',_take(view,pos,8))[0])
+            pos+=8
+            continue
+        (size,)=struct.unpack('<I',_take(view,pos,4))
+        pos+=4
+        data=bytes(_take(view,pos,size))
+        pos+=size
+        try:
+            if tag==b's':
+                pool.append(sys.intern(data.decode('utf-8')))
+            elif tag==b'i':
+                pool.append(int(data))
+            else:
+                raise FlatASTError(message=f'Unknown constant tag {tag!r}')
+        except ValueError as e:
+            # UnicodeDecodeError is a ValueError as well
+            raise FlatASTError(message=f'Bad constant in flat AST file: {e}') from e
+    return pool
+
+class FlatBuilder(object):
+    # Parser builder that appends nodes to a FlatAST instead of creating
+    # objects, node references are plain integers:
+    #     tree=Parser(lexer,builder=FlatBuilder()).parse()
+    def __init__(self):
+        self.tree=FlatAST()
+        self.has_parent=bytearray()
+        self.pool_index={}
+
+    def intern(self,value):
+        key=(type(value),value)
+        index=self.pool_index.get(key)
+        if index is None:
+            index=self.pool_index[key]=len(self.tree.pool)
+            self.tree.pool.append(value)
+        return index
+
+    def new(self,kind,token=None,value=None,children=()):
+        tree=self.tree
+        owned=[]
+        for child in children:
+            if self.has_parent[child]:
+                # Type nodes are shared between declarations in the object
+                # tree, a flat node can only have one parent. The copy is
+                # made before the parent is appended, so it gets a smaller
+                # number as well.
+                child=self.copy_leaf(child)
+            self.has_parent[child]=1
+            owned.append(child)
+        i=len(tree.kind)
+        tree.kind.append(kind)
+        tree.tok.append(TYPE_CODES[token.type] if token is not None else 0)
+        tree.payload.append(self.intern(value) if value is not None else _NONE)
+        tree.lines.append(token.lineno or 0 if token is not None else 0)
+        tree.columns.append(token.column or 0 if token is not None else 0)
+        tree.first_child.append(_NONE)
+        tree.next_sibling.append(_NONE)
+        self.has_parent.append(0)
+        previous=_NONE
+        for child in owned:
+            if previous==_NONE:
+                tree.first_child[i]=child
+            else:
+                tree.next_sibling[previous]=child
+            previous=child
+        return i
+
+    def copy_leaf(self,i):
+        tree=self.tree
+        if tree.first_child[i]!=_NONE:
+            raise FlatASTError(message='Only leaf nodes can be shared')
+        j=len(tree.kind)
+        for name in ('kind','tok','payload','lines','columns'):
+            column=getattr(tree,name)
+            column.append(column[i])
+        tree.first_child.append(_NONE)
+        tree.next_sibling.append(_NONE)
+        self.has_parent.append(0)
+        return j
+
+    def bin_op(self,left,op,right):
+        return self.new(NodeKind.BINOP,op,children=(left,right))
+
+    def unary_op(self,op,expr):
+        return self.new(NodeKind.UNARYOP,op,children=(expr,))
+
+    def num(self,token):
+        return self.new(NodeKind.NUM,token,token.value)
+
+    def var(self,token):
+        return self.new(NodeKind.VAR,token,token.value)
+
+    def param(self,var_node,type_node):
+        return self.new(NodeKind.PARAM,children=(var_node,type_node))
+
+    def program(self,name,block):
+        return self.new(NodeKind.PROGRAM,value=name,children=(block,))
+
+    def block(self,declarations,compound_statement):
+        return self.new(NodeKind.BLOCK,children=(*declarations,compound_statement))
+
+    def var_decl(self,var_node,type_node):
+        return self.new(NodeKind.VARDECL,children=(var_node,type_node))
+
+    def procedure_decl(self,proc_name,params,block_node):
+        return self.new(NodeKind.PROCDECL,value=proc_name,children=(*params,block_node))
+
+    def type_spec(self,token):
+        return self.new(NodeKind.TYPE,token,token.value)
+
+    def compound(self,children):
+        return self.new(NodeKind.COMPOUND,children=children)
+
+    def assign(self,left,op,right):
+        return self.new(NodeKind.ASSIGN,op,children=(left,right))
+
+    def procedure_call(self,proc_name,actual_params,token):
+        return self.new(NodeKind.PROCCALL,token,proc_name,children=actual_params)
+
+    def no_op(self):
+        return self.new(NodeKind.NOOP)
+
+    def finish(self,root):
+        self.tree.root=root
+        return self.tree
+
+# Adapter: light views over a FlatAST that look like the Parser_pascal node
+# classes (same class names and attributes), so the SemanticAnalyzer,
+# Interpreter and the other visitors can walk a flat tree unchanged.
+# Analyzer annotations are stored back into the FlatAST.
+
+_OPERATORS=[Token(token_type,token_type.value) for token_type in TOKEN_TYPES]
+
+class _View(object):
+    __slots__=('tree','i')
+
+    def __init__(self,tree,i):
+        self.tree=tree
+        self.i=i
+
+    def __eq__(self,other):
+        return type(other) is type(self) and other.tree is self.tree and other.i==self.i
+
+    def __hash__(self):
+        return hash((id(self.tree),self.i))
+
+    def child_views(self):
+        tree=self.tree
+        return [tree.view(child) for child in tree.children(self.i)]
+
+    def first(self):
+        return self.tree.view(self.tree.first_child[self.i])
+
+    def second(self):
+        tree=self.tree
+        return tree.view(tree.next_sibling[tree.first_child[self.i]])
+
+    @property
+    def token(self):
+        tree=self.tree
+        i=self.i
+        token_type=TOKEN_TYPES[tree.tok[i]]
+        value=tree.value(i) if tree.payload[i]!=_NONE else token_type.value
+        return Token(token_type,value,tree.lines[i],tree.columns[i])
+
+class _Expr(_View):
+    __slots__=()
+
+    @property
+    def expr_type(self):
+        return self.tree.expr_type(self.i)
+
+    @expr_type.setter
+    def expr_type(self,expr_type):
+        self.tree.set_expr_type(self.i,expr_type)
+
+class BinOp(_Expr):
+    __slots__=()
+    left=property(_View.first)
+    right=property(_View.second)
+
+    @property
+    def op(self):
+        return _OPERATORS[self.tree.tok[self.i]]
+
+class UnaryOp(_Expr):
+    __slots__=()
+    expr=property(_View.first)
+
+    @property
+    def op(self):
+        return _OPERATORS[self.tree.tok[self.i]]
+
+class Assign(_View):
+    __slots__=()
+    left=property(_View.first)
+    right=property(_View.second)
+
+    @property
+    def op(self):
+        return _OPERATORS[self.tree.tok[self.i]]
+
+class Num(_Expr):
+    __slots__=()
+
+    @property
+    def value(self):
+        return self.tree.value(self.i)
+
+class Type(_View):
+    __slots__=()
+
+    @property
+    def value(self):
+        return self.tree.value(self.i)
+
+class Var(_Expr):
+    __slots__=()
+
+    @property
+    def value(self):
+        return self.tree.value(self.i)
+
+    @property
+    def scope_level(self):
+        levels=self.tree.scope_levels
+        if levels is None or levels[self.i]==_NONE:
+            return None
+        return levels[self.i]
+
+    @scope_level.setter
+    def scope_level(self,scope_level):
+        self.tree.annotate(self.i,scope_level,self.index)
+
+    @property
+    def index(self):
+        indexes=self.tree.slot_indexes
+        if indexes is None or indexes[self.i]==_NONE:
+            return None
+        return indexes[self.i]
+
+    @index.setter
+    def index(self,index):
+        self.tree.annotate(self.i,self.scope_level,index)
+
+class ProcedureCall(_View):
+    __slots__=()
+
+    @property
+    def proc_name(self):
+        return self.tree.value(self.i)
+
+    @property
+    def actual_params(self):
+        return self.child_views()
+
+    @property
+    def proc_symbol(self):
+        return self.tree.proc_symbols.get(self.i)
+
+    @proc_symbol.setter
+    def proc_symbol(self,proc_symbol):
+        self.tree.proc_symbols[self.i]=proc_symbol
+
+class Param(_View):
+    __slots__=()
+    var_node=property(_View.first)
+    type_node=property(_View.second)
+
+class VarDecl(_View):
+    __slots__=()
+    var_node=property(_View.first)
+    type_node=property(_View.second)
+
+class Program(_View):
+    __slots__=()
+    block=property(_View.first)
+    # the optimizer passes that add temporaries work on Parser trees
+    internal_names=frozenset()
+
+    @property
+    def name(self):
+        return self.tree.value(self.i)
+
+    @property
+    def slot_names(self):
+        return self.tree.slot_names
+
+    @slot_names.setter
+    def slot_names(self,slot_names):
+        self.tree.slot_names=slot_names
+
+class Block(_View):
+    __slots__=()
+
+    @property
+    def declarations(self):
+        return self.child_views()[:-1]
+
+    @property
+    def compound_statement(self):
+        return self.child_views()[-1]
+
+class ProcedureDecl(_View):
+    __slots__=()
+
+    @property
+    def proc_name(self):
+        return self.tree.value(self.i)
+
+    @property
+    def params(self):
+        return self.child_views()[:-1]
+
+    @property
+    def block_node(self):
+        return self.child_views()[-1]
+
+class Compound(_View):
+    __slots__=()
+
+    @property
+    def children(self):
+        return self.child_views()
+
+class NoOp(_View):
+    __slots__=()
+
+_VIEWS={
+    NodeKind.PROGRAM:Program,
+    NodeKind.BLOCK:Block,
+    NodeKind.VARDECL:VarDecl,
+    NodeKind.PROCDECL:ProcedureDecl,
+    NodeKind.PARAM:Param,
+    NodeKind.TYPE:Type,
+    NodeKind.COMPOUND:Compound,
+    NodeKind.ASSIGN:Assign,
+    NodeKind.PROCCALL:ProcedureCall,
+    NodeKind.VAR:Var,
+    NodeKind.NUM:Num,
+    NodeKind.BINOP:BinOp,
+    NodeKind.UNARYOP:UnaryOp,
+    NodeKind.NOOP:NoOp,
+}
+_VIEWS=[_VIEWS[kind] for kind in NodeKind]
@@ -1,3 +1,4 @@
+import re
 from enum import Enum
 
 class Token(object):
@@ -57,9 +58,17 @@ class Lexer(object):
         self.lineno=1
         self.column=1
     
+    @classmethod
+    def from_stream(cls,stream,chunk_size=1<<16):
+        return StreamLexer(stream,chunk_size)
+    
+    @classmethod
+    def from_file(cls,path,chunk_size=1<<16,encoding='utf-8'):
+        return StreamLexer(open(path,encoding=encoding),chunk_size,close=True)
+    
     def error(self):
         s=f"Lexer Error on '{self.current_char}' line: {self.lineno} column: {self.column}"
-        raise LexerError(message=s)
+        raise LexerError(message=s,lineno=self.lineno,column=self.column)
     
     def peek(self):
         peek_pos=self.pos+1
@@ -162,12 +171,192 @@ class Lexer(object):
                 return token
     
         return Token(type=TokenType.EOF,value=None)
+
+_FIXED_TOKENS={token_type.value : token_type for token_type in TokenType if not token_type.value[0].isalpha()}
+
+# Blanks and comments are skipped by the same match that reads the token.
+_TOKEN_RE=re.compile(r"""
+    (?:\s+|\{[^}]*\})*
+    (?:
+        (?P<number>\d+(?P<fraction>\.\d*)?)
+      | (?P<id>[^\W\d]\w*)
+      | (?P<fixed>:=|[-+*/();.:,])
+    )?
+""",re.VERBOSE)
+
+class RegexLexer(object):
+    # Drop-in replacement for Lexer: whole tokens are matched by one compiled
+    # pattern and sliced out of the text, line/column come from an index of
+    # newline offsets.
+    def __init__(self,text):
+        self.text=text
+        self.pos=0
+        self.newlines=[m.start() for m in re.finditer('\n',text)]
+        self.newlines.append(len(text))
+        self.line=0
+
+    @property
+    def current_char(self):
+        if self.pos<len(self.text):
+            return self.text[self.pos]
+        return None
+
+    def position(self,pos):
+        # tokens are read left to right, so the line index only moves forward
+        newlines=self.newlines
+        line=self.line
+        while newlines[line]<pos:
+            line+=1
+        self.line=line
+        line_start=newlines[line-1] if line else -1
+        return line+1,pos-line_start
+
+    def error(self,pos):
+        lineno,column=self.position(pos)
+        s=f"Lexer Error on '{self.text[pos]}' line: {lineno} column: {column}"
+        raise LexerError(message=s,lineno=lineno,column=column)
+
+    def get_next_token(self):
+        m=_TOKEN_RE.match(self.text,self.pos)
+        kind=m.lastgroup
+        self.pos=m.end()
+        if kind is None:
+            if self.pos<len(self.text):
+                self.error(self.pos)
+            return Token(type=TokenType.EOF,value=None)
+        lineno,column=self.position(m.start(kind))
+        return _make_token(m,kind,lineno,column)
+
+_ID=TokenType.ID
+_INT_CONST=TokenType.INT_CONST
+_REAL_CONST=TokenType.REAL_CONST
+
+def _make_token(m,kind,lineno,column):
+    value=m.group(kind)
+    if kind=='id':
+        token_type=RESERVED_KEYWORDS.get(value.upper())
+        if token_type is None:
+            return Token(_ID,value,lineno,column)
+        return Token(token_type,token_type.value,lineno,column)
+    if kind=='number':
+        if m.group('fraction') is None:
+            return Token(_INT_CONST,int(value),lineno,column)
+        return Token(_REAL_CONST,float(value),lineno,column)
+    return Token(_FIXED_TOKENS[value],value,lineno,column)
+
+class StreamLexer(object):
+    # Lexer over a text stream that is read chunk by chunk. Only the
+    # unconsumed tail of the current chunk is kept; a token that runs into
+    # the end of the buffer is retried after the next chunk has been
+    # appended, blanks and complete comments before it are dropped first. An
+    # unclosed comment is skipped chunk by chunk until its }. Use it as a
+    # context manager or call close() when it owns the stream.
+    def __init__(self,stream,chunk_size=1<<16,close=False):
+        self.stream=stream
+        self.chunk_size=chunk_size
+        self.close_stream=close
+        self.buffer=''
+        self.pos=0
+        self.offset=0
+        self.at_eof=False
+        self.lineno=1
+        self.line_start=-1
+        # (lineno, column) of the { of a comment still being skipped
+        self.comment=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc_info):
+        self.close()
+
+    def close(self):
+        if self.close_stream:
+            self.stream.close()
+
+    def fill(self):
+        chunk=self.stream.read(self.chunk_size)
+        if not chunk:
+            self.at_eof=True
+            self.close()
+            return
+        self.offset+=self.pos
+        self.buffer=self.buffer[self.pos:]+chunk
+        self.pos=0
+
+    @property
+    def current_char(self):
+        if self.pos>=len(self.buffer) and not self.at_eof:
+            self.fill()
+        if self.pos<len(self.buffer):
+            return self.buffer[self.pos]
+        return None
+
+    def advance_lines(self,end):
+        buffer=self.buffer
+        count=buffer.count('\n',self.pos,end)
+        if count:
+            self.lineno+=count
+            self.line_start=self.offset+buffer.rfind('\n',self.pos,end)
+
+    def skip(self,end):
+        self.advance_lines(end)
+        self.pos=end
+
+    def error(self,pos):
+        self.advance_lines(pos)
+        column=self.offset+pos-self.line_start
+        s=f"Lexer Error on '{self.buffer[pos]}' line: {self.lineno} column: {column}"
+        raise LexerError(message=s,lineno=self.lineno,column=column)
+
+    def skip_comment(self):
+        # only the text read since the last call is searched for the }
+        while True:
+            close=self.buffer.find('}',self.pos)
+            if close!=-1:
+                self.skip(close+1)
+                self.comment=None
+                return
+            self.skip(len(self.buffer))
+            if self.at_eof:
+                lineno,column=self.comment
+                raise LexerError(message=f"Lexer Error on '{{' line: {lineno} column: {column}",lineno=lineno,column=column)
+            self.fill()
+
+    def get_next_token(self):
+        while True:
+            m=_TOKEN_RE.match(self.buffer,self.pos)
+            kind=m.lastgroup
+            end=m.end()
+            if kind is None and end<len(self.buffer):
+                if self.buffer[end]!='{':
+                    # no token starts here and more text can't change that
+                    self.error(end)
+                # the comment has no } in the buffer
+                self.skip(end)
+                self.comment=(self.lineno,self.offset+end-self.line_start)
+                self.pos=end+1
+                self.skip_comment()
+                continue
+            if not self.at_eof and end==len(self.buffer):
+                self.skip(m.start(kind) if kind is not None else end)
+                self.fill()
+                continue
+            if kind is None:
+                self.pos=end
+                return Token(type=TokenType.EOF,value=None)
+            start=m.start(kind)
+            self.advance_lines(start)
+            token=_make_token(m,kind,self.lineno,self.offset+start-self.line_start)
+            self.pos=end
+            return token
     
 class ErrorCode(Enum):
     UNEXPECTED_TOKEN='Unexpected token'
     ID_NOT_FOUND='Identifier not found'
     DUPLICATE_ID='Duplicate id found'
     PARAM_INEQUALITY='More or Less Parameters than needed'
+    INCOMPATIBLE_TYPES='Incompatible types'
 
 class Error(Exception):
     def __init__(self,error_code=None,token=None,message=None):
@@ -176,7 +365,11 @@ class Error(Exception):
         self.message=f'{self.__class__.__name__}: {message}'
         
 class LexerError(Error):
-    pass
+    # there is no token yet, the position is kept on its own
+    def __init__(self,error_code=None,token=None,message=None,lineno=None,column=None):
+        super().__init__(error_code,token,message)
+        self.lineno=lineno
+        self.column=column
 
 class ParserError(Error):
     pass
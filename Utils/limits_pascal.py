@@ -0,0 +1,102 @@
+import sys
+from time import monotonic
+
+from Utils.lexer_pascal import Error
+
+class ExecutionLimitError(Error):
+    pass
+
+class ResourceLimitError(Error):
+    pass
+
+class InterpreterError(Error):
+    pass
+
+def _position_token(node):
+    # Compound, Block and Program carry no token, report the first statement
+    # below them instead
+    while node is not None:
+        token=getattr(node,'token',None)
+        if token is not None:
+            return token
+        children=getattr(node,'children',None)
+        if children:
+            node=children[0]
+        else:
+            node=getattr(node,'compound_statement',None) or getattr(node,'block',None) or getattr(node,'block_node',None)
+    return None
+
+def _at(message,token):
+    if token is not None:
+        message=f'{message} at line {token.lineno} column {token.column}'
+    return message
+
+def recursion_limit_error(node):
+    # Procedure calls recurse in Python, a Pascal call chain deeper than
+    # the interpreter's recursion limit is reported like the other limits
+    token=_position_token(node)
+    message=_at(f'recursion limit of {sys.getrecursionlimit()} Python frames exceeded',token)
+    return ResourceLimitError(token=token,message=message)
+
+def interpreter_error(node,e):
+    # ZeroDivisionError, TypeError on unassigned variables and the like are
+    # raised by Python, node is the innermost one being visited
+    token=_position_token(node)
+    return InterpreterError(token=token,message=_at(f'{e.__class__.__name__}: {e}',token))
+
+class ExecutionLimits(object):
+    # Step budget and wall-clock deadline for one interpreter run. Every
+    # visited node is one step. The budget is counted down exactly, the
+    # clock is only read every check_every steps.
+    def __init__(self,max_steps=None,time_limit=None,check_every=1024):
+        self.max_steps=max_steps
+        self.time_limit=time_limit
+        self.check_every=check_every
+        self.start()
+
+    def start(self):
+        # checked counts the steps up to the last check, the visits since
+        # then are counted down from interval
+        self.checked=0
+        self.deadline=monotonic()+self.time_limit if self.time_limit is not None else None
+        self.interval=self.countdown=self._next_interval()
+
+    def _next_interval(self):
+        if self.max_steps is None:
+            return self.check_every
+        return max(min(self.check_every,self.max_steps-self.checked),1)
+
+    @property
+    def steps(self):
+        return self.checked+self.interval-self.countdown
+
+    def instrument(self,visit):
+        limits=self
+
+        def limited_visit(node):
+            limits.countdown-=1
+            if limits.countdown<=0:
+                limits.check(node)
+            return visit(node)
+        return limited_visit
+
+    def charge(self,steps,node):
+        # steps taken without a visit, e.g. the postfix ops of an expression
+        # StackInterpreter evaluates in one visit
+        self.countdown-=steps
+        if self.countdown<=0:
+            self.check(node)
+
+    def check(self,node):
+        # countdown is below zero when charge overshot the interval
+        self.checked+=self.interval-self.countdown
+        self.interval=self.countdown=0
+        if self.max_steps is not None and self.checked>self.max_steps:
+            self.error(node,f'step budget of {self.max_steps} exceeded')
+        if self.deadline is not None and monotonic()>self.deadline:
+            self.error(node,f'time limit of {self.time_limit}s exceeded after {self.checked} steps')
+        self.interval=self.countdown=self._next_interval()
+
+    def error(self,node,message):
+        token=_position_token(node)
+        raise ExecutionLimitError(token=token,message=_at(message,token))
@@ -0,0 +1,685 @@
+from Utils.lexer_pascal import Token,TokenType
+from Utils.Parser_pascal import BinOp,UnaryOp,Num,Var,Assign,VarDecl,Type,ProcedureDecl
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.visitor_pascal import NodeVisitor
+
+# Same operations the Interpreter performs, so folding never changes a result
+_FOLD={
+    TokenType.PLUS:lambda l,r: l+r,
+    TokenType.MINUS:lambda l,r: l-r,
+    TokenType.MUL:lambda l,r: l*r,
+    TokenType.INT_DIV:lambda l,r: l//r,
+    TokenType.FLOAT_DIV:lambda l,r: l/r,
+}
+
+def _is_int(node,value):
+    return isinstance(node,Num) and type(node.value) is int and node.value==value
+
+def _make_num(value,token):
+    token_type=TokenType.REAL_CONST if isinstance(value,float) else TokenType.INT_CONST
+    node=Num(Token(type=token_type,value=value,lineno=token.lineno,column=token.column))
+    node.expr_type='REAL' if isinstance(value,float) else 'INTEGER'
+    return node
+
+def _make_op(token_type,token):
+    return Token(type=token_type,value=token_type.value,lineno=token.lineno,column=token.column)
+
+class ConstantFolder(NodeVisitor):
+    # Folds constant operations and applies x+0, x-0, x*1, +x and - -x on a
+    # checked tree. Those identities drop the arithmetic on x, which raises
+    # TypeError when x is a variable that was never assigned, so a bare
+    # variable is only simplified where it certainly holds a number (see
+    # _NumberFlow). Expressions are walked with an explicit stack.
+    def __init__(self):
+        self.removed=0
+        self.effects={}
+        self.level=None
+        self.params=set()
+        self.flow=None
+
+    def optimize(self,tree):
+        self.visit(tree)
+        return self.removed
+
+    def visit_Program(self,node):
+        self.level=1
+        self.visit(node.block)
+        return node
+
+    def visit_Block(self,node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        flow=self.flow
+        self.flow=_NumberFlow(self.level,self.params,self.effects)
+        self.visit(node.compound_statement)
+        self.flow=flow
+        return node
+
+    def visit_ProcedureDecl(self,node):
+        level,params=self.level,self.params
+        self.level=level+1
+        self.params={(self.level,param.var_node.value) for param in node.params}
+        self.visit(node.block_node)
+        self.level,self.params=level,params
+        return node
+
+    def visit_VarDecl(self,node):
+        return node
+
+    def visit_Compound(self,node):
+        node.children=[self.visit(child) for child in node.children]
+        return node
+
+    def visit_NoOp(self,node):
+        return node
+
+    def visit_Assign(self,node):
+        node.right=self.visit(node.right)
+        self.flow.statement(node)
+        return node
+
+    def visit_ProcedureCall(self,node):
+        node.actual_params=[self.visit(argument_node) for argument_node in node.actual_params]
+        self.flow.statement(node)
+        return node
+
+    def visit_Var(self,node):
+        return node
+
+    def visit_Num(self,node):
+        return node
+
+    def visit_BinOp(self,node):
+        values=[]
+        stack=[(node,False)]
+        while stack:
+            node,expanded=stack.pop()
+            if isinstance(node,BinOp):
+                if expanded:
+                    node.right=values.pop()
+                    node.left=values.pop()
+                    values.append(self.binary(node))
+                else:
+                    stack.append((node,True))
+                    stack.append((node.right,False))
+                    stack.append((node.left,False))
+            elif isinstance(node,UnaryOp):
+                if expanded:
+                    node.expr=values.pop()
+                    values.append(self.unary(node))
+                else:
+                    stack.append((node,True))
+                    stack.append((node.expr,False))
+            else:
+                values.append(node)
+        return values.pop()
+
+    visit_UnaryOp=visit_BinOp
+
+    def number(self,node):
+        # whether dropping the arithmetic on node can't hide a TypeError
+        if isinstance(node,Var):
+            return (node.scope_level,node.value) in self.flow.numbers
+        return True
+
+    def unary(self,node):
+        expr=node.expr
+        op=node.op.type
+        if isinstance(expr,Num):
+            self.removed+=1
+            return expr if op==TokenType.PLUS else _make_num(-expr.value,node.op)
+        if op==TokenType.PLUS:
+            if self.number(expr):
+                # +e -> e
+                self.removed+=1
+                return expr
+        elif isinstance(expr,UnaryOp) and expr.op.type==TokenType.MINUS and self.number(expr.expr):
+            # - -e -> e
+            self.removed+=2
+            return expr.expr
+        return node
+
+    def binary(self,node):
+        left=node.left
+        right=node.right
+        op=node.op.type
+
+        if isinstance(left,Num) and isinstance(right,Num):
+            if op in (TokenType.INT_DIV,TokenType.FLOAT_DIV) and right.value==0:
+                # leave the division by zero to run time
+                return node
+            self.removed+=2
+            return _make_num(_FOLD[op](left.value,right.value),node.op)
+
+        # Identities are only applied with INTEGER constants, a REAL
+        # constant would promote the other operand.
+        if op==TokenType.PLUS:
+            if _is_int(right,0) and self.number(left):
+                self.removed+=2
+                return left
+            if _is_int(left,0) and self.number(right):
+                self.removed+=2
+                return right
+        elif op==TokenType.MINUS and _is_int(right,0) and self.number(left):
+            self.removed+=2
+            return left
+        elif op==TokenType.MUL:
+            if _is_int(right,1) and self.number(left):
+                self.removed+=2
+                return left
+            if _is_int(left,1) and self.number(right):
+                self.removed+=2
+                return right
+
+        if op in (TokenType.PLUS,TokenType.MINUS) and isinstance(right,UnaryOp) and right.op.type==TokenType.MINUS:
+            # a - -b -> a + b, a + -b -> a - b
+            self.removed+=1
+            flipped=TokenType.PLUS if op==TokenType.MINUS else TokenType.MINUS
+            new=BinOp(left=left,op=_make_op(flipped,node.op),right=right.expr)
+            new.expr_type=node.expr_type
+            return new
+        return node
+
+# Procedures that talk to the outside world. A call to one of these, or to
+# anything else without a Pascal body, is never removed.
+IO_BUILTINS=frozenset({'WRITE','WRITELN','READ','READLN'})
+
+def _expression_info(node):
+    # (scope_level, name) of every variable the expression reads, and
+    # whether evaluating it can raise: only a division by something other
+    # than a non-zero constant can, once the SemanticAnalyzer has passed
+    reads=set()
+    can_fail=False
+    stack=[node]
+    while stack:
+        node=stack.pop()
+        if isinstance(node,BinOp):
+            if node.op.type in (TokenType.INT_DIV,TokenType.FLOAT_DIV) and not (isinstance(node.right,Num) and node.right.value!=0):
+                can_fail=True
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node,UnaryOp):
+            stack.append(node.expr)
+        elif isinstance(node,Var):
+            reads.add((node.scope_level,node.value))
+    return reads,can_fail
+
+def _statements(compound):
+    # the assignments and calls of a Compound in execution order
+    for statement in compound.children:
+        kind=statement.__class__.__name__
+        if kind=='Compound':
+            yield from _statements(statement)
+        elif kind in ('Assign','ProcedureCall'):
+            yield statement
+
+class ProcedureEffects(object):
+    # What a call to a procedure can do to variables outside of it
+    def __init__(self):
+        self.reads=set()
+        self.writes=set()
+        # parameters and non-locals that must hold a number when it is
+        # called, and non-locals it may leave without one
+        self.unsafe=set()
+        self.none_writes=set()
+        # I/O, a possible run-time error or recursion
+        self.impure=False
+
+    @property
+    def removable(self):
+        return not (self.impure or self.writes)
+
+class _NumberFlow(object):
+    # Forward walk over a body that tracks which variables certainly hold a
+    # number. A variable that was never assigned is None, arithmetic on it
+    # raises TypeError, so that counts as a possible failure just like a
+    # division. In a procedure the parameters and non-locals are only known
+    # at the call site, the ones that would need a number are collected in
+    # unsafe and checked by the caller.
+    def __init__(self,level,params,cache):
+        self.level=level
+        self.params=params
+        self.cache=cache
+        self.numbers=set()
+        self.unsafe=set()
+        self.none_writes=set()
+        # a possible failure whatever the caller does
+        self.failing=False
+
+    def need(self,key):
+        # whether reading key in arithmetic may fail
+        if key in self.numbers:
+            return False
+        if self.level>1 and (key[0]<self.level or key in self.params):
+            self.unsafe.add(key)
+        else:
+            self.failing=True
+        return True
+
+    def expression(self,node):
+        reads,can_fail=_expression_info(node)
+        if can_fail:
+            self.failing=True
+        if isinstance(node,Var):
+            # a plain copy never fails
+            return can_fail
+        fails=can_fail
+        for key in reads:
+            fails=self.need(key) or fails
+        return fails
+
+    def store(self,key,node):
+        # a copy of a variable that may be None may be None as well
+        if isinstance(node,Var) and (node.scope_level,node.value) not in self.numbers:
+            self.clear(key)
+        else:
+            self.numbers.add(key)
+
+    def clear(self,key):
+        self.numbers.discard(key)
+        if key[0]<self.level:
+            self.none_writes.add(key)
+
+    def statement(self,node):
+        # whether the statement may raise
+        if node.__class__.__name__=='Assign':
+            fails=self.expression(node.right)
+            self.store((node.left.scope_level,node.left.value),node.right)
+            return fails
+        proc_symbol=node.proc_symbol
+        effects=procedure_effects(proc_symbol,node.proc_name,self.cache)
+        fails=effects.impure
+        if fails:
+            self.failing=True
+        for argument_node in node.actual_params:
+            fails=self.expression(argument_node) or fails
+        arguments={}
+        for param_symbol,argument_node in zip(getattr(proc_symbol,'params',()),node.actual_params):
+            arguments[(proc_symbol.scope_level,param_symbol.name)]=argument_node
+        for key in effects.unsafe:
+            argument_node=arguments.get(key)
+            if argument_node is None:
+                fails=self.need(key) or fails
+            elif isinstance(argument_node,Var):
+                fails=self.need((argument_node.scope_level,argument_node.value)) or fails
+        for key in effects.none_writes:
+            self.clear(key)
+        return fails
+
+def procedure_effects(proc_symbol,proc_name,cache):
+    # Summary of a call to proc_symbol, cache maps procedure symbols to
+    # summaries already built
+    block=getattr(proc_symbol,'block_ast',None)
+    if block is None or proc_name.upper() in IO_BUILTINS:
+        effects=ProcedureEffects()
+        effects.impure=True
+        return effects
+    effects=cache.get(proc_symbol)
+    if effects is not None:
+        return effects
+    effects=cache[proc_symbol]=ProcedureEffects()
+    # seen again while it is summarized means recursion, which never
+    # ends in a language without conditionals. The procedures on the
+    # cycle keep the incomplete summary, they are never removed and
+    # the program fails with RecursionError anyway.
+    effects.impure=True
+    level=proc_symbol.scope_level
+    flow=_NumberFlow(level,{(level,param_symbol.name) for param_symbol in proc_symbol.params},cache)
+    reads=set()
+    writes=set()
+    for statement in _statements(block.compound_statement):
+        flow.statement(statement)
+        if statement.__class__.__name__=='Assign':
+            reads|=_expression_info(statement.right)[0]
+            writes.add((statement.left.scope_level,statement.left.value))
+        else:
+            callee=procedure_effects(statement.proc_symbol,statement.proc_name,cache)
+            reads|=callee.reads
+            writes|=callee.writes
+            for argument_node in statement.actual_params:
+                reads|=_expression_info(argument_node)[0]
+    # the procedure's own variables are invisible to its callers
+    effects.reads={key for key in reads if key[0]<level}
+    effects.writes={key for key in writes if key[0]<level}
+    effects.unsafe=flow.unsafe
+    effects.none_writes=flow.none_writes
+    effects.impure=flow.failing
+    return effects
+
+class DeadCodeEliminator(NodeVisitor):
+    # Removes assignments whose value is never read and calls to procedures
+    # without effects, on a checked tree. Procedures may write variables of
+    # the enclosing scopes, so every procedure is summarized by the
+    # non-local variables it reads and writes, including through the
+    # procedures it calls. At the end of the program every global is live,
+    # it is part of the final state; at the end of a procedure its locals
+    # are dead and everything else is live. A statement is only removed if
+    # it can't raise: a division by zero or arithmetic on a variable that
+    # may not have been assigned (see _NumberFlow) is kept where it is.
+    def __init__(self):
+        self.removed=[]
+        self.effects={}
+        # scope level of the variables declared by the body being walked,
+        # keys with a lower level than exit_level are live at its end
+        self.level=None
+        self.exit_level=None
+        self.params=set()
+        # id of a statement -> whether it may raise
+        self.fails={}
+        # key -> whether it is live at the current statement, the backward
+        # walk fills it in
+        self.live={}
+
+    def optimize(self,tree):
+        # (kind, name, line, column) of every removed statement, in
+        # source order
+        self.visit(tree)
+        self.removed.sort(key=lambda removal: (removal[2],removal[3]))
+        return self.removed
+
+    def report(self):
+        return '\n'.join(f'line {lineno}: removed {kind} {name}' for kind,name,lineno,column in self.removed)
+
+    def is_live(self,key):
+        live=self.live.get(key)
+        if live is None:
+            return key[0]<self.exit_level
+        return live
+
+    def mark_read(self,keys):
+        for key in keys:
+            self.live[key]=True
+
+    def visit_Program(self,node):
+        self.level=1
+        self.exit_level=2
+        self.visit(node.block)
+
+    def visit_Block(self,node):
+        for declaration in node.declarations:
+            self.visit(declaration)
+        flow=_NumberFlow(self.level,self.params,self.effects)
+        self.fails={id(statement):flow.statement(statement) for statement in _statements(node.compound_statement)}
+        self.live={}
+        self.visit(node.compound_statement)
+
+    def visit_ProcedureDecl(self,node):
+        level,exit_level,params=self.level,self.exit_level,self.params
+        self.level=self.exit_level=level+1
+        self.params={(self.level,param.var_node.value) for param in node.params}
+        self.visit(node.block_node)
+        self.level,self.exit_level,self.params=level,exit_level,params
+
+    def visit_VarDecl(self,node):
+        pass
+
+    def visit_NoOp(self,node):
+        return True
+
+    def visit_Compound(self,node):
+        kept=[child for child in reversed(node.children) if self.visit(child)]
+        kept.reverse()
+        node.children=kept
+        return True
+
+    def visit_Assign(self,node):
+        key=(node.left.scope_level,node.left.value)
+        reads=_expression_info(node.right)[0]
+        if not self.is_live(key) and not self.fails[id(node)]:
+            self.removed.append(('store to',node.left.value,node.token.lineno,node.token.column))
+            return False
+        self.live[key]=False
+        self.mark_read(reads)
+        return True
+
+    def visit_ProcedureCall(self,node):
+        effects=procedure_effects(node.proc_symbol,node.proc_name,self.effects)
+        reads=set()
+        for argument_node in node.actual_params:
+            reads|=_expression_info(argument_node)[0]
+        if effects.removable and not self.fails[id(node)]:
+            self.removed.append(('call to',node.proc_name,node.token.lineno,node.token.column))
+            return False
+        # a procedure may or may not write a variable, so its writes don't
+        # make earlier assignments dead
+        self.mark_read(reads|effects.reads)
+        return True
+
+# + and * give the same result with their operands swapped
+_COMMUTATIVE=(TokenType.PLUS,TokenType.MUL)
+
+class _Occurrence(object):
+    # One BinOp or UnaryOp of a statement. parent[field] (or
+    # getattr(parent, field)) is where it hangs in the tree, inner are the
+    # occurrences directly below it.
+    __slots__=('value_number','statement','parent','field','node','size','inner','dead')
+
+    def __init__(self,value_number,statement,parent,field,node,size,inner):
+        self.value_number=value_number
+        self.statement=statement
+        self.parent=parent
+        self.field=field
+        self.node=node
+        self.size=size
+        self.inner=inner
+        self.dead=False
+
+    def replace(self,new):
+        if isinstance(self.field,int):
+            self.parent[self.field]=new
+        else:
+            setattr(self.parent,self.field,new)
+
+def _declared_names(tree):
+    names={tree.name}
+    blocks=[tree.block]
+    while blocks:
+        block=blocks.pop()
+        for declaration in block.declarations:
+            if isinstance(declaration,VarDecl):
+                names.add(declaration.var_node.value)
+            elif isinstance(declaration,ProcedureDecl):
+                names.add(declaration.proc_name)
+                names.update(param.var_node.value for param in declaration.params)
+                blocks.append(declaration.block_node)
+    return names
+
+class CommonSubexpressionEliminator(NodeVisitor):
+    # Local value numbering over each Compound. Every BinOp and UnaryOp gets
+    # a value number from its operator and the value numbers of its
+    # operands, a Var's value number changes whenever the variable may have
+    # been written: by an assignment, by a procedure that writes it (see
+    # procedure_effects) or by anything at all for a nested Compound or a
+    # call with unknown effects. An expression whose value number occurs
+    # more than once is computed once into a temporary, assigned just
+    # before the statement of its first occurrence. The largest
+    # expressions are shared first, the parts of a replaced occurrence are
+    # not counted any more.
+    #
+    # The temporaries are declared in the Block of their Compound and the
+    # tree is analyzed again, which enters them in the ScopedSymbolTable of
+    # that scope and renumbers the slots, so every back end sees ordinary
+    # variables. Their names go into Program.internal_names, which keeps
+    # the ones of the program body out of its reported final state.
+    def __init__(self,analyzer=None):
+        self.analyzer=analyzer
+        # (name, type, uses, line) of every temporary
+        self.temporaries=[]
+        self.effects={}
+        self.used_names=set()
+        self.declarations=None
+        # scope level of the Block being walked
+        self.level=None
+        self.counter=0
+
+    def optimize(self,tree):
+        self.used_names={name.upper() for name in _declared_names(tree)}
+        self.visit(tree)
+        if self.temporaries:
+            tree.internal_names=tree.internal_names|{name for name,_,_,_ in self.temporaries}
+            analyzer=self.analyzer if self.analyzer is not None else SemanticAnalyzer()
+            analyzer.current_scope=None
+            analyzer.visit(tree)
+        return self.temporaries
+
+    def report(self):
+        return '\n'.join(f'line {lineno}: {name} : {type_name} replaces {uses} evaluations' for name,type_name,uses,lineno in self.temporaries)
+
+    def temporary_name(self):
+        while True:
+            self.counter+=1
+            name=f'_cse{self.counter}'
+            if name.upper() not in self.used_names:
+                self.used_names.add(name.upper())
+                return name
+
+    def visit_Program(self,node):
+        self.level=1
+        self.visit(node.block)
+
+    def visit_Block(self,node):
+        declarations=self.declarations
+        self.declarations=node.declarations
+        for declaration in list(node.declarations):
+            self.visit(declaration)
+        self.visit(node.compound_statement)
+        self.declarations=declarations
+
+    def visit_ProcedureDecl(self,node):
+        self.level+=1
+        self.visit(node.block_node)
+        self.level-=1
+
+    def visit_VarDecl(self,node):
+        pass
+
+    def visit_NoOp(self,node):
+        pass
+
+    def visit_Compound(self,node):
+        table={}
+        versions={}
+        # bumped when any variable may have changed
+        epoch=0
+        occurrences=[]
+        for statement_index,statement in enumerate(node.children):
+            kind=statement.__class__.__name__
+            if kind=='Assign':
+                self.number(statement.right,statement,'right',statement_index,table,versions,epoch,occurrences)
+                key=(statement.left.scope_level,statement.left.value)
+                versions[key]=versions.get(key,0)+1
+            elif kind=='ProcedureCall':
+                for argument_index,argument_node in enumerate(statement.actual_params):
+                    self.number(argument_node,statement.actual_params,argument_index,statement_index,table,versions,epoch,occurrences)
+                effects=procedure_effects(statement.proc_symbol,statement.proc_name,self.effects)
+                if effects.impure:
+                    epoch+=1
+                for key in effects.writes:
+                    versions[key]=versions.get(key,0)+1
+            elif kind=='Compound':
+                self.visit(statement)
+                epoch+=1
+        self.share(node,occurrences)
+
+    def number(self,root,parent,field,statement_index,table,versions,epoch,occurrences):
+        # Post-order walk with an explicit stack, value numbers and
+        # occurrences of the children are looked up by id
+        value_numbers={}
+        found={}
+        stack=[(root,parent,field,False)]
+        while stack:
+            node,parent,field,expanded=stack.pop()
+            if isinstance(node,BinOp):
+                if not expanded:
+                    stack.append((node,parent,field,True))
+                    stack.append((node.right,node,'right',False))
+                    stack.append((node.left,node,'left',False))
+                    continue
+                left=value_numbers[id(node.left)]
+                right=value_numbers[id(node.right)]
+                if node.op.type in _COMMUTATIVE and right<left:
+                    left,right=right,left
+                key=(node.op.type,left,right)
+                children=(node.left,node.right)
+            elif isinstance(node,UnaryOp):
+                if not expanded:
+                    stack.append((node,parent,field,True))
+                    stack.append((node.expr,node,'expr',False))
+                    continue
+                key=('unary',node.op.type,value_numbers[id(node.expr)])
+                children=(node.expr,)
+            elif isinstance(node,Var):
+                key=('var',node.scope_level,node.value,versions.get((node.scope_level,node.value),0),epoch)
+                children=None
+            else:
+                key=('num',type(node.value),node.value)
+                children=None
+            value_number=value_numbers[id(node)]=table.setdefault(key,len(table))
+            if children is not None:
+                inner=[found[id(child)] for child in children if id(child) in found]
+                size=1+sum(occurrence.size for occurrence in inner)+sum(1 for child in children if id(child) not in found)
+                occurrence=found[id(node)]=_Occurrence(value_number,statement_index,parent,field,node,size,inner)
+                occurrences.append(occurrence)
+
+    def share(self,node,occurrences):
+        groups={}
+        for occurrence in occurrences:
+            groups.setdefault(occurrence.value_number,[]).append(occurrence)
+        shared=[]
+        for group in sorted(groups.values(),key=lambda group: -group[0].size):
+            live=[occurrence for occurrence in group if not occurrence.dead]
+            if len(live)<2:
+                continue
+            shared.append(live)
+            # the copies are not evaluated any more, and neither is
+            # anything inside them
+            stack=[inner for occurrence in live[1:] for inner in occurrence.inner]
+            while stack:
+                occurrence=stack.pop()
+                occurrence.dead=True
+                stack.extend(occurrence.inner)
+        if not shared:
+            return
+        definitions={}
+        for live in shared:
+            first=live[0]
+            expression=first.node
+            token=expression.token
+            name=self.temporary_name()
+            type_name=expression.expr_type
+            if type_name is None:
+                # the type of the temporary can't be guessed, REAL would
+                # change the meaning of DIV
+                raise Exception(f'Expression at line {token.lineno} has no type, run the SemanticAnalyzer first')
+            definition=Assign(self.temporary(name,type_name,token),Token(TokenType.ASSIGN,TokenType.ASSIGN.value,token.lineno,token.column),expression)
+            definitions.setdefault(first.statement,[]).append((first.size,definition))
+            for occurrence in live:
+                occurrence.replace(self.temporary(name,type_name,token))
+            self.declare(name,type_name,token)
+            self.temporaries.append((name,type_name,len(live),token.lineno))
+        children=[]
+        for statement_index,statement in enumerate(node.children):
+            # parts before the expressions that contain them
+            for _,definition in sorted(definitions.get(statement_index,()),key=lambda entry: entry[0]):
+                children.append(definition)
+            children.append(statement)
+        node.children=children
+
+    def temporary(self,name,type_name,token):
+        # addressed like a local until the analyzer gives it a slot, the
+        # procedure summaries of enclosing bodies need the scope level
+        node=Var(Token(TokenType.ID,name,token.lineno,token.column))
+        node.scope_level=self.level
+        node.expr_type=type_name
+        return node
+
+    def declare(self,name,type_name,token):
+        type_token=TokenType.INT if type_name=='INTEGER' else TokenType.REAL
+        declaration=VarDecl(Var(Token(TokenType.ID,name,token.lineno,token.column)),Type(Token(type_token,type_token.value,token.lineno,token.column)))
+        # after the other variables, Pascal declares them before procedures
+        position=len(self.declarations)
+        for index,existing in enumerate(self.declarations):
+            if isinstance(existing,ProcedureDecl):
+                position=index
+                break
+        self.declarations.insert(position,declaration)
@@ -0,0 +1,163 @@
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor,FIRST_COMPLETED,wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, limits can't be enforced there
+    resource=None
+
+from Utils.Interpreter_pascal import Interpreter
+from Utils.batch_pascal import BatchRunner,named_sources,error_result
+from Utils.limits_pascal import ResourceLimitError
+
+# State of a worker process, set up once by _init_worker
+_runner=None
+_cpu_time=None
+
+def _cpu_time_exceeded(signum,frame):
+    raise ResourceLimitError(message=f'CPU time limit of {_cpu_time}s exceeded')
+
+def _init_worker(interpreter_class,cpu_time,memory,max_steps,time_limit):
+    global _runner,_cpu_time
+    _runner=BatchRunner(interpreter_class,max_steps=max_steps,time_limit=time_limit)
+    _cpu_time=cpu_time
+    if cpu_time is not None:
+        signal.signal(signal.SIGPROF,_cpu_time_exceeded)
+    if memory is not None:
+        # The address space limit applies to the whole worker. Memory is
+        # given back between programs, so in practice it bounds each task,
+        # going over it raises MemoryError in the program that did.
+        _,hard=resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS,(memory,hard))
+
+def _run_chunk(chunk):
+    results=[]
+    for name,source in chunk:
+        if _cpu_time is not None:
+            # ITIMER_PROF counts the CPU time of this process, it is armed
+            # per program so every program gets the full budget
+            signal.setitimer(signal.ITIMER_PROF,_cpu_time)
+        try:
+            result=_runner.run_one(name,source)
+        except Exception as e:
+            # the limit can fire just outside run_one's own error handling
+            result=error_result(name,'interpret',e)
+        finally:
+            if _cpu_time is not None:
+                signal.setitimer(signal.ITIMER_PROF,0)
+        results.append(result)
+    return results
+
+class ParallelRunner(object):
+    # Spreads programs over a process pool. Programs are sent to workers in
+    # chunks and results are yielded as chunks complete, so the output is in
+    # completion order, use the 'name' of each result to match it up. At
+    # most max_pending chunks are in flight, the sources are read lazily.
+    #
+    # cpu_time (seconds) and memory (bytes) are enforced inside each worker
+    # for every program, max_steps and time_limit are checked by the
+    # interpreter itself (see ExecutionLimits) and stop a program without
+    # signals. If a worker dies the programs of every chunk that was lost
+    # are retried in a new pool, each as its own future, alongside new
+    # chunks. A program lost twice is retried alone, and if it kills its
+    # worker then as well it is reported as failed.
+    def __init__(self,workers=None,chunk_size=16,cpu_time=None,memory=None,interpreter_class=Interpreter,max_pending=None,max_steps=None,time_limit=None):
+        if resource is None and (cpu_time is not None or memory is not None):
+            raise ValueError('CPU time and memory limits need the resource module')
+        self.workers=workers or os.cpu_count() or 1
+        self.chunk_size=chunk_size
+        self.cpu_time=cpu_time
+        self.memory=memory
+        self.interpreter_class=interpreter_class
+        self.max_steps=max_steps
+        self.time_limit=time_limit
+        self.max_pending=max_pending or self.workers*2
+
+    def executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.interpreter_class,self.cpu_time,self.memory,self.max_steps,self.time_limit),
+        )
+
+    def chunks(self,sources):
+        items=named_sources(sources)
+        while True:
+            chunk=list(islice(items,self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def run(self,sources):
+        chunks=self.chunks(sources)
+        # single-program chunks of programs lost with a dead worker, once
+        # and twice
+        retries=[]
+        suspects=[]
+        executor=self.executor()
+        pending={}
+        try:
+            while True:
+                while len(pending)<self.max_pending and not _isolated(pending):
+                    if retries:
+                        chunk,lost=retries.pop(),1
+                    elif suspects:
+                        # a suspect runs alone, so a dying worker can be
+                        # blamed on exactly one program
+                        if pending:
+                            break
+                        chunk,lost=suspects.pop(),_ISOLATE_AFTER
+                    else:
+                        chunk,lost=next(chunks,None),0
+                        if chunk is None:
+                            break
+                    pending[executor.submit(_run_chunk,chunk)]=(chunk,lost)
+                if not pending:
+                    return
+                done,_=wait(pending,return_when=FIRST_COMPLETED)
+                broken=False
+                for future in done:
+                    chunk,lost=pending.pop(future)
+                    try:
+                        results=future.result()
+                    except BrokenProcessPool as e:
+                        broken=True
+                        yield from _lost(chunk,lost,e,retries,suspects)
+                        continue
+                    yield from results
+                if broken:
+                    # every other future of the dead pool fails as well
+                    for future,(chunk,lost) in pending.items():
+                        if future.done() and not future.cancelled() and future.exception() is None:
+                            yield from future.result()
+                        else:
+                            yield from _lost(chunk,lost,BrokenProcessPool('worker process died'),retries,suspects)
+                    pending.clear()
+                    executor.shutdown(wait=False)
+                    executor=self.executor()
+        finally:
+            executor.shutdown(wait=False,cancel_futures=True)
+
+# A program lost with a dead pool once is retried as its own future next to
+# the other work, lost twice it is retried alone and lost then too it is
+# reported as failed.
+_ISOLATE_AFTER=2
+
+def _isolated(pending):
+    return any(lost>=_ISOLATE_AFTER for _,lost in pending.values())
+
+def _lost(chunk,lost,e,retries,suspects):
+    if lost>=_ISOLATE_AFTER:
+        for name,_ in chunk:
+            yield error_result(name,'worker',e)
+    elif lost+1>=_ISOLATE_AFTER:
+        suspects.extend([item] for item in chunk)
+    else:
+        retries.extend([item] for item in chunk)
+
+def run_parallel(sources,**kwargs):
+    return ParallelRunner(**kwargs).run(sources)
@@ -0,0 +1,106 @@
+import json
+from time import perf_counter
+
+class NodeStats(object):
+    __slots__=('count','total','self_time')
+
+    def __init__(self):
+        self.count=0
+        self.total=0.0
+        self.self_time=0.0
+
+class Profiler(object):
+    # Collects per-node and per-procedure counts and times for an
+    # Interpreter. The interpreter only routes its visits through the
+    # profiler when one is passed in, an interpreter without one runs the
+    # plain visit methods. Times are inclusive (total) and exclusive of child
+    # visits (self_time), nodes are attributed to source positions only when
+    # a report is built.
+    def __init__(self,clock=perf_counter):
+        self.clock=clock
+        self.nodes={}
+        self.procedures={}
+
+    def instrument(self,visit):
+        clock=self.clock
+        nodes=self.nodes
+        procedures=self.procedures
+        # child_times[-1] collects the time spent in the children of the
+        # visit currently running, procedure_times does the same for calls
+        child_times=[0.0]
+        procedure_times=[0.0]
+
+        def profiled_visit(node):
+            is_call=node.__class__.__name__=='ProcedureCall'
+            child_times.append(0.0)
+            if is_call:
+                procedure_times.append(0.0)
+            start=clock()
+            try:
+                return visit(node)
+            finally:
+                elapsed=clock()-start
+                children=child_times.pop()
+                child_times[-1]+=elapsed
+                stats=nodes.get(node)
+                if stats is None:
+                    stats=nodes[node]=NodeStats()
+                stats.count+=1
+                stats.total+=elapsed
+                stats.self_time+=elapsed-children
+                if is_call:
+                    nested=procedure_times.pop()
+                    procedure_times[-1]+=elapsed
+                    stats=procedures.get(node.proc_name)
+                    if stats is None:
+                        stats=procedures[node.proc_name]=NodeStats()
+                    stats.count+=1
+                    stats.total+=elapsed
+                    stats.self_time+=elapsed-nested
+        return profiled_visit
+
+    def reset(self):
+        self.nodes.clear()
+        self.procedures.clear()
+
+    def line_stats(self):
+        lines={}
+        for node,stats in self.nodes.items():
+            token=getattr(node,'token',None)
+            if token is None or token.lineno is None:
+                continue
+            entry=lines.get(token.lineno)
+            if entry is None:
+                entry=lines[token.lineno]={'line':token.lineno,'count':0,'self_time':0.0,'nodes':[]}
+            entry['count']+=stats.count
+            entry['self_time']+=stats.self_time
+            entry['nodes'].append({
+                'node':node.__class__.__name__,
+                'column':token.column,
+                'count':stats.count,
+                'total':stats.total,
+                'self_time':stats.self_time,
+            })
+        return sorted(lines.values(),key=lambda entry: entry['self_time'],reverse=True)
+
+    def procedure_stats(self):
+        procedures=[{'name':name,'calls':stats.count,'total':stats.total,'self_time':stats.self_time}
+                    for name,stats in self.procedures.items()]
+        return sorted(procedures,key=lambda entry: entry['total'],reverse=True)
+
+    def as_dict(self):
+        return {'lines':self.line_stats(),'procedures':self.procedure_stats()}
+
+    def dump_json(self,fp):
+        json.dump(self.as_dict(),fp,indent=2)
+
+    def report(self,limit=10):
+        lines=['PROFILE','=======','Hottest lines','-------------']
+        lines.append(f'{"line":>6} {"count":>10} {"self (ms)":>12}')
+        for entry in self.line_stats()[:limit]:
+            lines.append(f'{entry["line"]:>6} {entry["count"]:>10} {entry["self_time"]*1000:>12.3f}')
+        lines.extend(['','Hottest procedures','------------------'])
+        lines.append(f'{"name":<20} {"calls":>10} {"total (ms)":>12} {"self (ms)":>12}')
+        for entry in self.procedure_stats()[:limit]:
+            lines.append(f'{entry["name"]:<20} {entry["calls"]:>10} {entry["total"]*1000:>12.3f} {entry["self_time"]*1000:>12.3f}')
+        return '\n'.join(lines)+'\n'
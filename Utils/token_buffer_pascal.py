@@ -0,0 +1,120 @@
+import sys
+from array import array
+
+from Utils.lexer_pascal import Token,TokenType,LexerError,RESERVED_KEYWORDS,_TOKEN_RE,_FIXED_TOKENS
+
+TOKEN_TYPES=list(TokenType)
+TYPE_CODES={token_type:code for code,token_type in enumerate(TOKEN_TYPES)}
+
+_ID=TYPE_CODES[TokenType.ID]
+_INT_CONST=TYPE_CODES[TokenType.INT_CONST]
+_REAL_CONST=TYPE_CODES[TokenType.REAL_CONST]
+_EOF=TYPE_CODES[TokenType.EOF]
+_KEYWORD_CODES={name:TYPE_CODES[token_type] for name,token_type in RESERVED_KEYWORDS.items()}
+_FIXED_CODES={value:TYPE_CODES[token_type] for value,token_type in _FIXED_TOKENS.items()}
+
+class TokenBuffer(object):
+    # The whole token stream in parallel arrays: one type code, one index
+    # into the value pool and one line/column pair per token. The stream
+    # always ends with an EOF entry, reads past it keep returning EOF.
+    def __init__(self):
+        self.types=bytearray()
+        self.values=array('I')
+        self.lines=array('I')
+        self.columns=array('I')
+        self.pool=[]
+        self.pool_index={}
+
+    def __len__(self):
+        return len(self.types)
+
+    def intern(self,value):
+        # keep 1 and 1.0 apart, they compare equal as dict keys
+        key=(type(value),value)
+        index=self.pool_index.get(key)
+        if index is None:
+            if isinstance(value,str):
+                value=sys.intern(value)
+            index=self.pool_index[key]=len(self.pool)
+            self.pool.append(value)
+        return index
+
+    def append(self,code,value,lineno,column):
+        self.types.append(code)
+        self.values.append(self.intern(value))
+        self.lines.append(lineno)
+        self.columns.append(column)
+
+    def type(self,i):
+        if i>=len(self.types):
+            i=len(self.types)-1
+        return TOKEN_TYPES[self.types[i]]
+
+    def token(self,i):
+        if i>=len(self.types):
+            i=len(self.types)-1
+        code=self.types[i]
+        if code==_EOF:
+            return Token(type=TokenType.EOF,value=None)
+        return Token(TOKEN_TYPES[code],self.pool[self.values[i]],self.lines[i],self.columns[i])
+
+    @classmethod
+    def from_lexer(cls,lexer):
+        buffer=cls()
+        while True:
+            token=lexer.get_next_token()
+            if token.type==TokenType.EOF:
+                buffer.append(_EOF,None,0,0)
+                return buffer
+            buffer.append(TYPE_CODES[token.type],token.value,token.lineno,token.column)
+
+    @classmethod
+    def from_text(cls,text):
+        buffer=cls()
+        add_type=buffer.types.append
+        add_value=buffer.values.append
+        add_line=buffer.lines.append
+        add_column=buffer.columns.append
+        intern=buffer.intern
+        # keywords and punctuation always carry the same value, intern them once
+        fixed={value:(code,intern(TOKEN_TYPES[code].value)) for value,code in _FIXED_CODES.items()}
+        keywords={name:(code,intern(name)) for name,code in _KEYWORD_CODES.items()}
+        match=_TOKEN_RE.match
+        count=text.count
+        pos=0
+        lineno=1
+        line_start=-1
+        while True:
+            m=match(text,pos)
+            kind=m.lastgroup
+            end=m.end()
+            start=m.start(kind) if kind is not None else end
+            newlines=count('\n',pos,start)
+            if newlines:
+                lineno+=newlines
+                line_start=text.rfind('\n',pos,start)
+            pos=end
+            column=start-line_start
+            if kind is None:
+                if start<len(text):
+                    raise LexerError(message=f"Lexer Error on '{text[start]}' line: {lineno} column: {column}",lineno=lineno,column=column)
+                buffer.append(_EOF,None,0,0)
+                return buffer
+            value=m.group(kind)
+            if kind=='id':
+                entry=keywords.get(value.upper())
+                if entry is None:
+                    code,index=_ID,intern(value)
+                else:
+                    code,index=entry
+            elif kind=='number':
+                if m.group('fraction') is None:
+                    code,index=_INT_CONST,intern(int(value))
+                else:
+                    code,index=_REAL_CONST,intern(float(value))
+            else:
+                code,index=fixed[value]
+            add_type(code)
+            add_value(index)
+            add_line(lineno)
+            add_column(column)
@@ -0,0 +1,112 @@
+import sys
+from enum import IntEnum
+
+class TraceLevel(IntEnum):
+    DEBUG=10
+    INFO=20
+    WARNING=30
+    ERROR=40
+
+class TraceEvent(object):
+    # The message is only formatted the first time a sink asks for it, so
+    # arguments such as a CallStack are never turned into strings unless an
+    # event is actually written.
+    __slots__=('level','source','fmt','args','_message')
+
+    def __init__(self,level,source,fmt,args):
+        self.level=level
+        self.source=source
+        self.fmt=fmt
+        self.args=args
+        self._message=None
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message=self.fmt.format(*self.args) if self.args else self.fmt
+        return self._message
+
+    def __str__(self):
+        return self.message
+
+class Sink(object):
+    def __init__(self,level=TraceLevel.DEBUG,sources=None):
+        self.level=level
+        self.sources=frozenset(sources) if sources is not None else None
+
+    def accepts(self,level,source):
+        return level>=self.level and (self.sources is None or source in self.sources)
+
+    def write(self,event):
+        raise NotImplementedError
+
+class StreamSink(Sink):
+    def __init__(self,stream=None,level=TraceLevel.DEBUG,sources=None):
+        super().__init__(level,sources)
+        self.stream=stream
+
+    def write(self,event):
+        # sys.stdout is looked up per event so redirection keeps working
+        stream=self.stream if self.stream is not None else sys.stdout
+        stream.write(event.message+'\n')
+
+class MemorySink(Sink):
+    def __init__(self,level=TraceLevel.DEBUG,sources=None):
+        super().__init__(level,sources)
+        self.events=[]
+
+    def write(self,event):
+        self.events.append(event)
+
+    @property
+    def messages(self):
+        return [event.message for event in self.events]
+
+class Tracer(object):
+    # Routes events to sinks. A tracer without sinks accepts nothing, callers
+    # on hot paths check enabled() once and skip building the event at all.
+    def __init__(self,sinks=()):
+        self.sinks=list(sinks)
+        self._update()
+
+    def _update(self):
+        self.level=min((sink.level for sink in self.sinks),default=None)
+
+    def add_sink(self,sink):
+        self.sinks.append(sink)
+        self._update()
+
+    def remove_sink(self,sink):
+        self.sinks.remove(sink)
+        self._update()
+
+    def enabled(self,level,source=None):
+        if self.level is None or level<self.level:
+            return False
+        return any(sink.accepts(level,source) for sink in self.sinks)
+
+    def emit(self,level,source,fmt,*args):
+        if self.level is None or level<self.level:
+            return
+        event=None
+        for sink in self.sinks:
+            if sink.accepts(level,source):
+                if event is None:
+                    event=TraceEvent(level,source,fmt,args)
+                sink.write(event)
+
+    def debug(self,source,fmt,*args):
+        self.emit(TraceLevel.DEBUG,source,fmt,*args)
+
+    def info(self,source,fmt,*args):
+        self.emit(TraceLevel.INFO,source,fmt,*args)
+
+    def warning(self,source,fmt,*args):
+        self.emit(TraceLevel.WARNING,source,fmt,*args)
+
+    def error(self,source,fmt,*args):
+        self.emit(TraceLevel.ERROR,source,fmt,*args)
+
+# Used by the interpreter and analyzer when no tracer is passed in. It has no
+# sinks until one is added, interpreters check it when they are constructed.
+default_tracer=Tracer()
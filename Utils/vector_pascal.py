@@ -0,0 +1,120 @@
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:
+    # optional, only the vectorized batch mode needs it
+    np=None
+
+from Utils.Interpreter_pascal import Interpreter
+from Utils.callstack_pascal import ActivationRecord,ARType
+from Utils.Semantic_Analyzer_pascal import promoted
+
+# Column dtypes of the declared global types
+_DTYPES={'INTEGER':'int64','REAL':'float64'}
+
+def global_types(tree):
+    return {
+        declaration.var_node.value:declaration.type_node.value
+        for declaration in tree.block.declarations
+        if declaration.__class__.__name__=='VarDecl'
+    }
+
+def _columns(bindings):
+    # bindings is a sequence of {name: value} rows or a {name: values}
+    # mapping of columns, returns the columns and the number of rows
+    if isinstance(bindings,Mapping):
+        columns={name:list(values) for name,values in bindings.items()}
+        sizes={len(values) for values in columns.values()}
+        if len(sizes)>1:
+            raise ValueError('binding columns differ in length')
+        return columns,sizes.pop() if sizes else 0
+    rows=list(bindings)
+    names=set().union(*rows) if rows else set()
+    for name in names:
+        if any(name not in row for row in rows):
+            raise ValueError(f'{name} is not bound in every row')
+    return {name:[row[name] for row in rows] for name in names},len(rows)
+
+class VectorInterpreter(Interpreter):
+    # Runs one program for many bindings of its global variables at once.
+    # Every value is a NumPy array with one element per binding, so the
+    # inherited BinOp and UnaryOp visits work element-wise: DIV is
+    # floor_divide and / is true_divide into float64. Bound INTEGER globals
+    # are int64 columns, REAL ones float64, constants assigned to a variable
+    # are broadcast to a full column. Unlike Python ints, int64 wraps around
+    # on overflow. A division by zero in any binding stops the whole run
+    # with FloatingPointError.
+    def __init__(self,tree,bindings,profiler=None,tracer=None,limits=None):
+        if np is None:
+            raise ImportError('VectorInterpreter needs NumPy')
+        super().__init__(tree,profiler,tracer,limits)
+        columns,self.size=_columns(bindings)
+        types=global_types(tree)
+        self.columns={}
+        for name,values in columns.items():
+            if name not in types:
+                raise ValueError(f'{name} is not a global variable')
+            column=np.asarray(values)
+            if types[name]=='INTEGER' and column.dtype.kind not in 'iub':
+                raise ValueError(f'{name} is INTEGER, got {column.dtype} values')
+            self.columns[name]=column.astype(_DTYPES[types[name]])
+
+    def broadcast(self,value):
+        if isinstance(value,np.ndarray):
+            return value
+        return np.full(self.size,value)
+
+    def to_real(self,value):
+        if value is None:
+            return None
+        return self.broadcast(value).astype('float64')
+
+    def visit_Assign(self,node):
+        var_value=self.broadcast(self.visit(node.right))
+        # an INTEGER value stored in a REAL variable becomes a float64 column
+        if promoted(node.left.expr_type,node.right):
+            var_value=self.to_real(var_value)
+        ar=self.call_stack.display[node.left.scope_level]
+        ar[node.left.value]=var_value
+
+    def visit_Program(self,node):
+        program_name=node.name
+        
+        ar=ActivationRecord(name=program_name,type=ARType.PROGRAM,nesting_level=1)
+        # the bindings are the initial values of the globals
+        for name,column in self.columns.items():
+            ar[name]=column
+        self.call_stack.push(ar)
+        
+        if self.tracing:
+            self.log('{}',self.call_stack)
+        self.visit(node.block)
+        
+        if self.tracing:
+            self.log('LEAVE: PROGRAM {}',program_name)
+            self.log('{}',self.call_stack)
+        
+        self.program_record=self.call_stack.pop()
+        self.program_record.discard(node.internal_names)
+
+    def interpret(self):
+        with np.errstate(divide='raise',invalid='raise'):
+            return super().interpret()
+
+    def table(self):
+        # final values of the globals, one {name: value} row per binding
+        record=self.program_record
+        if record is None:
+            return []
+        names=list(record.members)
+        values=[
+            self.broadcast(value).tolist() if value is not None else [None]*self.size
+            for value in record.members.values()
+        ]
+        return [dict(zip(names,row)) for row in zip(*values)] if names else [{} for _ in range(self.size)]
+
+def run_bindings(tree,bindings,**kwargs):
+    interpreter=VectorInterpreter(tree,bindings,**kwargs)
+    interpreter.interpret()
+    return interpreter.table()
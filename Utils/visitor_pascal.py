@@ -0,0 +1,25 @@
+class NodeVisitor(object):
+    # Each subclass gets its own dispatch table mapping a node class to the
+    # visit_<ClassName> function that handles it. The table is filled on the
+    # first visit of each node class, later visits are one dict lookup.
+    _dispatch={}
+
+    def __init_subclass__(cls,**kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch={}
+
+    @classmethod
+    def _resolve(cls,node_class):
+        method=getattr(cls,'visit_'+node_class.__name__,cls.generic_visit)
+        cls._dispatch[node_class]=method
+        return method
+
+    def visit(self,node):
+        try:
+            method=self._dispatch[node.__class__]
+        except KeyError:
+            method=self._resolve(node.__class__)
+        return method(self,node)
+
+    def generic_visit(self,node):
+        raise Exception(f'No visit_{type(node).__name__} method')
@@ -0,0 +1,173 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from Utils.lexer_pascal import Lexer,TokenType
+from Utils.Parser_pascal import Parser
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.Interpreter_pascal import Interpreter
+from S_to_S_compiler import S2SCompiler
+from benchmarks.workload_pascal import WORKLOADS,WorkloadShape,generate
+
+BASELINE_VERSION=1
+# Changes smaller than these are timer and allocator noise, they are never
+# reported as regressions however large they are relative to the baseline
+_TIME_SLACK=0.0005
+_MEMORY_SLACK_KB=16
+
+def lex_all(text):
+    lexer=Lexer(text)
+    count=0
+    while lexer.get_next_token().type!=TokenType.EOF:
+        count+=1
+    return count
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+def analyzed(text):
+    tree=parse(text)
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+# Every phase is (setup, run). setup builds the input outside the timed
+# region so that a phase only measures its own work. Parser.parse pulls
+# tokens from its Lexer, so the parse phase includes lexing.
+PHASES={
+    'lex':(lambda text: text,lex_all),
+    'parse':(lambda text: text,parse),
+    'semantic':(parse,lambda tree: SemanticAnalyzer().visit(tree)),
+    'interpret':(analyzed,lambda tree: Interpreter(tree).interpret()),
+    's2s':(parse,lambda tree: S2SCompiler().visit(tree)),
+}
+
+def measure(phase,text,repeat):
+    setup,run=PHASES[phase]
+    times=[]
+    for _ in range(repeat):
+        data=setup(text)
+        start=time.perf_counter()
+        run(data)
+        times.append(time.perf_counter()-start)
+    # one more run under tracemalloc, which would distort the timings
+    data=setup(text)
+    tracemalloc.start()
+    try:
+        run(data)
+        _,peak=tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best=min(times)
+    return {
+        'seconds':best,
+        'mean':sum(times)/len(times),
+        'kb_per_second':len(text)/1024/best if best else None,
+        'peak_kb':peak/1024,
+    }
+
+def run_suite(workloads,phases,repeat):
+    results={}
+    for name,shape in workloads.items():
+        text=generate(shape)
+        entry=results[name]={'shape':shape.as_dict(),'bytes':len(text),'tokens':lex_all(text),'phases':{}}
+        for phase in phases:
+            entry['phases'][phase]=measure(phase,text,repeat)
+    return {
+        'version':BASELINE_VERSION,
+        'python':platform.python_version(),
+        'repeat':repeat,
+        'results':results,
+    }
+
+def format_results(report):
+    lines=[f'{"workload":<14} {"phase":<10} {"ms":>10} {"KB/s":>10} {"peak KB":>10}']
+    for name,entry in report['results'].items():
+        for phase,stats in entry['phases'].items():
+            lines.append(f'{name:<14} {phase:<10} {stats["seconds"]*1000:>10.2f} {stats["kb_per_second"] or 0:>10.0f} {stats["peak_kb"]:>10.0f}')
+    return '\n'.join(lines)
+
+def compare(report,baseline,threshold):
+    # Returns the diff table and the (workload, phase) pairs that got slower
+    # or used more memory than threshold allows
+    lines=[f'{"workload":<14} {"phase":<10} {"base ms":>10} {"ms":>10} {"time":>8} {"base KB":>10} {"peak KB":>10} {"memory":>8}']
+    regressions=[]
+    for name,entry in report['results'].items():
+        base_entry=baseline.get('results',{}).get(name)
+        if base_entry is None:
+            lines.append(f'{name:<14} (not in baseline)')
+            continue
+        if base_entry.get('shape')!=entry['shape']:
+            lines.append(f'{name:<14} (shape differs from baseline, skipped)')
+            continue
+        for phase,stats in entry['phases'].items():
+            base=base_entry['phases'].get(phase)
+            if base is None:
+                lines.append(f'{name:<14} {phase:<10} (not in baseline)')
+                continue
+            time_change=stats['seconds']/base['seconds']-1 if base['seconds'] else 0.0
+            memory_change=stats['peak_kb']/base['peak_kb']-1 if base['peak_kb'] else 0.0
+            marker=''
+            slower=time_change>threshold and stats['seconds']-base['seconds']>_TIME_SLACK
+            larger=memory_change>threshold and stats['peak_kb']-base['peak_kb']>_MEMORY_SLACK_KB
+            if slower or larger:
+                marker=' REGRESSION'
+                regressions.append((name,phase))
+            lines.append(f'{name:<14} {phase:<10} {base["seconds"]*1000:>10.2f} {stats["seconds"]*1000:>10.2f} {time_change:>+8.1%} {base["peak_kb"]:>10.0f} {stats["peak_kb"]:>10.0f} {memory_change:>+8.1%}{marker}')
+    return '\n'.join(lines),regressions
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Benchmark the Pascal front end, interpreter and S2S compiler')
+    parser.add_argument('--workload',action='append',choices=sorted(WORKLOADS),help='named workload to run (default: all)')
+    parser.add_argument('--phase',action='append',choices=list(PHASES),help='phase to time (default: all)')
+    parser.add_argument('--repeat',type=int,default=5)
+    parser.add_argument('--statements',type=int,help='run a custom workload with this many statements')
+    parser.add_argument('--expr-depth',type=int,default=3)
+    parser.add_argument('--procedures',type=int,default=2)
+    parser.add_argument('--nesting',type=int,default=1)
+    parser.add_argument('--variables',type=int,default=8)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--baseline',help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline',help='write the results to this JSON file')
+    parser.add_argument('--threshold',type=float,default=0.10,help='relative slowdown reported as a regression')
+    parser.add_argument('--print-program',action='store_true',help='print the generated program of each workload and exit')
+    args=parser.parse_args(argv)
+
+    if args.statements is not None:
+        workloads={'custom':WorkloadShape(args.statements,args.expr_depth,args.procedures,args.nesting,args.variables,args.seed)}
+    else:
+        names=args.workload or list(WORKLOADS)
+        workloads={name:WORKLOADS[name] for name in names}
+
+    if args.print_program:
+        for shape in workloads.values():
+            print(generate(shape))
+        return 0
+
+    # generated expressions and procedure chains nest deeply
+    sys.setrecursionlimit(max(sys.getrecursionlimit(),10000))
+    report=run_suite(workloads,args.phase or list(PHASES),args.repeat)
+    print(format_results(report))
+
+    if args.save_baseline:
+        with open(args.save_baseline,'w') as f:
+            json.dump(report,f,indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline=json.load(f)
+        if baseline.get('version')!=BASELINE_VERSION:
+            print(f'Baseline version {baseline.get("version")} does not match {BASELINE_VERSION}')
+            return 2
+        table,regressions=compare(report,baseline,args.threshold)
+        print()
+        print(table)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) above {args.threshold:.0%}')
+            return 1
+    return 0
+
+if __name__=='__main__':
+    sys.exit(main())
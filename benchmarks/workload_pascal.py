@@ -0,0 +1,105 @@
+import random
+
+class WorkloadShape(object):
+    def __init__(self,statements=100,expr_depth=3,procedures=2,nesting=1,variables=8,seed=0):
+        self.statements=statements
+        self.expr_depth=expr_depth
+        self.procedures=procedures
+        self.nesting=nesting
+        self.variables=variables
+        self.seed=seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+# Named shapes used by the benchmark runner
+WORKLOADS={
+    'small':WorkloadShape(statements=50,expr_depth=2,procedures=1,nesting=1,variables=4),
+    'statements':WorkloadShape(statements=5000,expr_depth=2,procedures=2,nesting=1,variables=16),
+    'expressions':WorkloadShape(statements=200,expr_depth=9,procedures=1,nesting=1,variables=8),
+    'procedures':WorkloadShape(statements=400,expr_depth=3,procedures=40,nesting=4,variables=8),
+    'variables':WorkloadShape(statements=1000,expr_depth=3,procedures=2,nesting=2,variables=400),
+}
+
+class WorkloadGenerator(object):
+    # Builds a Pascal program of the given shape. There are no loops or
+    # conditionals in the language, so run time grows linearly with the size
+    # of the program. Variables are split into inputs, assigned constants
+    # once, and results that are only ever written, which keeps every value
+    # a small integer no matter how many statements there are. Procedures
+    # never call themselves or a later sibling.
+    def __init__(self,shape):
+        self.shape=shape
+        self.random=random.Random(shape.seed)
+        count=max(shape.variables,2)
+        self.inputs=[f'i{n}' for n in range((count+1)//2)]
+        self.results=[f'r{n}' for n in range(count//2)]
+        self.lines=[]
+
+    def generate(self):
+        shape=self.shape
+        self.lines=[]
+        self.emit(0,'PROGRAM Bench;')
+        self.emit(0,'VAR')
+        for name in self.inputs+self.results:
+            self.emit(1,f'{name} : INTEGER;')
+        for n in range(shape.procedures):
+            self.procedure(1,f'P{n}',shape.nesting,self.inputs)
+        calls=[f'P{n}' for n in range(shape.procedures)]
+        self.emit(0,'BEGIN')
+        for n,name in enumerate(self.inputs):
+            self.emit(1,f'{name} := {n+1};')
+        self.body(1,shape.statements,self.inputs,self.results,calls)
+        self.emit(0,'END.')
+        return '\n'.join(self.lines)+'\n'
+
+    def emit(self,indent,line):
+        self.lines.append('   '*indent+line)
+
+    def procedure(self,indent,name,depth,visible):
+        # Each procedure reads its parameter and the inputs, writes its own
+        # local and calls the procedure nested inside it
+        self.emit(indent,f'PROCEDURE {name}(a : INTEGER);')
+        self.emit(indent+1,'VAR l : INTEGER;')
+        local_visible=visible+['a']
+        calls=[]
+        if depth>1:
+            inner=name+'_'+str(depth-1)
+            self.procedure(indent+1,inner,depth-1,local_visible)
+            calls.append(inner)
+        self.emit(indent,'BEGIN')
+        self.body(indent+1,max(self.shape.statements//max(self.shape.procedures*self.shape.nesting,1)//4,1),local_visible,['l'],calls)
+        self.emit(indent,'END;')
+
+    def body(self,indent,count,readable,writable,calls):
+        rand=self.random
+        statements=[]
+        for _ in range(count):
+            if calls and rand.random()<0.02:
+                statements.append(f'{rand.choice(calls)}({self.expr(1,readable)})')
+            else:
+                statements.append(f'{rand.choice(writable)} := {self.expr(self.shape.expr_depth,readable)}')
+        # every procedure is called at least once
+        for name in calls:
+            statements.append(f'{name}({self.expr(1,readable)})')
+        for n,statement in enumerate(statements):
+            self.emit(indent,statement+(';' if n<len(statements)-1 else ''))
+
+    def expr(self,depth,readable):
+        rand=self.random
+        if depth<=0 or rand.random()<0.15:
+            if rand.random()<0.6:
+                return rand.choice(readable)
+            return str(rand.randint(1,9))
+        op=rand.choice(('+','-','*','DIV'))
+        if op=='DIV':
+            return f'({self.expr(depth-1,readable)} DIV {rand.randint(1,9)})'
+        if op=='*':
+            # one constant factor keeps the values small
+            return f'{rand.randint(1,3)} * ({self.expr(depth-1,readable)})'
+        return f'({self.expr(depth-1,readable)} {op} {self.expr(depth-1,readable)})'
+
+def generate(shape=None,**kwargs):
+    if shape is None:
+        shape=WorkloadShape(**kwargs)
+    return WorkloadGenerator(shape).generate()
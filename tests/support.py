@@ -0,0 +1,59 @@
+from Utils.lexer_pascal import Lexer
+from Utils.Parser_pascal import Parser
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.Interpreter_pascal import Interpreter
+
+PART10="""\
+PROGRAM Part10;
+VAR
+   number     : INTEGER;
+   a, b, c, x : INTEGER;
+   y          : REAL;
+
+BEGIN {Part10}
+   BEGIN
+      number := 2;
+      a := number;
+      b := 10 * a + 10 * number DIV 4;
+      c := a - - b
+   END;
+   x := 11;
+   y := 20 / 7 + 3.14;
+END.  {Part10}
+"""
+
+NESTED="""\
+program Main;
+var x, y : integer; r : real;
+procedure Alpha(a : integer; b : integer);
+   var x : integer;
+   procedure Beta(c : integer);
+   begin
+      x := x + c * 2;
+      y := -(x + c)
+   end;
+begin
+   x := (a + b) * 2;
+   Beta(a);
+   y := y - x DIV 3;
+end;
+begin { Main }
+   x := 7;
+   Alpha(3 + 5, 7);
+   r := x / 2 + y;
+   y := x DIV 2 + -x
+end.  { Main }
+"""
+
+SAMPLES=[PART10,NESTED]
+
+def analyzed(text):
+    tree=Parser(Lexer(text)).parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+def final_globals(text_or_tree,interpreter_class=Interpreter):
+    tree=analyzed(text_or_tree) if isinstance(text_or_tree,str) else text_or_tree
+    interpreter=interpreter_class(tree)
+    interpreter.interpret()
+    return dict(interpreter.program_record.members)
@@ -0,0 +1,97 @@
+import pytest
+
+from Utils.lexer_pascal import Lexer,RegexLexer,LexerError
+from Utils.batch_pascal import BatchRunner
+from Utils.Interpreter_pascal import Interpreter,SlotInterpreter,StackInterpreter,QuickeningInterpreter
+from Utils.closure_pascal import ClosureInterpreter
+from Utils.bytecode_pascal import BytecodeInterpreter
+from S_to_Py_compiler import PyInterpreter
+from tests.support import PART10,SAMPLES,final_globals
+
+ENGINES=[Interpreter,SlotInterpreter,StackInterpreter,QuickeningInterpreter]
+
+BAD_CHARACTER="""\
+program p;
+var a : integer;
+begin
+  a := 1 ? 2
+end.
+"""
+
+DIVISION_BY_ZERO="""\
+program p;
+var a, b : integer;
+begin
+  b := 0;
+  a := 7 div b
+end.
+"""
+
+UNASSIGNED="""\
+program p;
+var a, b : integer;
+begin
+  a := 1;
+  a := b + 1
+end.
+"""
+
+@pytest.mark.parametrize('lexer_class',[Lexer,RegexLexer])
+def test_lexer_error_has_position(lexer_class):
+    lexer=lexer_class(BAD_CHARACTER)
+    with pytest.raises(LexerError) as info:
+        while lexer.get_next_token().value is not None:
+            pass
+    assert (info.value.lineno,info.value.column)==(4,10)
+
+def test_lexer_error_record_has_position():
+    result=BatchRunner().run_one('bad',BAD_CHARACTER)
+    error=result['error']
+    assert (error['phase'],error['type'],error['line'],error['column'])==('front_end','LexerError',4,10)
+
+@pytest.mark.parametrize('interpreter_class',ENGINES)
+@pytest.mark.parametrize('text,error_type',[(DIVISION_BY_ZERO,'ZeroDivisionError'),(UNASSIGNED,'TypeError')])
+def test_runtime_error_record_has_position(interpreter_class,text,error_type):
+    error=BatchRunner(interpreter_class).run_one('bad',text)['error']
+    assert (error['phase'],error['type'],error['line'],error['column'])==('interpret','InterpreterError',5,10)
+    assert error_type in error['message']
+
+def test_errors_do_not_stop_the_batch():
+    results=list(BatchRunner().run_many([BAD_CHARACTER,DIVISION_BY_ZERO,PART10]))
+    assert [result['ok'] for result in results]==[False,False,True]
+    assert results[2]['variables']['x']==11
+
+RECURSIVE="""\
+program p;
+procedure f(n : integer);
+begin
+  f(n + 1)
+end;
+begin
+  f(1)
+end.
+"""
+
+@pytest.mark.parametrize('interpreter_class',ENGINES)
+def test_recursion_limit_is_a_resource_limit(interpreter_class):
+    error=BatchRunner(interpreter_class,max_steps=1000).run_one('deep',RECURSIVE)['error']
+    assert (error['phase'],error['type'])==('interpret','ResourceLimitError')
+    assert 'recursion limit' in error['message']
+    assert error['line']==4
+
+def test_step_budget_still_fires_first_when_smaller():
+    error=BatchRunner(max_steps=50).run_one('deep',RECURSIVE)['error']
+    assert error['type']=='ExecutionLimitError'
+
+@pytest.mark.parametrize('interpreter_class',ENGINES+[ClosureInterpreter,BytecodeInterpreter,PyInterpreter])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_every_engine_runs_in_a_batch(interpreter_class,text):
+    result=BatchRunner(interpreter_class).run_one('sample',text)
+    assert result['ok'] and result['error'] is None
+    expected={name:value for name,value in final_globals(text).items() if value is not None}
+    assert result['variables']==expected
+
+@pytest.mark.parametrize('interpreter_class',[ClosureInterpreter,BytecodeInterpreter,PyInterpreter])
+def test_limits_need_an_interpreter_that_counts_steps(interpreter_class):
+    with pytest.raises(ValueError):
+        BatchRunner(interpreter_class,max_steps=1000)
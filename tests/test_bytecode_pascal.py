@@ -0,0 +1,83 @@
+import pytest
+
+from Utils.bytecode_pascal import BytecodeCompiler,BytecodeInterpreter,BytecodeError,BytecodeProgram,CodeObject,Op,VM,dumps,loads,save,load,MAGIC,FORMAT_VERSION
+from Utils.compact_ast_pascal import compact
+from tests.support import SAMPLES,NESTED,analyzed,final_globals
+
+def compiled(text):
+    return BytecodeCompiler().compile(analyzed(text))
+
+def expected(text):
+    return {name:value for name,value in final_globals(text).items() if value is not None}
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_bytecode_matches_interpreter(text):
+    assert final_globals(text,BytecodeInterpreter)==expected(text)
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_bytecode_runs_compact_trees(text):
+    assert final_globals(compact(analyzed(text)),BytecodeInterpreter)==expected(text)
+
+def test_compiler_output():
+    program=compiled("""\
+program C;
+var a : integer;
+    r : real;
+begin
+  a := 1;
+  r := 1.0 + a;
+  a := a + 1
+end.
+""")
+    main=program.main
+    assert (program.name,main.level,main.slot_names[:2])==('C',1,['a','r'])
+    # 1 and 1.0 compare equal but are separate constants
+    assert main.consts==[1,1.0]
+    # results go straight into the slot of the assigned variable
+    assert main.code==[
+        (Op.LOADK,0,0,0),
+        (Op.LOADK,2,1,0),
+        (Op.ADD,1,2,0),
+        (Op.LOADK,2,0,0),
+        (Op.ADD,0,0,2),
+        (Op.RET,0,0,0),
+    ]
+
+def test_nested_procedures_get_their_own_code():
+    program=compiled(NESTED)
+    assert [code_obj.name for code_obj in program.procedures]==['Main','Alpha','Beta']
+    assert [code_obj.level for code_obj in program.procedures]==[1,2,3]
+    assert all(code_obj.code[-1][0]==Op.RET for code_obj in program.procedures)
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_dumps_loads_round_trip(text):
+    program=compiled(text)
+    data=dumps(program)
+    loaded=loads(data)
+    assert dumps(loaded)==data
+    assert str(loaded)==str(program)
+    assert VM(loaded).run()==expected(text)
+
+def test_save_load(tmp_path):
+    program=compiled(SAMPLES[0])
+    path=str(tmp_path/'p.pbc')
+    save(program,path)
+    assert VM(load(path)).run()==expected(SAMPLES[0])
+
+@pytest.mark.parametrize('mangle',[
+    lambda data: data[:-3],
+    lambda data: b'NOTBC'+data[len(MAGIC):],
+    lambda data: MAGIC+(FORMAT_VERSION+1).to_bytes(2,'little')+data[len(MAGIC)+2:],
+],ids=['truncated','magic','version'])
+def test_bad_files_raise_bytecode_error(mangle):
+    with pytest.raises(BytecodeError):
+        loads(mangle(dumps(compiled(SAMPLES[0]))))
+
+def test_unknown_opcode_raises():
+    code_obj=CodeObject('Main')
+    code_obj.code=[(99,0,0,0),(int(Op.RET),0,0,0)]
+    with pytest.raises(BytecodeError):
+        VM(BytecodeProgram('Main',[code_obj])).run()
+
+def test_empty_program():
+    assert BytecodeInterpreter(None).interpret()==''
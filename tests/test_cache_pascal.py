@@ -0,0 +1,58 @@
+import pickle
+import zlib
+
+import pytest
+
+from Utils.cache_pascal import FrontendCache,CACHE_VERSION,_MAGIC,source_key
+from Utils.optimizer_pascal import ConstantFolder
+from tests.support import PART10,final_globals
+
+FOLDABLE="""\
+program F;
+var x, y : integer;
+begin
+  x := 2 * 3 + 1;
+  y := x
+end.
+"""
+
+def test_hits_return_trees_of_their_own():
+    cache=FrontendCache()
+    first=cache.get(FOLDABLE)
+    assert ConstantFolder().optimize(first)>0
+    second=cache.get(FOLDABLE)
+    assert cache.stats()['hits']==1
+    assert second is not first
+    # the folded first tree left the cached one as it was parsed
+    assert ConstantFolder().optimize(second)>0
+    assert final_globals(second)=={'x':7,'y':7}
+
+def test_disk_entries_are_reused(tmp_path):
+    FrontendCache(directory=str(tmp_path)).get(PART10)
+    cache=FrontendCache(directory=str(tmp_path))
+    tree=cache.get(PART10)
+    assert cache.stats()['disk_hits']==1
+    assert final_globals(tree)==final_globals(PART10)
+
+def _payload(data):
+    return _MAGIC+bytes([CACHE_VERSION])+zlib.compress(data)
+
+CLASS=pickle.dumps(FrontendCache,protocol=4)
+
+@pytest.mark.parametrize('payload',[
+    _payload(b'garbage'),
+    _payload(pickle.dumps(1)[:-3]),
+    # a class or a module that is gone
+    _payload(CLASS.replace(b'FrontendCache',b'FrontendCachX')),
+    _payload(CLASS.replace(b'Utils.cache_pascal',b'Utils.cache_pascaX')),
+    _payload(b'\x80\x09'),
+    _MAGIC+bytes([CACHE_VERSION])+b'not zlib',
+    b'',
+],ids=['garbage','truncated','attribute','module','protocol','zlib','empty'])
+def test_corrupted_files_are_misses(tmp_path,payload):
+    cache=FrontendCache(directory=str(tmp_path))
+    with open(cache.path(source_key(PART10)),'wb') as f:
+        f.write(payload)
+    tree=cache.get(PART10)
+    assert cache.stats()['misses']==1
+    assert final_globals(tree)==final_globals(PART10)
@@ -0,0 +1,32 @@
+import pytest
+
+from Utils.callstack_pascal import SlotActivationRecord,ARType
+
+def record():
+    return SlotActivationRecord(name='P',type=ARType.PROCEDURE,nesting_level=2,names=['a','b','c'])
+
+def test_access_by_name():
+    ar=record()
+    ar['c']=3
+    ar['a']=1
+    assert ar.slots==[1,None,3]
+    assert ar['c']==3
+    assert ar.get('b') is None
+    assert ar.get('missing') is None
+    assert ar.members=={'a':1,'c':3}
+
+def test_unknown_or_unset_name_raises_key_error():
+    ar=record()
+    with pytest.raises(KeyError):
+        ar['missing']=1
+    with pytest.raises(KeyError):
+        ar['b']
+    with pytest.raises(KeyError):
+        ar['missing']
+
+def test_discard():
+    ar=record()
+    ar['a']=1
+    ar['b']=2
+    ar.discard(['b','missing'])
+    assert ar.members=={'a':1}
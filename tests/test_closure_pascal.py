@@ -0,0 +1,31 @@
+import pytest
+
+from Utils.closure_pascal import ClosureInterpreter
+from Utils.compact_ast_pascal import compact
+from Utils.optimizer_pascal import CommonSubexpressionEliminator
+from tests.support import SAMPLES,analyzed,final_globals
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_closures_match_interpreter(text):
+    assert final_globals(text,ClosureInterpreter)==final_globals(text)
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_closures_run_compact_trees(text):
+    assert final_globals(compact(analyzed(text)),ClosureInterpreter)==final_globals(text)
+
+def test_program_record_leaves_out_temporaries():
+    text="""\
+program T;
+var a, b, c : integer;
+begin
+  a := 3;
+  b := (a + 1) * (a + 1);
+  c := (a + 1) * 2
+end.
+"""
+    tree=analyzed(text)
+    CommonSubexpressionEliminator().optimize(tree)
+    assert final_globals(tree,ClosureInterpreter)=={'a':3,'b':16,'c':8}
+
+def test_empty_tree():
+    assert ClosureInterpreter(None).interpret()==''
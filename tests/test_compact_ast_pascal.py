@@ -0,0 +1,65 @@
+import pytest
+
+from Utils.lexer_pascal import Lexer
+from Utils.Parser_pascal import Parser,AST
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.Interpreter_pascal import Interpreter,SlotInterpreter
+from Utils.compact_ast_pascal import AST as CompactAST,CompactBuilder,compact
+from Utils.limits_pascal import InterpreterError
+from tests.support import SAMPLES,analyzed,final_globals
+
+def built(text,iterative=False):
+    tree=Parser(Lexer(text),builder=CompactBuilder(),iterative=iterative).parse()
+    SemanticAnalyzer().visit(tree)
+    return tree
+
+def shape(node):
+    # class names, values and source positions of the whole tree
+    if isinstance(node,list):
+        return [shape(item) for item in node]
+    if not isinstance(node,(AST,CompactAST)):
+        return node
+    fields=[type(node).__name__]
+    for name in ('name','proc_name','value','expr_type','scope_level','index'):
+        fields.append(getattr(node,name,None))
+    token=getattr(node,'token',None)
+    if token is not None:
+        fields.append((token.type,token.value,token.lineno,token.column))
+    for name in ('left','right','expr','block','declarations','compound_statement','children','var_node','type_node','params','block_node','actual_params'):
+        if hasattr(node,name):
+            fields.append(shape(getattr(node,name)))
+    return fields
+
+@pytest.mark.parametrize('iterative',[False,True])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_builder_matches_compacted_tree(text,iterative):
+    assert shape(built(text,iterative))==shape(compact(analyzed(text)))
+
+@pytest.mark.parametrize('interpreter_class',[Interpreter,SlotInterpreter])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_built_trees_run(text,interpreter_class):
+    assert final_globals(built(text),interpreter_class)==final_globals(text,interpreter_class)
+
+def test_declarations_share_their_type_node():
+    tree=built("""\
+program S;
+var a, b : integer;
+begin
+  a := 1
+end.
+""")
+    first,second=tree.block.declarations
+    assert first.type_node is second.type_node
+
+def test_errors_have_positions():
+    tree=built("""\
+program E;
+var a, b : integer;
+begin
+  b := 0;
+  a := 7 div b
+end.
+""")
+    with pytest.raises(InterpreterError) as info:
+        SlotInterpreter(tree).interpret()
+    assert (info.value.token.lineno,info.value.token.column)==(5,10)
@@ -0,0 +1,53 @@
+import pytest
+
+from Utils.Interpreter_pascal import Interpreter,SlotInterpreter,StackInterpreter,QuickeningInterpreter
+from Utils.closure_pascal import ClosureInterpreter
+from Utils.bytecode_pascal import BytecodeInterpreter,dumps,loads
+from Utils.compact_ast_pascal import compact
+from S_to_Py_compiler import PyInterpreter
+from tests.support import analyzed,final_globals
+
+REALS="""\
+program R;
+var r, s, t, u, w : real;
+    i, n : integer;
+procedure P(x : real; y : integer);
+var z : real;
+begin
+   z := y;
+   t := x + z
+end;
+begin
+   r := 2;
+   i := 3;
+   s := i;
+   w := n;
+   P(i, i);
+   u := i DIV 2;
+   r := r * 2 + 1
+end.
+"""
+
+def run(engine,tree):
+    if engine is BytecodeInterpreter:
+        interpreter=BytecodeInterpreter(program=loads(dumps(BytecodeInterpreter(tree).program)))
+        interpreter.interpret()
+        result=interpreter.program_record.members
+    else:
+        result=final_globals(tree,engine)
+    # the dict records of Interpreter keep unset names as None
+    return {name:value for name,value in result.items() if value is not None}
+
+ENGINES=[Interpreter,SlotInterpreter,StackInterpreter,QuickeningInterpreter,ClosureInterpreter,BytecodeInterpreter,PyInterpreter]
+
+@pytest.mark.parametrize('to_compact',[False,True])
+@pytest.mark.parametrize('engine',ENGINES)
+def test_real_variables_hold_floats(engine,to_compact):
+    tree=analyzed(REALS)
+    if to_compact:
+        tree=compact(tree)
+    result=run(engine,tree)
+    assert result=={'r':5.0,'s':3.0,'t':6.0,'u':1.0,'i':3}
+    # n was never assigned, copying it leaves w unset
+    assert 'w' not in result
+    assert {name:type(value) for name,value in result.items()}=={'r':float,'s':float,'t':float,'u':float,'i':int}
@@ -0,0 +1,62 @@
+import pytest
+
+from Utils.lexer_pascal import Lexer
+from Utils.Parser_pascal import Parser
+from Utils.Semantic_Analyzer_pascal import SemanticAnalyzer
+from Utils.flat_ast_pascal import FlatBuilder,FlatAST,FlatASTError
+from tests.support import SAMPLES,final_globals
+
+def flat(text):
+    return Parser(Lexer(text),builder=FlatBuilder()).parse()
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_children_have_smaller_numbers(text):
+    tree=flat(text)
+    assert tree.root==len(tree)-1
+    for i in range(len(tree)):
+        assert all(child<i for child in tree.children(i))
+
+def test_shared_type_nodes_are_copied():
+    tree=flat("""\
+program S;
+var a, b, c : integer;
+procedure P(x, y : real);
+begin
+end;
+begin
+end.
+""")
+    parents=[0]*len(tree)
+    for i in range(len(tree)):
+        for child in tree.children(i):
+            parents[child]+=1
+    assert parents.count(0)==1
+    assert max(parents)==1
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_flat_tree_runs_after_round_trip(text):
+    tree=FlatAST.loads(flat(text).dumps()).program()
+    SemanticAnalyzer().visit(tree)
+    assert final_globals(tree)==final_globals(text)
+
+def test_truncated_files_raise_flat_ast_error():
+    data=flat(SAMPLES[1]).dumps()
+    for size in range(len(data)):
+        with pytest.raises(FlatASTError):
+            FlatAST.loads(data[:size])
+
+def test_bad_constants_raise_flat_ast_error():
+    tree=flat(SAMPLES[0])
+    data=tree.dumps()
+    # the first pool entry is the program name
+    name=tree.pool[0].encode('utf-8')
+    start=data.rindex(b's'+len(name).to_bytes(4,'little')+name)
+    bad=data[:start]+b'i'+data[start+1:]
+    with pytest.raises(FlatASTError):
+        FlatAST.loads(bad)
+
+def test_annotations_are_not_saved():
+    tree=flat(SAMPLES[0])
+    SemanticAnalyzer().visit(tree.program())
+    loaded=FlatAST.loads(tree.dumps())
+    assert (loaded.scope_levels,loaded.slot_indexes,loaded.expr_types,loaded.slot_names)==(None,None,None,None)
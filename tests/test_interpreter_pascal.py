@@ -0,0 +1,163 @@
+import pytest
+
+from Utils.Interpreter_pascal import Interpreter,SlotInterpreter,StackInterpreter,QuickeningInterpreter
+from Utils.limits_pascal import ExecutionLimits,ExecutionLimitError,InterpreterError
+from Utils.Parser_pascal import BinOp
+from Utils.profiler_pascal import Profiler
+from tests.support import SAMPLES,analyzed,final_globals
+
+def steps(interpreter_class,text,**kwargs):
+    limits=ExecutionLimits(**kwargs)
+    interpreter_class(analyzed(text),limits=limits).interpret()
+    return limits.steps
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_stack_interpreter_matches_interpreter(text):
+    assert final_globals(text,StackInterpreter)==final_globals(text)
+
+@pytest.mark.parametrize('check_every',[1,3,1024])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_stack_interpreter_charges_every_postfix_op(text,check_every):
+    assert steps(StackInterpreter,text,check_every=check_every)==steps(Interpreter,text,check_every=check_every)
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_stack_interpreter_step_budget(text):
+    budget=steps(Interpreter,text)
+    assert steps(StackInterpreter,text,max_steps=budget)==budget
+    with pytest.raises(ExecutionLimitError):
+        steps(StackInterpreter,text,max_steps=budget-1)
+
+def test_stack_interpreter_profiles_expression_roots():
+    tree=analyzed(SAMPLES[0])
+    profiler=Profiler()
+    StackInterpreter(tree,profiler=profiler).interpret()
+    assignments=tree.block.compound_statement.children[0].children
+    # b := 10 * a + 10 * number DIV 4 is counted once, at its root
+    expression=assignments[2].right
+    assert profiler.nodes[expression].count==1
+    assert expression.left not in profiler.nodes
+    assert expression.right.left not in profiler.nodes
+
+DIVISION_IN_PROCEDURE="""\
+program p;
+var a : integer;
+procedure q(n : integer);
+begin
+   a := 1 + 7 div n
+end;
+begin
+   q(0)
+end.
+"""
+
+# StackInterpreter reports the root of the expression
+@pytest.mark.parametrize('interpreter_class,column',[(Interpreter,15),(SlotInterpreter,15),(StackInterpreter,11),(QuickeningInterpreter,15)])
+def test_python_errors_become_interpreter_errors(interpreter_class,column):
+    with pytest.raises(InterpreterError) as info:
+        interpreter_class(analyzed(DIVISION_IN_PROCEDURE)).interpret()
+    assert isinstance(info.value.__cause__,ZeroDivisionError)
+    assert info.value.message.endswith(f'at line 5 column {column}')
+
+def node_classes(tree):
+    # the class of every AST node, Parser_pascal nodes and their quickened
+    # subclasses alike
+    classes={}
+    stack=[tree]
+    while stack:
+        node=stack.pop()
+        if isinstance(node,list):
+            stack.extend(node)
+        elif type(node).__module__ in ('Utils.Parser_pascal','Utils.Interpreter_pascal'):
+            classes[id(node)]=type(node)
+            stack.extend(vars(node).values())
+    return classes
+
+QUICKENED="""\
+program Q;
+var a, b, x : integer;
+    r : real;
+begin
+  a := 3;
+  b := 4;
+  x := a + b;
+  r := a;
+  r := r * 2.5 + r;
+  r := r + a
+end.
+"""
+
+def assignments(tree):
+    return tree.block.compound_statement.children
+
+def test_binops_are_quickened_by_operand_types():
+    tree=analyzed(QUICKENED)
+    interpreter=QuickeningInterpreter(tree)
+    interpreter.visit(tree)
+    _,_,ints,_,reals,mixed=assignments(tree)
+    assert type(ints.right).__name__=='IntAdd'
+    assert type(ints.right.left).__name__=='SlotVar'
+    assert type(reals.right).__name__=='FloatAdd'
+    assert type(reals.right.left).__name__=='FloatMul'
+    # a REAL plus an INTEGER has no single operand type
+    assert type(mixed.right).__name__=='Add'
+    assert dict(interpreter.program_record.members)=={'a':3,'b':4,'x':7,'r':13.5}
+
+def test_mixed_operands_match_interpreter():
+    assert final_globals(QUICKENED,QuickeningInterpreter)==final_globals(QUICKENED)=={'a':3,'b':4,'x':7,'r':13.5}
+
+def test_failed_guards_despecialize():
+    tree=analyzed(QUICKENED)
+    interpreter=QuickeningInterpreter(tree)
+    interpreter.visit(tree)
+    assign=assignments(tree)[2]
+    node=assign.right
+    record=interpreter.program_record
+    interpreter.call_stack.push(record)
+    def run(a,b):
+        record['a']=a
+        record['b']=b
+        interpreter.visit(assign)
+        return record['x']
+    assert run(1.5,2.0)==3.5
+    assert (type(node),interpreter.despecialized[node])==(BinOp,1)
+    assert run(1.5,2.0)==3.5
+    assert type(node).__name__=='FloatAdd'
+    assert run(1,2)==3
+    assert (type(node),interpreter.despecialized[node])==(BinOp,interpreter.MAX_DESPECIALIZE)
+    # after MAX_DESPECIALIZE failed guards the node stops guessing
+    assert run(1,2)==3
+    assert type(node).__name__=='Add'
+    assert run(1.5,2)==3.5
+    assert type(node).__name__=='Add'
+
+def test_interpret_restores_the_tree():
+    tree=analyzed(QUICKENED)
+    before=node_classes(tree)
+    QuickeningInterpreter(tree).interpret()
+    assert node_classes(tree)==before
+
+FAILING="""\
+program F;
+var a, x : integer;
+procedure q(n : integer);
+begin
+   x := x + 7 div n
+end;
+begin
+   x := 1;
+   q(1);
+   q(0)
+end.
+"""
+
+def test_tree_is_restored_after_an_error():
+    tree=analyzed(FAILING)
+    before=node_classes(tree)
+    with pytest.raises(InterpreterError):
+        QuickeningInterpreter(tree).interpret()
+    assert node_classes(tree)==before
+    # the tree runs again, quickened or not, and fails the same way
+    for interpreter_class in (QuickeningInterpreter,Interpreter):
+        with pytest.raises(InterpreterError) as info:
+            interpreter_class(tree).interpret()
+        assert isinstance(info.value.__cause__,ZeroDivisionError)
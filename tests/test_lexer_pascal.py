@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+from Utils.lexer_pascal import Lexer,RegexLexer,StreamLexer,LexerError,TokenType
+from tests.support import SAMPLES
+
+class CountingStream(io.StringIO):
+    def __init__(self,text):
+        super().__init__(text)
+        self.reads=0
+
+    def read(self,size=-1):
+        self.reads+=1
+        return super().read(size)
+
+def tokens(lexer):
+    result=[]
+    while True:
+        token=lexer.get_next_token()
+        if token.type==TokenType.EOF:
+            return result
+        result.append((token.type,token.value,token.lineno,token.column))
+
+@pytest.mark.parametrize('chunk_size',[1,3,16,1<<16])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_stream_lexer_matches_lexer(text,chunk_size):
+    assert tokens(StreamLexer(io.StringIO(text),chunk_size=chunk_size))==tokens(Lexer(text))
+
+def test_comment_split_across_chunks():
+    text='a := { a comment\nover two lines } 1'
+    assert tokens(StreamLexer(io.StringIO(text),chunk_size=4))==tokens(Lexer(text))
+
+def test_invalid_character_raises_without_reading_ahead():
+    stream=CountingStream('a := 1 ? 2;\n'+'b := 2;\n'*10000)
+    lexer=StreamLexer(stream,chunk_size=64)
+    with pytest.raises(LexerError) as info:
+        tokens(lexer)
+    assert (info.value.lineno,info.value.column)==(1,8)
+    assert stream.reads==1
+
+def test_invalid_character_at_end_of_stream():
+    with pytest.raises(LexerError) as info:
+        tokens(StreamLexer(io.StringIO('a := 1\n  ?'),chunk_size=4))
+    assert (info.value.lineno,info.value.column)==(2,3)
+
+class MeasuredStreamLexer(StreamLexer):
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.longest=0
+
+    def fill(self):
+        super().fill()
+        self.longest=max(self.longest,len(self.buffer))
+
+@pytest.mark.parametrize('blank',['{'+' comment\n'*10000+'}',' \n'*50000])
+def test_long_comments_and_blanks_are_not_kept(blank):
+    text='a := 1;'+blank+'b := 2'
+    lexer=MeasuredStreamLexer(io.StringIO(text),chunk_size=64)
+    assert tokens(lexer)==tokens(Lexer(text))
+    # each chunk is searched once instead of the whole comment every time
+    assert lexer.longest<=2*64
+
+def test_unclosed_comment():
+    text='a := 1 {'+' open\n'*100
+    with pytest.raises(LexerError) as info:
+        tokens(StreamLexer(io.StringIO(text),chunk_size=8))
+    assert (info.value.lineno,info.value.column)==(1,8)
+    with pytest.raises(LexerError) as regex_info:
+        tokens(RegexLexer(text))
+    assert (regex_info.value.lineno,regex_info.value.column)==(1,8)
+
+def test_from_file_closes_on_error(tmp_path):
+    path=tmp_path/'bad.pas'
+    path.write_text('a := 1 ? 2;\n'+'b := 2;\n'*10000,encoding='utf-8')
+    with pytest.raises(LexerError):
+        with Lexer.from_file(str(path),chunk_size=64) as lexer:
+            tokens(lexer)
+    assert lexer.stream.closed
+
+def test_from_stream_leaves_the_stream_open():
+    stream=io.StringIO('a := 1')
+    with Lexer.from_stream(stream) as lexer:
+        tokens(lexer)
+    assert not stream.closed
@@ -0,0 +1,212 @@
+import pytest
+
+from Utils.lexer_pascal import Lexer
+from Utils.limits_pascal import InterpreterError
+from Utils.Parser_pascal import Parser
+from Utils.optimizer_pascal import ConstantFolder,DeadCodeEliminator,CommonSubexpressionEliminator
+from Utils.Interpreter_pascal import SlotInterpreter
+from Utils.compact_ast_pascal import compact
+from Utils.bytecode_pascal import BytecodeInterpreter,dumps,loads
+from S_to_Py_compiler import PyInterpreter
+from tests.support import SAMPLES,analyzed,final_globals
+
+def eliminated(text):
+    tree=analyzed(text)
+    removed=DeadCodeEliminator().optimize(tree)
+    return tree,removed
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_dead_code_elimination_keeps_results(text):
+    tree,_=eliminated(text)
+    assert final_globals(tree)==final_globals(text)
+
+def test_dead_stores_and_effect_free_calls_are_removed():
+    tree,removed=eliminated("""\
+program D;
+var a, b : integer;
+procedure pure(k : integer);
+var l : integer;
+begin l := k * 2 end;
+begin
+  a := 1;
+  a := 2;
+  pure(a);
+  b := a + 1
+end.
+""")
+    # l := k * 2 stays, inside pure k is only known at the call site
+    assert [(kind,name) for kind,name,_,_ in removed]==[('store to','a'),('call to','pure')]
+    assert final_globals(tree)=={'a':2,'b':3}
+
+UNASSIGNED=[
+    # a dead local computed from a global that is never set
+    """\
+program U;
+var t, x : integer;
+procedure p(k : integer);
+var u : integer;
+begin u := k * t + 1 end;
+begin
+  p(2);
+  x := 1
+end.
+""",
+    # a dead global store, the second one overwrites it
+    """\
+program U;
+var t, x : integer;
+begin
+  x := t * 2;
+  x := 1
+end.
+""",
+    # None travels through a copy and a parameter
+    """\
+program U;
+var t, s, x : integer;
+procedure p(k : integer);
+var u : integer;
+begin u := -k end;
+begin
+  s := t;
+  p(s);
+  x := 1
+end.
+""",
+]
+
+def assert_type_error(text_or_tree):
+    with pytest.raises(InterpreterError) as info:
+        final_globals(text_or_tree)
+    assert isinstance(info.value.__cause__,TypeError)
+
+@pytest.mark.parametrize('text',UNASSIGNED)
+def test_arithmetic_on_unassigned_variables_is_kept(text):
+    assert_type_error(text)
+    tree,_=eliminated(text)
+    assert_type_error(tree)
+
+def test_assigned_variables_do_not_block_removal():
+    tree,removed=eliminated("""\
+program U;
+var t, x : integer;
+procedure p(k : integer);
+var u : integer;
+begin u := k * t + 1 end;
+begin
+  t := 3;
+  p(2);
+  x := 1
+end.
+""")
+    assert [(kind,name) for kind,name,_,_ in removed]==[('call to','p')]
+
+REPEATED="""\
+program C;
+var a, b, c, x, y : integer;
+procedure p(k : integer);
+var l : integer;
+begin l := (k * 10) + (k * 10) * 2; y := l - k * 10 end;
+begin
+  a := 3; b := 4; c := 1;
+  x := 10 * a + (a + b) * c;
+  y := 10 * a - (b + a) * c;
+  p(x DIV 2 + x DIV 2)
+end.
+"""
+
+def shared(text):
+    tree=analyzed(text)
+    temporaries=CommonSubexpressionEliminator().optimize(tree)
+    return tree,temporaries
+
+@pytest.mark.parametrize('text',SAMPLES+[REPEATED])
+def test_temporaries_are_not_reported(text):
+    expected=final_globals(text)
+    tree,_=shared(text)
+    assert final_globals(tree)==expected
+    assert final_globals(tree,SlotInterpreter)==expected
+    assert final_globals(compact(tree))==expected
+    assert final_globals(tree,BytecodeInterpreter)==expected
+    interpreter=BytecodeInterpreter(program=loads(dumps(BytecodeInterpreter(tree).program)))
+    interpreter.interpret()
+    assert interpreter.program_record.members==expected
+    assert final_globals(tree,PyInterpreter)==expected
+
+def test_repeated_expressions_get_temporaries():
+    tree,temporaries=shared(REPEATED)
+    assert [(type_name,uses) for _,type_name,uses,_ in temporaries]==[('INTEGER',3),('INTEGER',2),('INTEGER',2),('INTEGER',2)]
+    assert tree.internal_names=={name for name,_,_,_ in temporaries}
+
+def test_untyped_expressions_are_rejected():
+    tree=Parser(Lexer(REPEATED)).parse()
+    with pytest.raises(Exception,match='no type'):
+        CommonSubexpressionEliminator().optimize(tree)
+
+def folded(text):
+    tree=analyzed(text)
+    removed=ConstantFolder().optimize(tree)
+    return tree,removed
+
+@pytest.mark.parametrize('text',SAMPLES+[REPEATED])
+def test_constant_folding_keeps_results(text):
+    tree,_=folded(text)
+    assert final_globals(tree)==final_globals(text)
+
+@pytest.mark.parametrize('expression',['y * 1','1 * y','y + 0','0 + y','y - 0','+y','- -y','-(-y)'])
+def test_identities_keep_arithmetic_on_unassigned_variables(expression):
+    text=f"""\
+program F;
+var x, y : integer;
+begin
+  x := {expression}
+end.
+"""
+    tree,removed=folded(text)
+    assert removed==0
+    assert_type_error(tree)
+
+@pytest.mark.parametrize('expression',['y * 1','0 + y','+y','- -y'])
+def test_identities_apply_to_assigned_variables(expression):
+    tree,removed=folded(f"""\
+program F;
+var x, y : integer;
+begin
+  y := 3;
+  x := {expression}
+end.
+""")
+    assert removed>0
+    assert tree.block.compound_statement.children[1].right.__class__.__name__=='Var'
+    assert final_globals(tree)=={'x':3,'y':3}
+
+def test_identities_on_parameters_wait_for_an_assignment():
+    tree,removed=folded("""\
+program F;
+var x : integer;
+procedure p(k : integer);
+begin
+  x := k * 1;
+  k := k + 1;
+  x := k * 1
+end;
+begin
+  p(2)
+end.
+""")
+    body=tree.block.declarations[1].block_node.compound_statement.children
+    assert [statement.right.__class__.__name__ for statement in body]==['BinOp','BinOp','Var']
+    assert final_globals(tree)=={'x':3}
+
+def test_long_expressions_fold_without_recursion():
+    terms=' + '.join(['1']*5000)
+    tree,removed=folded(f"""\
+program F;
+var x, y : integer;
+begin
+  y := 1;
+  x := {terms} + y * 1 - 0
+end.
+""")
+    right=tree.block.compound_statement.children[1].right
+    assert (right.left.value,right.right.value)==(5000,'y')
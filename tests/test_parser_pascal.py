@@ -0,0 +1,69 @@
+import io
+
+import pytest
+
+from Utils.lexer_pascal import Lexer,RegexLexer,StreamLexer,Token
+from Utils.Parser_pascal import AST,Parser,BufferedParser,ProcedureCall
+from Utils.token_buffer_pascal import TokenBuffer
+from tests.support import SAMPLES
+
+SPACED_CALL="""\
+program p;
+var x : integer;
+procedure f(a : integer);
+begin
+  x := a
+end;
+begin
+  f {call} (1);
+  f
+  (2)
+end.
+"""
+
+def shape(value):
+    if isinstance(value,Token):
+        return (value.type,value.value,value.lineno,value.column)
+    if isinstance(value,AST):
+        return (type(value).__name__,{name:shape(item) for name,item in vars(value).items()})
+    if isinstance(value,list):
+        return [shape(item) for item in value]
+    return value
+
+def tokens_in(node,seen):
+    for value in vars(node).values():
+        for item in value if isinstance(value,list) else [value]:
+            if isinstance(item,Token):
+                seen.add(id(item))
+            elif isinstance(item,AST):
+                tokens_in(item,seen)
+    return seen
+
+PARSERS={
+    'lexer':lambda text,iterative:Parser(Lexer(text),iterative=iterative),
+    'regex':lambda text,iterative:Parser(RegexLexer(text),iterative=iterative),
+    'stream':lambda text,iterative:Parser(StreamLexer(io.StringIO(text),chunk_size=7),iterative=iterative),
+    'buffer':lambda text,iterative:BufferedParser(TokenBuffer.from_text(text),iterative=iterative),
+}
+
+@pytest.mark.parametrize('iterative',[False,True])
+@pytest.mark.parametrize('parser',sorted(PARSERS))
+@pytest.mark.parametrize('text',SAMPLES+[SPACED_CALL])
+def test_parsers_build_the_same_tree(text,parser,iterative):
+    expected=shape(Parser(Lexer(text)).parse())
+    assert shape(PARSERS[parser](text,iterative).parse())==expected
+
+@pytest.mark.parametrize('parser',sorted(PARSERS))
+def test_call_is_found_by_token_lookahead(parser):
+    calls=PARSERS[parser](SPACED_CALL,False).parse().block.compound_statement.children
+    assert [type(node) for node in calls]==[ProcedureCall,ProcedureCall]
+
+@pytest.mark.parametrize('iterative',[False,True])
+@pytest.mark.parametrize('text',SAMPLES)
+def test_buffered_parser_builds_only_stored_tokens(text,iterative,monkeypatch):
+    buffer=TokenBuffer.from_text(text)
+    built=[]
+    token=buffer.token
+    monkeypatch.setattr(buffer,'token',lambda i:built.append(token(i)) or built[-1])
+    tree=BufferedParser(buffer,iterative=iterative).parse()
+    assert len(built)==len(tokens_in(tree,set()))
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from Utils.Interpreter_pascal import Interpreter
+from Utils.pool_pascal import ParallelRunner,resource
+from tests.support import PART10
+
+pytestmark=pytest.mark.skipif(resource is None,reason='needs the resource module')
+
+def named(name):
+    return PART10.replace('PROGRAM Part10;',f'PROGRAM {name};')
+
+class Crashing(Interpreter):
+    # the worker process dies while running a program named Crash...
+    def interpret(self):
+        if self.tree.name.startswith('Crash'):
+            os._exit(1)
+        return super().interpret()
+
+class Spinning(Interpreter):
+    def interpret(self):
+        if self.tree.name=='Spin':
+            while True:
+                pass
+        return super().interpret()
+
+class Hogging(Interpreter):
+    def interpret(self):
+        if self.tree.name=='Hog':
+            bytearray(256<<20)
+        return super().interpret()
+
+def by_name(results):
+    return {result['name']:result for result in results}
+
+def test_every_program_gets_a_result():
+    sources=[(f'p{i}',named(f'P{i}')) for i in range(40)]
+    results=by_name(ParallelRunner(workers=2,chunk_size=3).run(sources))
+    assert sorted(results)==sorted(name for name,_ in sources)
+    assert all(result['ok'] and result['variables']['x']==11 for result in results.values())
+
+@pytest.mark.parametrize('crashing',[['Crash'],['Crash1','Crash2']])
+def test_crashed_workers_are_recovered(crashing):
+    names=[f'P{i}' for i in range(30)]
+    for k,name in enumerate(crashing):
+        names.insert(7+11*k,name)
+    results=by_name(ParallelRunner(workers=2,chunk_size=4,interpreter_class=Crashing).run([(name,named(name)) for name in names]))
+    assert sorted(results)==sorted(names)
+    for name in names:
+        if name in crashing:
+            assert (results[name]['ok'],results[name]['error']['phase'])==(False,'worker')
+        else:
+            assert results[name]['ok'],results[name]['error']
+
+def test_cpu_time_limit():
+    sources=[(name,named(name)) for name in ('A','Spin','B')]
+    results=by_name(ParallelRunner(workers=1,cpu_time=0.2,interpreter_class=Spinning).run(sources))
+    assert results['Spin']['error']['type']=='ResourceLimitError'
+    assert results['A']['ok'] and results['B']['ok']
+
+def _address_space():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmSize:'):
+                return int(line.split()[1])*1024
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'),reason='needs /proc')
+def test_memory_limit():
+    # room for the worker itself, not for the 256 MB the hog asks for
+    memory=_address_space()+(128<<20)
+    sources=[(name,named(name)) for name in ('A','Hog','B')]
+    results=by_name(ParallelRunner(workers=1,memory=memory,interpreter_class=Hogging).run(sources))
+    assert results['Hog']['error']['type']=='MemoryError'
+    assert results['A']['ok'] and results['B']['ok']
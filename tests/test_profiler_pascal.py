@@ -0,0 +1,56 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Utils.Interpreter_pascal import Interpreter,SlotInterpreter
+from Utils.profiler_pascal import Profiler
+from tests.support import NESTED,analyzed
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Ticks(object):
+    # every reading of the clock is one second after the last one
+    def __init__(self):
+        self.now=0.0
+
+    def __call__(self):
+        self.now+=1.0
+        return self.now
+
+def profiled(interpreter_class=Interpreter):
+    profiler=Profiler(clock=Ticks())
+    interpreter_class(analyzed(NESTED),profiler=profiler).interpret()
+    return profiler
+
+@pytest.mark.parametrize('interpreter_class',[Interpreter,SlotInterpreter])
+def test_procedure_counts_on_nested(interpreter_class):
+    procedures={entry['name']:entry for entry in profiled(interpreter_class).procedure_stats()}
+    assert {name:entry['calls'] for name,entry in procedures.items()}=={'Alpha':1,'Beta':1}
+    alpha,beta=procedures['Alpha'],procedures['Beta']
+    # Beta runs inside Alpha, its time is part of Alpha's total only
+    assert alpha['total']>beta['total']>0
+    assert alpha['self_time']==alpha['total']-beta['total']
+    assert beta['self_time']==beta['total']
+
+def test_line_counts_on_nested():
+    lines={entry['line']:entry for entry in profiled().line_stats()}
+    # x := x + c * 2 in Beta: the assignment, two Vars, the Num and both BinOps
+    assert lines[7]['count']==6
+    assert {node['node'] for node in lines[7]['nodes']}=={'Assign','Var','BinOp','Num'}
+
+def test_dump_json():
+    profiler=profiled()
+    out=io.StringIO()
+    profiler.dump_json(out)
+    assert json.loads(out.getvalue())==json.loads(json.dumps(profiler.as_dict()))
+
+def test_profile_json_option(tmp_path):
+    path=tmp_path/'profile.json'
+    subprocess.run([sys.executable,'PASCAL.py','--profile-json',str(path)],cwd=ROOT,check=True,capture_output=True)
+    profile=json.loads(path.read_text(encoding='utf-8'))
+    assert profile['procedures']==[]
+    assert sum(entry['count'] for entry in profile['lines'])>0
@@ -0,0 +1,66 @@
+import pytest
+
+import S_to_Py_compiler
+from S_to_Py_compiler import PyInterpreter,PyCompiler,compile_source
+from Utils.cache_pascal import source_key
+from tests.support import SAMPLES,analyzed,final_globals
+
+def program(expression):
+    return f"""\
+program T;
+var a, b, c, x : integer;
+begin
+  a := 7; b := 3; c := 2;
+  x := {expression}
+end.
+"""
+
+@pytest.mark.parametrize('expression,python',[
+    ('a - (b - c)','v_a-(v_b-v_c)'),
+    ('(a - b) - c','v_a-v_b-v_c'),
+    ('a DIV (b * c)','v_a//(v_b*v_c)'),
+    ('a DIV b * c','v_a//v_b*v_c'),
+    ('-(a + b) * c','-(v_a+v_b)*v_c'),
+    ('a * -(b - c)','v_a*-(v_b-v_c)'),
+    ('- -a','--v_a'),
+])
+def test_parentheses_follow_precedence(expression,python):
+    text=program(expression)
+    interpreter=PyInterpreter(analyzed(text))
+    assert f'v_x={python}\n' in interpreter.source
+    assert final_globals(text,PyInterpreter)==final_globals(text)
+
+def test_long_expressions_compile():
+    terms=5000
+    interpreter=PyInterpreter(analyzed(program(' + '.join(['a']*terms))))
+    interpreter.interpret()
+    assert interpreter.program_record['x']==7*terms
+
+def test_deeply_nested_expressions_use_temporaries():
+    depth=150
+    expression='a - ('*depth+'b'+')'*depth
+    tree=analyzed(program(expression))
+    source=PyCompiler().compile(tree)
+    assert '_t1=' in source
+    interpreter=PyInterpreter(tree)
+    interpreter.interpret()
+    # the signs of b and of the 150 a alternate
+    assert interpreter.program_record['x']==3
+
+@pytest.mark.parametrize('text',SAMPLES)
+def test_programs_compiled_from_source_are_cached(text):
+    S_to_Py_compiler.clear_cache()
+    interpreter=PyInterpreter.from_source(text)
+    assert PyInterpreter.from_source(text).code is interpreter.code
+    interpreter.interpret()
+    assert dict(interpreter.program_record.members)=={name:value for name,value in final_globals(text).items() if value is not None}
+
+def test_cache_keeps_the_latest_programs(monkeypatch):
+    monkeypatch.setattr(S_to_Py_compiler,'_CACHE_SIZE',2)
+    S_to_Py_compiler.clear_cache()
+    first=compile_source(program('a'))
+    compile_source(program('b'))
+    assert compile_source(program('a')) is first
+    compile_source(program('c'))
+    # b was the least recently used
+    assert set(S_to_Py_compiler._code_cache)=={source_key(program('a')),source_key(program('c'))}
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from Utils.lexer_pascal import Lexer,Token,TokenType
+from Utils.Parser_pascal import Parser,Num
+from S_to_S_compiler import S2SCompiler
+from tests.support import final_globals
+
+EXPRESSIONS=[
+    '-(a + b)',
+    '+(a - b)',
+    '-(a - b) * c',
+    '-(-a)',
+    'a * -(b + c)',
+    'a - (b - c)',
+    'a - (b + c)',
+    '(a - b) - c',
+    'a DIV (b * c)',
+    'a DIV b * c',
+    '(a + b) * (c - d)',
+    '(a * b) + c',
+    'a - -(b DIV c)',
+]
+
+def program(expression):
+    return f"""\
+program T;
+var a, b, c, d, x : integer;
+begin
+  a := 7; b := 3; c := 2; d := 5;
+  x := {expression}
+end.
+"""
+
+def emitted(expression):
+    compiler=S2SCompiler()
+    compiler.visit(Parser(Lexer(program(expression))).parse())
+    line=[line for line in compiler.code if line.lstrip().startswith('<x')][0]
+    right=line.split(' := ',1)[1].rstrip(';')
+    # <a1:INTEGER> annotations back to plain names
+    return re.sub(r'<([a-z]+)\d+:[^>]*>',r'\1',right)
+
+@pytest.mark.parametrize('expression',EXPRESSIONS)
+def test_round_trip_keeps_value(expression):
+    assert final_globals(program(emitted(expression)))==final_globals(program(expression))
+
+@pytest.mark.parametrize('expression',EXPRESSIONS)
+def test_round_trip_is_stable(expression):
+    assert emitted(emitted(expression))==emitted(expression)
+
+@pytest.mark.parametrize('expression,expected',[
+    ('-(a + b)','-(a + b)'),
+    ('(a - b) - c','a - b - c'),
+    ('a - (b - c)','a - (b - c)'),
+    ('(a * b) + c','a * b + c'),
+    ('(a + b) * (c - d)','(a + b) * (c - d)'),
+])
+def test_redundant_parentheses_are_dropped(expression,expected):
+    assert emitted(expression)==expected
+
+@pytest.mark.parametrize('literal',['1e20','1e-7','123456789e15','2.5e-12','0.1','3.0'])
+def test_real_literals_round_trip(literal):
+    value=float(literal)
+    emitted=S2SCompiler().visit_Num(Num(Token(TokenType.REAL_CONST,value)))
+    assert 'e' not in emitted
+    text=f"""\
+program R;
+var r : real;
+begin
+  r := {emitted}
+end.
+"""
+    assert final_globals(text)=={'r':value}
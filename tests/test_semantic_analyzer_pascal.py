@@ -0,0 +1,61 @@
+import pytest
+
+from Utils.lexer_pascal import ErrorCode,SemanticError
+from tests.support import analyzed
+
+def duplicate_error(text):
+    with pytest.raises(SemanticError) as info:
+        analyzed(text)
+    return info.value
+
+def test_duplicate_variable():
+    error=duplicate_error("""\
+program D;
+var a : integer;
+var a : real;
+begin
+end.
+""")
+    assert error.error_code==ErrorCode.DUPLICATE_ID
+    assert error.token.value=='a'
+
+def test_duplicate_parameter():
+    error=duplicate_error("""\
+program D;
+procedure P(a : integer; a : real);
+begin
+end;
+begin
+end.
+""")
+    assert error.error_code==ErrorCode.DUPLICATE_ID
+    assert (error.token.value,error.token.lineno)==('a',2)
+
+def test_local_variable_shadowing_parameter():
+    error=duplicate_error("""\
+program D;
+procedure P(a : integer);
+var a : integer;
+begin
+end;
+begin
+end.
+""")
+    assert error.error_code==ErrorCode.DUPLICATE_ID
+
+def test_parameter_slots_are_distinct():
+    tree=analyzed("""\
+program D;
+var x : integer;
+procedure P(a : integer; b : real);
+var c : integer;
+begin
+   c := a
+end;
+begin
+   P(1, 2.5)
+end.
+""")
+    proc_symbol=tree.block.compound_statement.children[0].proc_symbol
+    assert proc_symbol.slot_names==['a','b','c']
+    assert [param.index for param in proc_symbol.params]==[0,1]
@@ -0,0 +1,47 @@
+import pytest
+
+np=pytest.importorskip('numpy')
+
+from Utils.vector_pascal import VectorInterpreter,run_bindings
+from tests.support import NESTED,analyzed,final_globals
+
+BOUND="""\
+program V;
+var a, b, q : integer;
+    r, s, t : real;
+begin
+  q := a DIV b;
+  r := 2;
+  s := a;
+  t := a / b + r
+end.
+"""
+
+def test_rows_match_the_interpreter():
+    rows=[{'a':7,'b':2},{'a':-7,'b':2},{'a':9,'b':3}]
+    table=run_bindings(analyzed(BOUND),rows)
+    for row,result in zip(rows,table):
+        text=BOUND.replace('begin\n',f'begin\n  a := {row["a"]};\n  b := {row["b"]};\n',1)
+        assert result==final_globals(text)
+
+def test_real_variables_get_float_columns():
+    interpreter=VectorInterpreter(analyzed(BOUND),{'a':[1,2],'b':[1,1]})
+    interpreter.interpret()
+    members=interpreter.program_record.members
+    assert {name:members[name].dtype.kind for name in ('a','b','q','r','s','t')}=={'a':'i','b':'i','q':'i','r':'f','s':'f','t':'f'}
+
+def test_constant_program_is_broadcast():
+    assert run_bindings(analyzed(NESTED),[{}]*3)==[final_globals(NESTED)]*3
+
+def test_integer_columns_reject_reals():
+    with pytest.raises(ValueError):
+        VectorInterpreter(analyzed(BOUND),{'a':[1.5],'b':[1]})
+
+def test_unknown_names_are_rejected():
+    with pytest.raises(ValueError):
+        VectorInterpreter(analyzed(BOUND),{'z':[1]})
+
+def test_division_by_zero_stops_the_run():
+    with pytest.raises(Exception) as info:
+        run_bindings(analyzed(BOUND),[{'a':1,'b':1},{'a':1,'b':0}])
+    assert isinstance(info.value.__cause__,FloatingPointError)